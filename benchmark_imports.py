@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long the simulation modules take to import in a fresh
+interpreter, which is what every worker process pays when it starts.
+Each module is imported in its own subprocess, a few times, and the
+fastest time is compared with the budget. It also checks that the
+headless modules don't pull in tkinter or NumPy at import time.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["card_table", "trick", "player", "game", "simulate"]
+DEFAULT_BUDGET_MS = 150.0
+DEFAULT_REPEATS = 5
+# Modules that only belong behind --display or the binary archive code
+HEAVY_MODULES = ["tkinter", "numpy"]
+
+TIMING_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms" : elapsed * 1000, "loaded" : [name for name in %r if name in sys.modules]}))
+"""
+
+def time_import(module_name):
+    """
+    (milliseconds to import module_name, heavy modules it loaded)
+    """
+    output = subprocess.run([sys.executable, "-c", TIMING_SCRIPT % (module_name, HEAVY_MODULES)], check=True, capture_output=True,\
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    result = json.loads(output)
+    return (result["ms"], result["loaded"])
+
+def benchmark(module_names, budget_ms, repeats):
+    """
+    Print a line per module and return True if they are all within budget
+    and none of them loaded a heavy module.
+    """
+    all_passed = True
+    print("Module         Best ms  Budget ms  Heavy modules loaded")
+    for module_name in module_names:
+        timings = [time_import(module_name) for _ in range(repeats)]
+        best_ms = min(ms for (ms, _) in timings)
+        loaded = timings[0][1]
+        passed = best_ms <= budget_ms and len(loaded) == 0
+        all_passed = all_passed and passed
+        print("%-12s %9.1f %10.1f  %s%s" % (module_name, best_ms, budget_ms, ", ".join(loaded) or "none", "" if passed else "  FAIL"))
+    return all_passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the simulation modules import quickly and without GUI or NumPy.")
+    parser.add_argument("-m", "--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Most milliseconds an import may take")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="How many fresh interpreters to time each import in")
+
+    args = parser.parse_args()
+
+    if not benchmark(args.modules, args.budget_ms, args.repeats):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+"""
+Bidding from simulated rounds instead of the hand-tuned weights of
+Player.make_bid. For a hand, a number of players and a seat, a
+TrickDistributionService plays the round out many times with lockstep,
+dealing the other hands at random and letting everybody play the
+built-in strategy, once for every bid the hand could make. The result is
+how often the hand won each number of tricks for each bid, and the
+average points it scored, so a player can pick the bid with the best
+expected score under the real scoring rules, bonuses included.
+Results are kept in a bounded least-recently-used cache that can be
+saved to disk and loaded again, so batch runs only simulate a hand the
+first time they see it.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+from canonical import canonical_hand
+from card_table import card_mask, card_ids_in_mask
+from deck import DECK_CARD_IDS
+from lockstep import make_bids, play_round
+from player import Player
+from seeding import child_seed_sequence, new_rng, to_seed_sequence
+
+DEFAULT_NUM_SAMPLES = 200
+DEFAULT_CACHE_SIZE = 4096
+
+class TrickDistribution():
+    """
+    counts[bid][tricks] is how many of the num_samples rounds won that
+    many tricks when the hand made that bid, and points[bid] is the total
+    points scored with that bid over all of them.
+    """
+    def __init__(self, num_samples, counts, points):
+        self.num_samples = num_samples
+        self.counts = counts
+        self.points = points
+
+    def probabilities(self, bid):
+        return [count / self.num_samples for count in self.counts[bid]]
+
+    def expected_tricks(self, bid):
+        return sum(tricks * count for (tricks, count) in enumerate(self.counts[bid])) / self.num_samples
+
+    def expected_points(self, bid):
+        return self.points[bid] / self.num_samples
+
+    def best_bid(self):
+        """
+        The bid with the highest expected points, the lowest one if several tie.
+        """
+        best_bid = 0
+        for bid in range(1, len(self.points)):
+            if self.points[bid] > self.points[best_bid]:
+                best_bid = bid
+        return best_bid
+
+    def to_json(self):
+        return {"num_samples" : self.num_samples, "counts" : self.counts, "points" : self.points}
+
+    @staticmethod
+    def from_json(data):
+        return TrickDistribution(data["num_samples"], data["counts"], data["points"])
+
+def distribution_of_deals(hand, others, seat, round_number):
+    """
+    The TrickDistribution of playing hand (a list of card ids) from seat
+    against every deal in others, a (deals x other players x cards) array
+    of the other hands. Every deal is played once for every bid, so the
+    bids are compared on the same deals.
+    """
+    import numpy as np
+    (num_deals, num_others, num_cards) = others.shape
+    num_bids = num_cards + 1
+    hands = np.insert(others, seat, hand, axis=1)
+    hands = np.tile(hands, (num_bids, 1, 1))
+    bids = make_bids(np.sort(hands, axis=2))
+    bids[:, seat] = np.repeat(np.arange(num_bids), num_deals)
+    results = play_round(hands, 0, round_number, bids)
+    tricks_won = results.tricks_won[:, seat].reshape(num_bids, num_deals)
+    points = results.points[:, seat].reshape(num_bids, num_deals)
+    counts = [np.bincount(tricks_won[bid], minlength=num_bids).tolist() for bid in range(num_bids)]
+    return TrickDistribution(num_deals, counts, points.sum(axis=1).tolist())
+
+def write_distributions(filepath, distributions, num_samples=None, seed_sequence=None):
+    """
+    Write (key, TrickDistribution) pairs as JSON. num_samples and the
+    seed_sequence they were simulated from go in the header, so a service
+    with other settings doesn't use them.
+    """
+    entries = [{"key" : list(key), "distribution" : distribution.to_json()} for (key, distribution) in distributions]
+    seed = None
+    if seed_sequence != None:
+        seed = {"entropy" : seed_sequence.entropy, "spawn_key" : list(seed_sequence.spawn_key)}
+    f = open(filepath, 'w')
+    f.write(json.dumps({"num_samples" : num_samples, "seed" : seed, "distributions" : entries}))
+    f.close()
+
+def read_distributions(filepath):
+    """
+    The header of a file from write_distributions, as (num_samples, seed)
+    where seed is (entropy, spawn_key) or None, and its (key,
+    TrickDistribution) pairs.
+    """
+    f = open(filepath, 'r')
+    data = json.loads(f.read())
+    f.close()
+    seed = None
+    if data["seed"] != None:
+        seed = (data["seed"]["entropy"], tuple(data["seed"]["spawn_key"]))
+    distributions = [(tuple(entry["key"]), TrickDistribution.from_json(entry["distribution"])) for entry in data["distributions"]]
+    return ((data["num_samples"], seed), distributions)
+
+class TrickDistributionService():
+    def __init__(self, num_samples=DEFAULT_NUM_SAMPLES, cache_size=DEFAULT_CACHE_SIZE, cache_filepath=None, seed=None, exact_tables=None):
+        """
+        Every hand is simulated with its own stream from seed, so a hand's
+        distribution doesn't depend on which hands were asked about first.
+        If cache_filepath exists its distributions are loaded, and save()
+        writes the cache back to it. Distributions from a different number
+        of samples, or from a different seed when seed is given, are skipped.
+        exact_tables maps keys to exact distributions, like the ones
+        exact_tables.py makes for the first rounds. Those keys are looked
+        up there and never simulated or cached. If it is None the default
+        tables from exact_tables.json are used, and {} turns them off.
+        """
+        self.num_samples = num_samples
+        self.cache_size = cache_size
+        self.cache_filepath = cache_filepath
+        self.seed_sequence = to_seed_sequence(seed)
+        # Without a seed, distributions from any seed are as good as fresh ones
+        self.seeded = seed != None
+        if exact_tables == None:
+            from exact_tables import default_exact_tables
+            exact_tables = default_exact_tables()
+        self.exact_tables = exact_tables
+        # Keys are (num_players, seat, round_number, canonical hand mask),
+        # so hands that only differ by the names of the plain suits or by
+        # which copies of a card they hold share an entry.
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.exact_hits = 0
+        self.skipped = 0
+        if cache_filepath and os.path.exists(cache_filepath):
+            self.load(cache_filepath)
+
+    def distribution(self, hand, num_players, seat, round_number=None):
+        """
+        The TrickDistribution of a hand of cards, played from seat (0 leads
+        the first trick). round_number is only needed when it isn't the
+        number of cards in the hand, since it changes the points for bidding 0.
+        """
+        if round_number == None:
+            round_number = len(hand)
+        key = (num_players, seat, round_number, canonical_hand(card_mask(card.card_id for card in hand)))
+        distribution = self.exact_tables.get(key)
+        if distribution != None:
+            self.exact_hits += 1
+            return distribution
+        distribution = self.cache.get(key)
+        if distribution != None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return distribution
+        self.misses += 1
+        distribution = self.simulate(key)
+        self.add(key, distribution)
+        return distribution
+
+    def add(self, key, distribution):
+        self.cache[key] = distribution
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def rng_for(self, key):
+        seed_sequence = self.seed_sequence
+        for part in key:
+            seed_sequence = child_seed_sequence(seed_sequence, part)
+        return new_rng(seed_sequence)
+
+    def simulate(self, key):
+        """
+        Play num_samples random deals of the other hands.
+        """
+        import numpy as np
+        (num_players, seat, round_number, hand_mask) = key
+        hand = list(card_ids_in_mask(hand_mask))
+        num_cards = len(hand)
+        rest = np.array([card_id for card_id in DECK_CARD_IDS if not hand_mask >> card_id & 1], dtype=np.int64)
+        rng = self.rng_for(key)
+        order = np.argsort(rng.random((self.num_samples, len(rest))), axis=1)[:, :(num_players - 1) * num_cards]
+        others = rest[order].reshape(self.num_samples, num_players - 1, num_cards)
+        return distribution_of_deals(hand, others, seat, round_number)
+
+    def save(self, filepath=None):
+        """
+        Write the cache as JSON, least recently used first.
+        """
+        if filepath == None:
+            filepath = self.cache_filepath
+        write_distributions(filepath, self.cache.items(), self.num_samples, self.seed_sequence)
+
+    def load(self, filepath):
+        ((_, seed), distributions) = read_distributions(filepath)
+        if self.seeded and seed != (self.seed_sequence.entropy, tuple(self.seed_sequence.spawn_key)):
+            self.skipped += len(distributions)
+            return
+        for (key, distribution) in distributions:
+            if distribution.num_samples != self.num_samples:
+                self.skipped += 1
+                continue
+            self.add(key, distribution)
+
+class DistributionBidPlayer(Player):
+    """
+    Plays like Player, but bids whatever a TrickDistributionService says
+    has the best expected score.
+    """
+    def __init__(self, service, rng=None):
+        super().__init__(rng)
+        self.service = service
+
+    def make_bid(self, num_players, seat=0, round_number=None):
+        distribution = self.service.distribution(self.hand, num_players, seat, round_number)
+        self.bid = distribution.best_bid()
+        if self.bid == 0:
+            self.make_tigress_escape()
+        return self.bid
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Canonical forms of hands and trick states, for keying caches and tables.
+The rules treat Parrot, TreasureMap and TreasureChest the same way (only
+the Jolly Roger is special), and the 5 pirates, the 5 escapes and the 2
+mermaids are copies of each other. So renaming the plain suits, or
+swapping copies of a card, gives a state that plays out exactly the same.
+A canonical form picks one state out of each group of such states, so
+equivalent hands share one cache entry (up to 6 times fewer plain suit
+arrangements, and any pirates, escapes or mermaids count only by number).
+
+Strategies that break ties between equal cards by card id (like Player
+playing the weakest card) can pick a different one of two equivalent
+cards in a renamed state, so for them the equivalence is statistical
+rather than card for card.
+"""
+
+from card import *
+from card_table import ESCAPE_MASK, MERMAID_MASK, PIRATE_MASK, CARD_SUIT_INDEX, NUM_CARD_IDS, NO_TRUMP
+
+# The ids of copies of the same card, which can be given out in any order
+INTERCHANGEABLE_MASKS = (ESCAPE_MASK, MERMAID_MASK, PIRATE_MASK)
+
+def plain_suit_pattern(mask, suit_index):
+    """
+    The cards of one plain suit in a mask, with bit n - 1 for number n.
+    suit_index is the suit's position in PLAIN_SUITS.
+    """
+    pattern = 0
+    for number in range(MAX_SUIT_NUMBER):
+        pattern |= (mask >> (PLAIN_SUIT_FIRST_ID + number * len(PLAIN_SUITS) + suit_index) & 1) << number
+    return pattern
+
+def canonical_relabeling(masks):
+    """
+    relabel[card_id] is the id that card gets in the canonical form of
+    these masks (like a hand and the cards played so far). Each mask is
+    a set of play ids and they should not overlap. The plain suits are
+    put in order of how many high cards they hold, comparing the first
+    mask, then the next. The copies of a card are given their lowest
+    ids in the order they appear in the masks.
+    """
+    relabel = list(range(NUM_CARD_IDS))
+    signatures = [tuple(plain_suit_pattern(mask, suit_index) for mask in masks) for suit_index in range(len(PLAIN_SUITS))]
+    suit_order = sorted(range(len(PLAIN_SUITS)), key=lambda suit_index: signatures[suit_index], reverse=True)
+    for (canonical_index, suit_index) in enumerate(suit_order):
+        for number in range(MAX_SUIT_NUMBER):
+            offset = PLAIN_SUIT_FIRST_ID + number * len(PLAIN_SUITS)
+            relabel[offset + suit_index] = offset + canonical_index
+    for copies_mask in INTERCHANGEABLE_MASKS:
+        copies = [card_id for card_id in range(NUM_CARD_IDS) if copies_mask >> card_id & 1]
+        # The copies in the masks, in order, then the rest
+        used = [card_id for mask in masks for card_id in copies if mask >> card_id & 1]
+        unused = [card_id for card_id in copies if not card_id in used]
+        for (canonical_id, card_id) in zip(copies, used + unused):
+            relabel[card_id] = canonical_id
+    return relabel
+
+def relabel_mask(mask, relabel):
+    relabeled = 0
+    while mask:
+        low_bit = mask & -mask
+        relabeled |= 1 << relabel[low_bit.bit_length() - 1]
+        mask ^= low_bit
+    return relabeled
+
+def relabel_trump_index(trump_index, relabel):
+    """
+    The trump index of the suit that trump_index's suit is renamed to.
+    """
+    if trump_index == NO_TRUMP or trump_index == Suit.JollyRoger.value:
+        return trump_index
+    return CARD_SUIT_INDEX[relabel[suit_card_id(Suit(trump_index), 1)]]
+
+def canonical_masks(masks):
+    relabel = canonical_relabeling(masks)
+    return tuple(relabel_mask(mask, relabel) for mask in masks)
+
+def canonical_hand(mask):
+    return canonical_masks((mask,))[0]
+
+def canonical_trick_state(hand_mask, played_mask, trump_index, winning_id):
+    """
+    The canonical (hand_mask, played_mask, trump_index, winning_id) of a
+    player's view of a trick. winning_id is -1 for an empty trick.
+    """
+    relabel = canonical_relabeling((hand_mask, played_mask))
+    if winning_id != -1:
+        winning_id = relabel[winning_id]
+    return (relabel_mask(hand_mask, relabel), relabel_mask(played_mask, relabel), relabel_trump_index(trump_index, relabel), winning_id)
@@ -2,7 +2,6 @@
 
 from abc import ABC, abstractmethod
 from enum import Enum
-import tkinter as tk
 
 class CardCategory(Enum):
     Suit = 1
@@ -27,16 +26,61 @@ class TigressMode(Enum):
     Pirate = 1
     Escape = 2
 
+MAX_SUIT_NUMBER = 14
+NUM_PIRATE_CARDS = 5
+NUM_MERMAID_CARDS = 2
+NUM_SKULL_KING_CARDS = 1
+NUM_ESCAPE_CARDS = 5
+NUM_TIGRESS_CARDS = 1
+
+PLAIN_SUITS = (Suit.Parrot, Suit.TreasureMap, Suit.TreasureChest)
+
+# Every card in the deck has a compact id from 0 to 69. The ids are in
+# order of power, so sorting cards by id also sorts them by strength.
+# The Tigress gets a second id for when it is played as an escape.
+ESCAPE_FIRST_ID = 0
+PLAIN_SUIT_FIRST_ID = ESCAPE_FIRST_ID + NUM_ESCAPE_CARDS
+JOLLY_ROGER_FIRST_ID = PLAIN_SUIT_FIRST_ID + MAX_SUIT_NUMBER * len(PLAIN_SUITS)
+MERMAID_FIRST_ID = JOLLY_ROGER_FIRST_ID + MAX_SUIT_NUMBER
+PIRATE_FIRST_ID = MERMAID_FIRST_ID + NUM_MERMAID_CARDS
+TIGRESS_ID = PIRATE_FIRST_ID + NUM_PIRATE_CARDS
+SKULL_KING_ID = TIGRESS_ID + NUM_TIGRESS_CARDS
+TIGRESS_ESCAPE_ID = SKULL_KING_ID + NUM_SKULL_KING_CARDS
+NUM_CARD_IDS = TIGRESS_ESCAPE_ID + 1
+
+def suit_card_id(suit, number):
+    if suit == Suit.JollyRoger:
+        return JOLLY_ROGER_FIRST_ID + number - 1
+    return PLAIN_SUIT_FIRST_ID + (number - 1) * len(PLAIN_SUITS) + PLAIN_SUITS.index(suit)
+
+def check_copy_number(copy_number, num_copies):
+    if not 0 <= copy_number < num_copies:
+        raise ValueError("There are only %d copies of this card, so there is no copy %d." % (num_copies, copy_number))
+
 class Card(ABC):
-    current_id_number = 1
-    def __init__(self, card_category):
+    """
+    Cards can't be changed once they are made, so the same card objects
+    are shared by every deck, hand and game (see REFERENCE_CARDS in
+    card_table.py). play_id is the id used when resolving tricks. It only
+    differs from card_id for a Tigress played as an escape, which is a
+    separate card object from the Tigress played as a pirate.
+    Cards with several identical copies (pirates, mermaids and escapes)
+    take which copy they are, from 0, and get that copy's card id.
+    """
+    __slots__ = ("card_category", "card_id", "play_id", "power", "string", "frozen")
+
+    def __init__(self, card_category, card_id, power, play_id=None):
         self.card_category = card_category
-        self.id_number = Card.current_id_number
-        Card.current_id_number += 1
+        self.card_id = card_id
+        self.play_id = card_id if play_id == None else play_id
+        self.power = power
+        self.string = self.make_string()
+        self.frozen = True
 
-    @abstractmethod
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        pass
+    def __setattr__(self, name, value):
+        if getattr(self, "frozen", False):
+            raise AttributeError("Cards can't be changed, so %s can't be set." % (name))
+        object.__setattr__(self, name, value)
 
     @abstractmethod
     def defeats_suit_card(self, other_card, trump_suit):
@@ -86,10 +130,16 @@ class Card(ABC):
             return self.defeats_escape()
 
     def __eq__(self, other):
-        return self.id_number == other.id_number
+        return self.card_id == other.card_id
+
+    def __hash__(self):
+        return self.card_id
 
-    @abstractmethod
     def __str__(self):
+        return self.string
+
+    @abstractmethod
+    def make_string(self):
         pass
 
     def is_escape(self):
@@ -99,30 +149,13 @@ class Card(ABC):
         return self.card_category == CardCategory.Pirate or (self.card_category == CardCategory.Tigress and self.tigress_mode == TigressMode.Pirate)
 
 class SuitCard(Card):
+    __slots__ = ("suit", "number")
+
     def __init__(self, suit, number):
-        super().__init__(CardCategory.Suit)
         self.suit = suit
         self.number = number
-        self.power = self.number
-        if self.suit == Suit.JollyRoger:
-            self.power += 14
-
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        if self.suit == Suit.JollyRoger:
-            color = "black"
-            text_color = "white"
-        elif self.suit == Suit.Parrot:
-            color = "green"
-            text_color = "white"
-        elif self.suit == Suit.TreasureMap:
-            color = "purple"
-            text_color = "white"
-        else:
-            color = "yellow"
-            text_color = "black"
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill=color, outline="gray")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text=str(self.number), fill=text_color, font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+        power = number + 14 if suit == Suit.JollyRoger else number
+        super().__init__(CardCategory.Suit, suit_card_id(suit, number), power)
 
     def defeats_suit_card(self, other_card, trump_suit):
         """
@@ -169,18 +202,15 @@ class SuitCard(Card):
     def defeats_escape(self):
         return True
 
-    def __str__(self):
+    def make_string(self):
         return str(self.suit) + " " + str(self.number)
 
 class PirateCard(Card):
-    def __init__(self):
-        super().__init__(CardCategory.Pirate)
-        self.power = 30
+    __slots__ = ()
 
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill="red", outline="gray")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text="P", fill="black", font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+    def __init__(self, copy_number=0):
+        check_copy_number(copy_number, NUM_PIRATE_CARDS)
+        super().__init__(CardCategory.Pirate, PIRATE_FIRST_ID + copy_number, 30)
 
     def defeats_suit_card_no_trump(self, other_card):
         return True
@@ -203,18 +233,15 @@ class PirateCard(Card):
     def defeats_escape(self):
         return True
 
-    def __str__(self):
+    def make_string(self):
         return "Pirate"
 
 class MermaidCard(Card):
-    def __init__(self):
-        super().__init__(CardCategory.Mermaid)
-        self.power = 29
+    __slots__ = ()
 
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill="deep sky blue", outline="white")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text="M", fill="black", font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+    def __init__(self, copy_number=0):
+        check_copy_number(copy_number, NUM_MERMAID_CARDS)
+        super().__init__(CardCategory.Mermaid, MERMAID_FIRST_ID + copy_number, 29)
 
     def defeats_suit_card_no_trump(self, other_card):
         return True
@@ -237,18 +264,14 @@ class MermaidCard(Card):
     def defeats_escape(self):
         return True
 
-    def __str__(self):
+    def make_string(self):
         return "Mermaid"
 
 class SkullKingCard(Card):
-    def __init__(self):
-        super().__init__(CardCategory.SkullKing)
-        self.power = 31
+    __slots__ = ()
 
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill="black", outline="gold")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text="SK", fill="gold", font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+    def __init__(self):
+        super().__init__(CardCategory.SkullKing, SKULL_KING_ID, 31)
 
     def defeats_suit_card_no_trump(self, other_card):
         return True
@@ -271,23 +294,25 @@ class SkullKingCard(Card):
     def defeats_escape(self):
         return True
 
-    def __str__(self):
+    def make_string(self):
         return "The Skull King"
 
 class TigressCard(Card):
-    def __init__(self):
-        super().__init__(CardCategory.Tigress)
-        self.tigress_mode = TigressMode.Pirate
-        self.power = 30
- 
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill="red", outline="gray")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text="T", fill="white", font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+    __slots__ = ("tigress_mode",)
+
+    def __init__(self, tigress_mode=TigressMode.Pirate):
+        self.tigress_mode = tigress_mode
+        if tigress_mode == TigressMode.Escape:
+            super().__init__(CardCategory.Tigress, TIGRESS_ID, 0, TIGRESS_ESCAPE_ID)
+        else:
+            super().__init__(CardCategory.Tigress, TIGRESS_ID, 30)
 
     def escape(self):
-        self.tigress_mode = TigressMode.Escape
-        self.power = 0
+        """
+        The Tigress played as an escape. This is a new card, since cards
+        can't change; games use REFERENCE_CARDS[TIGRESS_ESCAPE_ID] instead.
+        """
+        return TigressCard(TigressMode.Escape)
 
     def defeats_suit_card_no_trump(self, other_card):
         return self.tigress_mode == TigressMode.Pirate
@@ -310,18 +335,15 @@ class TigressCard(Card):
     def defeats_escape(self):
         return self.tigress_mode == TigressMode.Pirate
 
-    def __str__(self):
+    def make_string(self):
         return "Tigress"
 
 class EscapeCard(Card):
-    def __init__(self):
-        super().__init__(CardCategory.Escape)
-        self.power = 0
-  
-    def draw(self, canvas, start_x, start_y, end_x, end_y):
-        text_size = (end_x - start_x) / 2
-        canvas.create_rectangle(start_x, start_y, end_x, end_y, fill="white", outline="gray")
-        canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text="E", fill="gray", font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+    __slots__ = ()
+
+    def __init__(self, copy_number=0):
+        check_copy_number(copy_number, NUM_ESCAPE_CARDS)
+        super().__init__(CardCategory.Escape, ESCAPE_FIRST_ID + copy_number, 0)
 
     def defeats_suit_card_no_trump(self, other_card):
         return False
@@ -344,5 +366,5 @@ class EscapeCard(Card):
     def defeats_escape(self):
         return False
 
-    def __str__(self):
+    def make_string(self):
         return "Escape"
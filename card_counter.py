@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Card counting for a round. A CardCounter is told about every card as it
+is played (Trick.play_card does that for the Trick's card_counter) and
+keeps the cards that haven't been played yet as a card_table bitmask.
+Every question about what is still out, like how many cards of a suit
+or category are left or "how many cards I can't see would beat my
+Parrot 12 if Parrot is trump?", is then a table lookup, a mask and a
+bit count, however far into the round it is. The counts aren't kept
+separately, since a bit count of a 71 bit mask costs about the same as
+reading a counter and keeping counters up to date would slow down every
+card played.
+"""
+
+from card import CardCategory
+from card_table import *
+from deck import DECK_CARD_IDS
+
+DECK_MASK = card_mask(DECK_CARD_IDS)
+
+def card_ids_of_play_ids(mask):
+    """
+    A mask of play ids as the card ids that can be played that way.
+    """
+    if mask & TIGRESS_ESCAPE_MASK:
+        mask = mask & ~TIGRESS_ESCAPE_MASK | TIGRESS_MASK
+    return mask
+
+# BEATING_MASKS[trump_index][play_id] are the card ids that would take a
+# trick from play_id (the Tigress if either way of playing it would).
+BEATING_MASKS = [[card_ids_of_play_ids(DEFEATS_MASKS[trump_index][play_id]) & DECK_MASK for play_id in range(NUM_CARD_IDS)]\
+        for trump_index in range(NUM_TRUMP_INDICES)]
+# HIGHER_IN_SUIT_MASKS[card_id] are the cards of the same suit with a higher number
+HIGHER_IN_SUIT_MASKS = [SUIT_MASKS[CARD_SUIT_INDEX[card_id]] & ~((2 << card_id) - 1) for card_id in range(NUM_CARD_IDS)]
+# The cards of each category, for counting them
+CATEGORY_MASKS = {category : card_mask(card_id for card_id in DECK_CARD_IDS if CARD_CATEGORY[card_id] == category) for category in CardCategory}
+
+class CardCounter():
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new round with every card unplayed.
+        """
+        self.unplayed_mask = DECK_MASK
+
+    def card_played(self, card):
+        self.unplayed_mask &= ~(1 << card.card_id)
+
+    def unseen_mask(self, hand_mask=0):
+        """
+        The cards that haven't been played and aren't in hand_mask.
+        """
+        return self.unplayed_mask & ~hand_mask
+
+    def num_left_in_suit(self, suit, hand_mask=0):
+        return (SUIT_MASKS[suit.value] & self.unplayed_mask & ~hand_mask).bit_count()
+
+    def num_left(self, category, hand_mask=0):
+        return (CATEGORY_MASKS[category] & self.unplayed_mask & ~hand_mask).bit_count()
+
+    def num_unseen_beating(self, card, trump_index, hand_mask=0):
+        """
+        How many cards that haven't been played and aren't in hand_mask
+        would take the trick from card if it were winning under trump_index.
+        """
+        return (BEATING_MASKS[trump_index][card.play_id] & self.unplayed_mask & ~hand_mask).bit_count()
+
+    def num_unseen_higher_in_suit(self, card, hand_mask=0):
+        return (HIGHER_IN_SUIT_MASKS[card.card_id] & self.unplayed_mask & ~hand_mask).bit_count()
+
+    def is_highest_in_suit(self, card, hand_mask=0):
+        """
+        True if no card of the suit higher than card is still out, apart
+        from the ones in hand_mask.
+        """
+        return HIGHER_IN_SUIT_MASKS[card.card_id] & self.unplayed_mask & ~hand_mask == 0
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Lookup tables indexed by the compact card ids from card.py, so the
+simulation can resolve tricks by indexing lists instead of calling the
+defeats_* methods. The tables are built once, at import time, from the
+card classes, which stay the readable reference for the rules.
+"""
+
+from card import *
+
+# Trump indices. A suit's index is its Suit value, and index 0 is used
+# both when there is no trump and before a non-escape has been played.
+NO_TRUMP = 0
+NUM_TRUMP_INDICES = len(Suit) + 1
+
+def card_from_id(card_id):
+    """
+    Build the card object for a card id.
+    """
+    if card_id < PLAIN_SUIT_FIRST_ID:
+        return EscapeCard(card_id - ESCAPE_FIRST_ID)
+    elif card_id < JOLLY_ROGER_FIRST_ID:
+        offset = card_id - PLAIN_SUIT_FIRST_ID
+        return SuitCard(PLAIN_SUITS[offset % len(PLAIN_SUITS)], offset // len(PLAIN_SUITS) + 1)
+    elif card_id < MERMAID_FIRST_ID:
+        return SuitCard(Suit.JollyRoger, card_id - JOLLY_ROGER_FIRST_ID + 1)
+    elif card_id < PIRATE_FIRST_ID:
+        return MermaidCard(card_id - MERMAID_FIRST_ID)
+    elif card_id < TIGRESS_ID:
+        return PirateCard(card_id - PIRATE_FIRST_ID)
+    elif card_id == TIGRESS_ID:
+        return TigressCard()
+    elif card_id == SKULL_KING_ID:
+        return SkullKingCard()
+    elif card_id == TIGRESS_ESCAPE_ID:
+        return TigressCard(TigressMode.Escape)
+    raise ValueError("There is no card with id %d." % (card_id))
+
+def reference_defeats(card, other_card, trump_index):
+    try:
+        if trump_index == NO_TRUMP:
+            return card.defeats_no_trump(other_card)
+        return card.defeats(other_card, Suit(trump_index))
+    except NotImplementedError:
+        # Only raised when comparing a one-of-a-kind card with itself.
+        return False
+
+# The one object for each play id. Every deck deals these same cards, and
+# a Tigress played as an escape is REFERENCE_CARDS[TIGRESS_ESCAPE_ID].
+REFERENCE_CARDS = tuple(card_from_id(card_id) for card_id in range(NUM_CARD_IDS))
+
+CARD_CATEGORY = [card.card_category for card in REFERENCE_CARDS]
+# 0 for cards without a suit, otherwise the Suit value
+CARD_SUIT_INDEX = [card.suit.value if card.card_category == CardCategory.Suit else NO_TRUMP for card in REFERENCE_CARDS]
+CARD_STRINGS = [str(card) for card in REFERENCE_CARDS]
+IS_ESCAPE = [card.is_escape() for card in REFERENCE_CARDS]
+FORCES_NO_TRUMP = [card.card_category in (CardCategory.Pirate, CardCategory.Mermaid, CardCategory.SkullKing) or card_id == TIGRESS_ID\
+        for (card_id, card) in enumerate(REFERENCE_CARDS)]
+
+# DEFEATS[trump_index][card_id][winning_card_id] is True if playing
+# card_id takes the trick away from winning_card_id.
+DEFEATS = [[[reference_defeats(card, winning_card, trump_index) for winning_card in REFERENCE_CARDS]\
+        for card in REFERENCE_CARDS] for trump_index in range(NUM_TRUMP_INDICES)]
+
+# Hands and other sets of cards can be stored as a bitmask with bit
+# card_id set for each card. Since ids are ordered by power, the lowest
+# set bit is the weakest card and the highest set bit is the strongest.
+def card_mask(card_ids):
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+def lowest_card_id(mask):
+    return (mask & -mask).bit_length() - 1
+
+def highest_card_id(mask):
+    return mask.bit_length() - 1
+
+def card_ids_in_mask(mask):
+    """
+    The ids in the mask, weakest first.
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+ESCAPE_MASK = card_mask(range(ESCAPE_FIRST_ID, PLAIN_SUIT_FIRST_ID))
+MERMAID_MASK = card_mask(range(MERMAID_FIRST_ID, PIRATE_FIRST_ID))
+PIRATE_MASK = card_mask(range(PIRATE_FIRST_ID, TIGRESS_ID))
+TIGRESS_MASK = card_mask([TIGRESS_ID])
+SKULL_KING_MASK = card_mask([SKULL_KING_ID])
+TIGRESS_ESCAPE_MASK = card_mask([TIGRESS_ESCAPE_ID])
+ALL_CARDS_MASK = card_mask(range(NUM_CARD_IDS))
+# SUIT_MASKS[trump_index] is every card of that suit (empty for NO_TRUMP)
+SUIT_MASKS = [card_mask(card_id for card_id in range(NUM_CARD_IDS) if CARD_SUIT_INDEX[card_id] == trump_index) if trump_index != NO_TRUMP else 0\
+        for trump_index in range(NUM_TRUMP_INDICES)]
+ALL_SUIT_CARDS_MASK = card_mask(range(PLAIN_SUIT_FIRST_ID, MERMAID_FIRST_ID))
+PLAIN_SUIT_CARDS_MASK = card_mask(range(PLAIN_SUIT_FIRST_ID, JOLLY_ROGER_FIRST_ID))
+
+# DEFEATS_MASKS[trump_index][winning_card_id] has the bit of every play id
+# that takes the trick away from winning_card_id, so checking a whole hand
+# against the current winner is a single &.
+DEFEATS_MASKS = [[card_mask(card_id for card_id in range(NUM_CARD_IDS) if DEFEATS[trump_index][card_id][winning_card_id])\
+        for winning_card_id in range(NUM_CARD_IDS)] for trump_index in range(NUM_TRUMP_INDICES)]
+
+# FIRST_TRUMP_INDEX[play_id] is the trump index play_id sets if it is the
+# first non-escape played in a trick
+FIRST_TRUMP_INDEX = [NO_TRUMP if FORCES_NO_TRUMP[card_id] else CARD_SUIT_INDEX[card_id] for card_id in range(NUM_CARD_IDS)]
+# OFF_SUIT_MASKS[trump_index] are the suit cards that can't be played
+# while the trick has that trump suit, unless nothing else can
+OFF_SUIT_MASKS = [ALL_SUIT_CARDS_MASK & ~SUIT_MASKS[trump_index] if trump_index != NO_TRUMP else 0 for trump_index in range(NUM_TRUMP_INDICES)]
+
+def legal_mask(hand_mask, trump_index):
+    """
+    The cards of hand_mask that can be played in a trick with trump_index,
+    like Player.determine_illegal_indices.
+    """
+    legal = hand_mask & ~OFF_SUIT_MASKS[trump_index]
+    if legal == 0:
+        return hand_mask
+    return legal
+
+def advance_trick(trump_index, winning_id, winning_position, position, play_id):
+    """
+    A trick's (trump_index, winning_id, winning_position) after play_id is
+    played at position (0 leads), like Trick.play_card.
+    """
+    if position == 0:
+        return (NO_TRUMP if IS_ESCAPE[play_id] else FIRST_TRUMP_INDEX[play_id], play_id, 0)
+    if DEFEATS_MASKS[trump_index][winning_id] >> play_id & 1:
+        if IS_ESCAPE[winning_id]:
+            # The first non-escape played
+            trump_index = FIRST_TRUMP_INDEX[play_id]
+        return (trump_index, play_id, position)
+    return (trump_index, winning_id, winning_position)
@@ -1,44 +1,48 @@
 #!/usr/bin/env python3
 
-import numpy as np
-import time
-
 from card import *
+from card_table import REFERENCE_CARDS
+from seeding import new_rng
 
 ALL_SUITS = (Suit.JollyRoger, Suit.Parrot, Suit.TreasureChest, Suit.TreasureMap)
-MAX_SUIT_NUMBER = 14
-NUM_PIRATE_CARDS = 5
-NUM_MERMAID_CARDS = 2
-NUM_SKULL_KING_CARDS = 1
-NUM_ESCAPE_CARDS = 5
-NUM_TIGRESS_CARDS = 1
 DECK_SIZE = len(ALL_SUITS) * MAX_SUIT_NUMBER + NUM_PIRATE_CARDS + NUM_MERMAID_CARDS + NUM_SKULL_KING_CARDS + NUM_ESCAPE_CARDS + NUM_TIGRESS_CARDS
 
+# The ids of a new deck's cards before any shuffle, in the same order as
+# Deck.unshuffled_cards.
+DECK_CARD_IDS = tuple([suit_card_id(suit, i) for i in range(1, MAX_SUIT_NUMBER + 1) for suit in ALL_SUITS]\
+        + list(range(PIRATE_FIRST_ID, PIRATE_FIRST_ID + NUM_PIRATE_CARDS))\
+        + list(range(MERMAID_FIRST_ID, MERMAID_FIRST_ID + NUM_MERMAID_CARDS))\
+        + [SKULL_KING_ID]\
+        + list(range(ESCAPE_FIRST_ID, ESCAPE_FIRST_ID + NUM_ESCAPE_CARDS))\
+        + [TIGRESS_ID])
+
 def choose_num_cards(num_players, round_number, deck_size):
     if num_players * round_number <= deck_size:
         return round_number
     return int(deck_size / num_players)
 
 class Deck():
-    def __init__(self, shuffle=False):
-        self.cards = []
-        for i in range(1, MAX_SUIT_NUMBER + 1):
-            for suit in ALL_SUITS:
-                self.cards.append(SuitCard(suit, i))
-        self.cards = self.cards + [PirateCard() for _ in range(NUM_PIRATE_CARDS)]
-        self.cards = self.cards + [MermaidCard() for _ in range(NUM_MERMAID_CARDS)]
-        self.cards = self.cards + [SkullKingCard() for _ in range(NUM_SKULL_KING_CARDS)]
-        self.cards = self.cards + [EscapeCard() for _ in range(NUM_ESCAPE_CARDS)]
-        self.cards = self.cards + [TigressCard() for _ in range(NUM_TIGRESS_CARDS)]
+    def __init__(self, shuffle=False, rng=None):
+        """
+        rng is the numpy Generator used to shuffle. Without one the deck
+        is seeded from fresh entropy.
+        """
+        if rng == None:
+            rng = new_rng()
+        self.rng = rng
+        # Every deck shares the same card objects, and shuffles always start
+        # from this order, so the result of a shuffle only depends on the
+        # state of rng.
+        self.unshuffled_cards = tuple(REFERENCE_CARDS[card_id] for card_id in DECK_CARD_IDS)
+        self.cards = list(self.unshuffled_cards)
 
         if shuffle:
             self.shuffle()
         self.shuffled = shuffle
 
     def shuffle(self):
-        rng_seed = int(time.time() * 10000)
-        rng = np.random.default_rng(seed=rng_seed)
-        rng.shuffle(self.cards)
+        order = self.rng.permutation(len(self.cards))
+        self.cards = [self.unshuffled_cards[i] for i in order]
         self.shuffled = True
 
     def print_deck(self):
@@ -50,3 +54,47 @@ class Deck():
             raise ValueError("Cannot deal unshuffled deck.")
         num_cards = choose_num_cards(num_players, round_number, DECK_SIZE)
         return [[self.cards[num_players * i + j] for i in range(num_cards)] for j in range(num_players)]
+
+    def hands_from_card_ids(self, card_ids):
+        """
+        The cards for hands of card ids, like one game of a BatchDealer
+        deal, so a Game can play a round dealt in a batch.
+        """
+        return [[REFERENCE_CARDS[card_id] for card_id in hand] for hand in card_ids]
+
+class BatchDealer():
+    """
+    Deals a round of many games at once, as a (games x players x cards)
+    array of card ids laid out like Deck.deal.
+    Given rngs, one Generator per game, every game is shuffled exactly
+    like a Deck using that Generator, so the deals are the same as Game's.
+    Given a single rng instead, all the games are shuffled together by
+    sorting random keys, which is much faster but deals different cards.
+    """
+    def __init__(self, num_players, rngs=None, rng=None, num_games=None):
+        if (rngs == None) == (rng == None):
+            raise ValueError("A BatchDealer needs either one Generator per game or a single Generator.")
+        if rng != None and num_games == None:
+            raise ValueError("A BatchDealer with a single Generator needs the number of games.")
+        import numpy as np
+        self.num_players = num_players
+        self.rngs = rngs
+        self.rng = rng
+        self.num_games = len(rngs) if rngs != None else num_games
+        self.deck_card_ids = np.array(DECK_CARD_IDS, dtype=np.int64)
+
+    def shuffle(self):
+        """
+        A (games x DECK_SIZE) array with a permutation of the deck for
+        each game.
+        """
+        import numpy as np
+        if self.rngs != None:
+            return np.array([rng.permutation(DECK_SIZE) for rng in self.rngs])
+        return np.argsort(self.rng.random((self.num_games, DECK_SIZE)), axis=1)
+
+    def deal(self, round_number):
+        num_cards = choose_num_cards(self.num_players, round_number, DECK_SIZE)
+        dealt = self.deck_card_ids[self.shuffle()[:, :self.num_players * num_cards]]
+        # Card i of player j is the (num_players * i + j)-th card dealt
+        return dealt.reshape(self.num_games, num_cards, self.num_players).transpose(0, 2, 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+Drawing the game in a tkinter window. This is the only module that needs
+tkinter, and game.py only imports it when a game is displayed, so the
+rules and the simulations can run where there is no GUI.
+"""
+
+import tkinter as tk
+
+from card import CardCategory, Suit
+
+# (fill, outline, text color) of each suit
+SUIT_COLORS = {
+        Suit.JollyRoger: ("black", "gray", "white"),
+        Suit.Parrot: ("green", "gray", "white"),
+        Suit.TreasureMap: ("purple", "gray", "white"),
+        Suit.TreasureChest: ("yellow", "gray", "black"),
+}
+
+# (fill, outline, text, text color) of each special card
+SPECIAL_CARD_LOOKS = {
+        CardCategory.Pirate: ("red", "gray", "P", "black"),
+        CardCategory.Mermaid: ("deep sky blue", "white", "M", "black"),
+        CardCategory.SkullKing: ("black", "gold", "SK", "gold"),
+        CardCategory.Tigress: ("red", "gray", "T", "white"),
+        CardCategory.Escape: ("white", "gray", "E", "gray"),
+}
+
+WINDOW_WIDTH = 600
+WINDOW_HEIGHT = 400
+
+def draw_card(canvas, card, start_x, start_y, end_x, end_y):
+    if card.card_category == CardCategory.Suit:
+        (color, outline, text_color) = SUIT_COLORS[card.suit]
+        text = str(card.number)
+    else:
+        (color, outline, text, text_color) = SPECIAL_CARD_LOOKS[card.card_category]
+    text_size = (end_x - start_x) / 2
+    canvas.create_rectangle(start_x, start_y, end_x, end_y, fill=color, outline=outline)
+    canvas.create_text(start_x + text_size / 2, start_y + text_size / 2, text=text, fill=text_color, font=("Arial", -int(text_size), "bold"), anchor=tk.CENTER)
+
+def draw_player(canvas, player, start_x, start_y, draw_size):
+    card_width = draw_size / (len(player.hand)/1.75 + 2)
+    card_start_x = start_x + card_width
+    for card in player.hand:
+        draw_card(canvas, card, card_start_x, start_y, card_start_x + card_width, start_y + draw_size)
+        card_start_x += card_width / 2
+
+def draw_game(game):
+    """
+    Show every player's hand and wait for the space bar.
+    """
+    w = WINDOW_WIDTH
+    h = WINDOW_HEIGHT
+    root = tk.Tk()
+    root.title(game.status_string)
+    root.geometry("%dx%d" % (w, h))
+
+    def close_window(event):
+        root.destroy()
+
+    canvas = tk.Canvas(root, width=w, height=h, bg="white")
+    canvas.pack(fill=tk.BOTH, expand=True)
+
+    start_x = 0
+    player_draw_size = w / game.num_players
+    start_y = h - player_draw_size
+    for player in game.players:
+        draw_player(canvas, player, start_x, start_y, player_draw_size)
+        canvas.create_rectangle(start_x, start_y, start_x + player_draw_size, start_y + player_draw_size, fill=None, outline="black")
+        start_x += w / game.num_players
+
+    canvas.create_rectangle(200, 100, 350, 250, fill="", outline="red", width=3)
+    root.bind("<space>", close_window)
+    root.mainloop()
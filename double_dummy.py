@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+"""
+A double-dummy solver: with every hand visible, how many of the
+remaining tricks of a round can a seat be sure to win? The other players
+are assumed to work together against that seat (the usual "paranoid"
+assumption for more than two players), so the answer is what the seat
+can guarantee whatever they do.
+
+Hands are card_table bitmasks of card ids, as in Player.hand_mask, and
+the rules are the ones Trick and Player.determine_illegal_indices use.
+A player holding the Tigress can play it as a pirate or as an escape.
+Only tricks are counted, not bonus points, which lets cards that can't
+change who wins a trick be treated as one move: the pirates (and the
+Tigress as a pirate), the escapes (and the Tigress as an escape), the
+mermaids, and suit cards next to each other in a suit once the cards
+between them are gone.
+
+The search is alpha-beta over yes/no questions ("can the seat win at
+least this many tricks?"), binary searching the answer. At the start of
+every trick it checks quick bounds (specials nobody else can beat, and
+escapes nobody else can match) and a transposition table of bounds keyed
+on the leader and on who holds each remaining card. Leaders try their
+strongest card first and opponents their weakest; the seat tries to take
+the lead when following, and opponents try to take it back from the
+seat or to stay under each other.
+
+The search grows by a factor of 5 to 10 for every card in the hands. A
+full 10-card round takes well under a second for 2 players and about a
+second for 3, but 4 players are only quick near the end of a round.
+Solving every seat of a 4 player deal takes about a tenth of a second
+with 6 cards each, a second with 8 and half a minute with 9, and a full
+10-card round takes minutes or more. So full 4 player rounds can't be
+solved in seconds yet, and DoubleDummyPlayer only solves the last
+DEFAULT_ENDGAME_CARDS cards of a round unless it is given more.
+"""
+
+import argparse
+
+from card_table import *
+from deck import Deck, DECK_CARD_IDS
+from player import Player
+from seeding import to_seed_sequence, deck_rng
+
+# The card ids of each suit, weakest first
+SUIT_CARD_IDS = [list(card_ids_in_mask(SUIT_MASKS[trump_index])) for trump_index in range(NUM_TRUMP_INDICES)]
+SPECIAL_MASKS = (ESCAPE_MASK, MERMAID_MASK, PIRATE_MASK, SKULL_KING_MASK)
+ESCAPE_LIKE_MASK = ESCAPE_MASK | TIGRESS_MASK
+
+def beaten_whenever_played(card_id, play_id):
+    """
+    True if play_id wins against card_id (played either way for the
+    Tigress) whichever is played first and whatever the trump.
+    """
+    plays = (TIGRESS_ID, TIGRESS_ESCAPE_ID) if card_id == TIGRESS_ID else (card_id,)
+    for trump_index in range(NUM_TRUMP_INDICES):
+        for other_id in plays:
+            if not DEFEATS[trump_index][play_id][other_id] or DEFEATS[trump_index][other_id][play_id]:
+                return False
+    return True
+
+# The specials that can always be played, and for each one the cards it
+# wins against whenever it is played. A special is a sure trick if
+# nobody else holds a card outside its mask.
+SURE_CANDIDATES_MASK = MERMAID_MASK | PIRATE_MASK | TIGRESS_MASK | SKULL_KING_MASK
+SURE_AGAINST_MASKS = [card_mask(other_id for other_id in DECK_CARD_IDS if other_id != card_id and beaten_whenever_played(other_id, card_id))\
+        if SURE_CANDIDATES_MASK >> card_id & 1 else 0 for card_id in range(NUM_CARD_IDS)]
+
+# Orders to try moves in
+WIN_FIRST = 0 # Cards that would take the lead, weakest first, then the rest
+DUCK_FIRST = 1 # Cards that wouldn't take the lead, weakest first, then the rest
+WEAKEST_FIRST = 2
+STRONGEST_FIRST = 3
+
+# DoubleDummyPlayer only solves hands with at most this many cards
+DEFAULT_ENDGAME_CARDS = 6
+
+# Cards in the same group are compared by rank within the group for
+# transposition keys: the suits (by trump index), then the copies of the
+# escape, mermaid and pirate, the Tigress and the Skull King.
+COPY_GROUPS = (NUM_TRUMP_INDICES, NUM_TRUMP_INDICES + 1, NUM_TRUMP_INDICES + 2)
+NUM_GROUPS = NUM_TRUMP_INDICES + 5
+CARD_GROUP = [CARD_SUIT_INDEX[card_id] if CARD_SUIT_INDEX[card_id] != NO_TRUMP\
+        else NUM_TRUMP_INDICES if ESCAPE_MASK >> card_id & 1\
+        else NUM_TRUMP_INDICES + 1 if MERMAID_MASK >> card_id & 1\
+        else NUM_TRUMP_INDICES + 2 if PIRATE_MASK >> card_id & 1\
+        else NUM_TRUMP_INDICES + 3 if card_id == TIGRESS_ID\
+        else NUM_TRUMP_INDICES + 4 for card_id in range(NUM_CARD_IDS)]
+
+def transposition_key(hands):
+    """
+    Which player holds each remaining card, in order of rank within each
+    group. Two positions with the same key play out the same way as far
+    as tricks go, even if different cards have been played before.
+    """
+    owners = [[] for _ in range(NUM_GROUPS)]
+    remaining_mask = 0
+    for hand in hands:
+        remaining_mask |= hand
+    while remaining_mask:
+        low_bit = remaining_mask & -remaining_mask
+        card_id = low_bit.bit_length() - 1
+        remaining_mask ^= low_bit
+        for player in range(len(hands)):
+            if hands[player] & low_bit:
+                owners[CARD_GROUP[card_id]].append(player)
+                break
+    for group in COPY_GROUPS:
+        owners[group].sort()
+    key = bytearray()
+    for group_owners in owners:
+        key += bytes(group_owners)
+        key.append(255)
+    return bytes(key)
+
+class TrickState():
+    """
+    The cards played so far in the current trick, as play ids in order.
+    """
+    def __init__(self, played=()):
+        self.trump_index = NO_TRUMP
+        self.winning_id = -1
+        self.winning_position = 0
+        self.card_mask = 0
+        for (position, play_id) in enumerate(played):
+            self.play(position, play_id)
+
+    def play(self, position, play_id):
+        self.card_mask |= 1 << (TIGRESS_ID if play_id == TIGRESS_ESCAPE_ID else play_id)
+        (self.trump_index, self.winning_id, self.winning_position) = advance_trick(self.trump_index, self.winning_id,\
+                self.winning_position, position, play_id)
+
+class DoubleDummySolver():
+    def __init__(self):
+        # (seat, leader, transposition_key) -> (lower, upper) bounds on the
+        # tricks the seat can win from the start of a trick
+        self.transpositions = {}
+        self.nodes = 0
+
+    def clear(self):
+        self.transpositions.clear()
+
+    def moves(self, hand_mask, trump_index, winning_id, position, remaining_mask, order=WIN_FIRST):
+        """
+        The (card id, play id) moves worth trying, one for each group of
+        cards that play the same, in one of the orders above. A leader's
+        moves are only ever weakest or strongest first.
+        """
+        legal = legal_mask(hand_mask, trump_index)
+        moves = []
+        for special_mask in SPECIAL_MASKS:
+            if legal & special_mask:
+                card_id = lowest_card_id(legal & special_mask)
+                moves.append((card_id, card_id))
+        if legal & TIGRESS_MASK:
+            if not legal & PIRATE_MASK:
+                moves.append((TIGRESS_ID, TIGRESS_ID))
+            if not legal & ESCAPE_MASK:
+                moves.append((TIGRESS_ID, TIGRESS_ESCAPE_ID))
+        suit_cards = legal & ALL_SUIT_CARDS_MASK
+        if suit_cards:
+            for trump in range(1, NUM_TRUMP_INDICES):
+                if suit_cards & SUIT_MASKS[trump]:
+                    # Only the first card of each run in the suit
+                    previous_is_ours = False
+                    for card_id in SUIT_CARD_IDS[trump]:
+                        if remaining_mask >> card_id & 1:
+                            is_ours = hand_mask >> card_id & 1 == 1
+                            if is_ours and not previous_is_ours:
+                                moves.append((card_id, card_id))
+                            previous_is_ours = is_ours
+        moves.sort(key=lambda move: move[1])
+        if order == STRONGEST_FIRST:
+            moves.reverse()
+            return moves
+        if order == WEAKEST_FIRST or position == 0:
+            return moves
+        beats = DEFEATS_MASKS[trump_index][winning_id]
+        winning = [move for move in moves if beats >> move[1] & 1]
+        losing = [move for move in moves if not beats >> move[1] & 1]
+        if order == DUCK_FIRST:
+            return losing + winning
+        return winning + losing
+
+    def search(self, hands, leader, position, trick, seat, goal):
+        """
+        True if seat can win at least goal of the remaining tricks
+        (counting the current one).
+        """
+        self.nodes += 1
+        num_players = len(hands)
+        player = (leader + position) % num_players
+        num_left = hands[player].bit_count()
+        if goal <= 0:
+            return True
+        if goal > num_left:
+            return False
+        key = None
+        if position == 0:
+            if num_left == 1 and not self.has_choices(hands):
+                return self.last_trick_winner(hands, leader) == seat
+            (lower, upper) = self.quick_bounds(hands, seat)
+            if lower >= goal:
+                return True
+            if upper < goal:
+                return False
+            key = (seat, leader, transposition_key(hands))
+            bounds = self.transpositions.get(key)
+            if bounds != None:
+                if bounds[0] >= goal:
+                    return True
+                if bounds[1] < goal:
+                    return False
+        remaining_mask = trick.card_mask
+        for hand in hands:
+            remaining_mask |= hand
+        hand_mask = hands[player]
+        maximizing = player == seat
+        result = not maximizing
+        # Don't try to take a trick a partner is already winning first
+        if maximizing:
+            order = STRONGEST_FIRST if position == 0 else WIN_FIRST
+        elif position == 0:
+            order = WEAKEST_FIRST
+        elif position < (seat - leader) % num_players:
+            order = WEAKEST_FIRST
+        elif (leader + trick.winning_position) % num_players == seat:
+            order = WIN_FIRST
+        else:
+            order = DUCK_FIRST
+        for (card_id, play_id) in self.moves(hand_mask, trick.trump_index, trick.winning_id, position, remaining_mask, order):
+            hands[player] = hand_mask & ~(1 << card_id)
+            saved = (trick.trump_index, trick.winning_id, trick.winning_position, trick.card_mask)
+            trick.play(position, play_id)
+            if position == num_players - 1:
+                winner = (leader + trick.winning_position) % num_players
+                next_goal = goal - 1 if winner == seat else goal
+                found = self.search(hands, winner, 0, TrickState(), seat, next_goal)
+            else:
+                found = self.search(hands, leader, position + 1, trick, seat, goal)
+            (trick.trump_index, trick.winning_id, trick.winning_position, trick.card_mask) = saved
+            hands[player] = hand_mask
+            if found == maximizing:
+                result = found
+                break
+        if key != None:
+            (lower, upper) = self.transpositions.get(key, (0, num_left))
+            if result:
+                lower = max(lower, goal)
+            else:
+                upper = min(upper, goal - 1)
+            self.transpositions[key] = (lower, upper)
+        return result
+
+    def quick_bounds(self, hands, seat):
+        """
+        Bounds on the tricks seat can win from the start of a trick that
+        don't need a search. Specials that win whenever they are played
+        are sure tricks for whoever holds them (only one player can hold
+        any), and an escape only wins a trick if everybody else plays an
+        escape too.
+        """
+        all_mask = 0
+        for hand in hands:
+            all_mask |= hand
+        num_sure = 0
+        num_others_sure = 0
+        fewest_escapes = len(DECK_CARD_IDS)
+        for (player, hand) in enumerate(hands):
+            others_mask = all_mask & ~hand
+            specials = hand & SURE_CANDIDATES_MASK
+            while specials:
+                low_bit = specials & -specials
+                specials ^= low_bit
+                if others_mask & ~SURE_AGAINST_MASKS[low_bit.bit_length() - 1] == 0:
+                    if player == seat:
+                        num_sure += 1
+                    else:
+                        num_others_sure += 1
+            if player != seat:
+                fewest_escapes = min(fewest_escapes, (hand & ESCAPE_LIKE_MASK).bit_count())
+        num_left = hands[seat].bit_count()
+        num_escapes = (hands[seat] & ESCAPE_MASK).bit_count()
+        upper = min(num_left - num_others_sure, num_left - num_escapes + min(num_escapes, fewest_escapes))
+        return (num_sure, upper)
+
+    def has_choices(self, hands):
+        """
+        True if some player has a choice for their last card, which is
+        only how to play the Tigress.
+        """
+        for hand in hands:
+            if hand & TIGRESS_MASK:
+                return True
+        return False
+
+    def last_trick_winner(self, hands, leader):
+        num_players = len(hands)
+        trick = TrickState()
+        for position in range(num_players):
+            trick.play(position, lowest_card_id(hands[(leader + position) % num_players]))
+        return (leader + trick.winning_position) % num_players
+
+    def tricks(self, hands, leader, seat, played=()):
+        """
+        The most tricks seat can be sure to win from here, counting the
+        current trick. hands are the hand masks by player index, leader
+        led the current trick and played are the play ids played in it
+        so far (by leader, then the players after it).
+        """
+        hands = list(hands)
+        num_players = len(hands)
+        player = (leader + len(played)) % num_players
+        low = 0
+        high = hands[player].bit_count()
+        while low < high:
+            goal = (low + high + 1) // 2
+            if self.search(hands, leader, len(played), TrickState(played), seat, goal):
+                low = goal
+            else:
+                high = goal - 1
+        return low
+
+    def all_tricks(self, hands, leader, played=()):
+        return [self.tricks(hands, leader, seat, played) for seat in range(len(hands))]
+
+    def best_move(self, hands, leader, played=()):
+        """
+        The (card id, play id, tricks) that keeps the most tricks the player
+        to move can be sure of. Moves are checked in the order search tries
+        them, so the first one that keeps that many is returned.
+        """
+        hands = list(hands)
+        num_players = len(hands)
+        position = len(played)
+        player = (leader + position) % num_players
+        tricks = self.tricks(hands, leader, player, played)
+        trick = TrickState(played)
+        remaining_mask = trick.card_mask
+        for hand in hands:
+            remaining_mask |= hand
+        hand_mask = hands[player]
+        moves = self.moves(hand_mask, trick.trump_index, trick.winning_id, position, remaining_mask)
+        for (card_id, play_id) in moves:
+            hands[player] = hand_mask & ~(1 << card_id)
+            child = TrickState(played)
+            child.play(position, play_id)
+            if position == num_players - 1:
+                winner = (leader + child.winning_position) % num_players
+                found = self.search(hands, winner, 0, TrickState(), player, tricks - (1 if winner == player else 0))
+            else:
+                found = self.search(hands, leader, position + 1, child, player, tricks)
+            hands[player] = hand_mask
+            if found:
+                return (card_id, play_id, tricks)
+        return moves[0] + (tricks,)
+
+class DoubleDummyPlayer(Player):
+    """
+    An expert that looks at everybody's hand. Once the hands are down to
+    max_cards and it still needs tricks for its bid, it plays the card the
+    solver says keeps the most tricks it can be sure of; otherwise it
+    plays like Player. With 4 players a decision takes about a tenth of
+    a second at 6 cards but seconds at 8 and minutes at 10, so the
+    default only solves the endgame, and earlier in a round it is no
+    better than Player.
+    """
+    def __init__(self, rng=None, solver=None, max_cards=DEFAULT_ENDGAME_CARDS):
+        super().__init__(rng)
+        self.solver = solver if solver != None else DoubleDummySolver()
+        self.max_cards = max_cards
+
+    def get_hand(self, hand):
+        super().get_hand(hand)
+        # Positions from earlier rounds can't come up again
+        self.solver.clear()
+
+    def choose_and_play_card(self, trick, num_players):
+        if self.tricks_won >= self.bid or len(self.hand) > self.max_cards:
+            return super().choose_and_play_card(trick, num_players)
+        hands = [player.hand_mask for player in trick.players]
+        played = [card.play_id for card in trick.cards_played]
+        (_, play_id, _) = self.solver.best_move(hands, trick.leading_player_index, played)
+        return self.play_move(play_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deal a round and show how many tricks each seat can be sure of with every hand visible.")
+    parser.add_argument("-n", "--num-players", type=int, required=True, help="How many players the game has")
+    parser.add_argument("--round", type=int, default=10, help="Which round to deal")
+    parser.add_argument("--seed", type=int, required=False, help="Seed for the deal")
+    args = parser.parse_args()
+
+    deck = Deck(shuffle=True, rng=deck_rng(to_seed_sequence(args.seed)))
+    hands = deck.deal(args.num_players, args.round)
+    hand_masks = [card_mask(card.card_id for card in hand) for hand in hands]
+    solver = DoubleDummySolver()
+    for (seat, hand) in enumerate(hands):
+        tricks = solver.tricks(hand_masks, 0, seat)
+        print("Player %d can be sure of %d tricks with %s." % (seat, tricks, ", ".join(str(card) for card in sorted(hand, key=lambda card: card.card_id))))
+    print("Searched %d positions." % (solver.nodes))
+
+if __name__ == "__main__":
+    main()
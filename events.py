@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""
+Events published by a Game as it is played. Printing, writing games to
+files, metrics and the display all subscribe to the events they need
+instead of being wired into the game loop. The game checks whether an
+event type has any subscribers before it makes the event, so a game
+played with nobody listening (like in batch simulations) does no work
+for events at all.
+"""
+
+GAME_STARTED = "game_started"
+DEAL = "deal"
+BIDS = "bids"
+TRICK_STARTED = "trick_started"
+TURN_STARTED = "turn_started"
+CARD_PLAYED = "card_played"
+TRICK_WON = "trick_won"
+ROUND_SCORED = "round_scored"
+GAME_FINISHED = "game_finished"
+EVENT_TYPES = (GAME_STARTED, DEAL, BIDS, TRICK_STARTED, TURN_STARTED, CARD_PLAYED, TRICK_WON, ROUND_SCORED, GAME_FINISHED)
+
+class GameStartedEvent():
+    def __init__(self, game_index):
+        self.game_index = game_index
+
+class DealEvent():
+    def __init__(self, round_number, dealer_index, hands):
+        self.round_number = round_number
+        self.dealer_index = dealer_index
+        self.hands = hands
+
+class BidsEvent():
+    def __init__(self, round_number, bids):
+        self.round_number = round_number
+        self.bids = bids
+
+class TrickStartedEvent():
+    def __init__(self, round_number, trick_number, leader_index):
+        self.round_number = round_number
+        self.trick_number = trick_number
+        self.leader_index = leader_index
+
+class TurnStartedEvent():
+    """
+    Published right before a player chooses a card, so the hand it
+    chooses from can still be seen.
+    """
+    def __init__(self, round_number, player_index, player):
+        self.round_number = round_number
+        self.player_index = player_index
+        self.player = player
+
+class CardPlayedEvent():
+    def __init__(self, round_number, player_index, card):
+        self.round_number = round_number
+        self.player_index = player_index
+        self.card = card
+
+class TrickWonEvent():
+    """
+    The game plays every trick with the same Trick, so cards_played is
+    emptied for the next trick. Copy it to keep it past the callback.
+    """
+    def __init__(self, round_number, trick_number, leader_index, cards_played, winner_index):
+        self.round_number = round_number
+        self.trick_number = trick_number
+        self.leader_index = leader_index
+        self.cards_played = cards_played
+        self.winner_index = winner_index
+
+class RoundScoredEvent():
+    """
+    tricks_won and points are for this round, scores are the totals after it.
+    """
+    def __init__(self, round_number, tricks_won, points, scores):
+        self.round_number = round_number
+        self.tricks_won = tricks_won
+        self.points = points
+        self.scores = scores
+
+class GameFinishedEvent():
+    def __init__(self, game_index, scores):
+        self.game_index = game_index
+        self.scores = scores
+
+class EventBus():
+    """
+    subscribers[event_type] is the list of callbacks for that type, each
+    called with the event in the order they subscribed. The lists are
+    never replaced, so the game can hold on to them and check them with
+    a plain truth test.
+    """
+    def __init__(self):
+        self.subscribers = {event_type : [] for event_type in EVENT_TYPES}
+
+    def subscribe(self, event_type, callback):
+        self.subscribers[event_type].append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        self.subscribers[event_type].remove(callback)
+
+    def has_subscribers(self, event_type):
+        return len(self.subscribers[event_type]) > 0
+
+    def publish(self, event_type, event):
+        for callback in self.subscribers[event_type]:
+            callback(event)
+
+class Subscriber():
+    """
+    Base class for things that listen to several event types. callbacks()
+    maps each event type to the method that handles it.
+    """
+    def callbacks(self):
+        return {}
+
+    def subscribe(self, event_bus):
+        for (event_type, callback) in self.callbacks().items():
+            event_bus.subscribe(event_type, callback)
+
+    def unsubscribe(self, event_bus):
+        for (event_type, callback) in self.callbacks().items():
+            event_bus.unsubscribe(event_type, callback)
+
+class GameWriterSubscriber(Subscriber):
+    """
+    Records the game with a GameWriter, JsonLinesGameWriter or
+    BinaryGameWriter.
+    """
+    def __init__(self, game_writer):
+        self.game_writer = game_writer
+
+    def callbacks(self):
+        return {GAME_STARTED : self.game_started, DEAL : self.deal, BIDS : self.bids, TRICK_WON : self.trick_won,\
+                ROUND_SCORED : self.round_scored, GAME_FINISHED : self.game_finished}
+
+    def game_started(self, event):
+        self.game_writer.start_game(event.game_index)
+
+    def deal(self, event):
+        self.game_writer.add_hands(event.round_number, event.hands)
+
+    def bids(self, event):
+        self.game_writer.add_bids(event.round_number, event.bids)
+
+    def trick_won(self, event):
+        self.game_writer.add_trick(event.round_number, event.leader_index, event.cards_played, event.winner_index)
+
+    def round_scored(self, event):
+        self.game_writer.add_scores(event.round_number, list(event.scores))
+
+    def game_finished(self, event):
+        self.game_writer.finish_game(event.scores)
+
+class ConsolePrinter(Subscriber):
+    """
+    Prints what happens in a game. Each flag turns on one kind of output,
+    like the --print-* options of game.py.
+    """
+    def __init__(self, players, print_bids, print_trick_results, print_dealer, print_scores_each_round, print_played_cards,\
+            print_hands_before_playing):
+        self.players = players
+        self.print_bids = print_bids
+        self.print_trick_results = print_trick_results
+        self.print_dealer = print_dealer
+        self.print_scores_each_round = print_scores_each_round
+        self.print_played_cards = print_played_cards
+        self.print_hands_before_playing = print_hands_before_playing
+
+    def callbacks(self):
+        callbacks = {}
+        if self.print_dealer:
+            callbacks[DEAL] = self.deal
+        if self.print_bids:
+            callbacks[BIDS] = self.bids
+        if self.print_trick_results:
+            callbacks[TRICK_STARTED] = self.trick_started
+            callbacks[TRICK_WON] = self.trick_won
+        if self.print_hands_before_playing:
+            callbacks[TURN_STARTED] = self.turn_started
+        if self.print_played_cards:
+            callbacks[CARD_PLAYED] = self.card_played
+        if self.print_scores_each_round:
+            callbacks[ROUND_SCORED] = self.round_scored
+        return callbacks
+
+    def deal(self, event):
+        print("Player %d is dealing round %d." % (event.dealer_index, event.round_number))
+
+    def bids(self, event):
+        for i in range(len(event.bids)):
+            print("Player %d bids %d (%s)." % (i, event.bids[i], self.players[i].print_hand()))
+
+    def trick_started(self, event):
+        print("Player %d is leading the trick." % (event.leader_index))
+
+    def turn_started(self, event):
+        print("Player %d's hand: %s." % (event.player_index, event.player.print_hand()))
+
+    def card_played(self, event):
+        print("Player %d plays %s." % (event.player_index, str(event.card)))
+
+    def trick_won(self, event):
+        print("Player %d wins trick %d." % (event.winner_index, event.trick_number))
+        print("-------------------------------")
+
+    def round_scored(self, event):
+        for i in range(len(event.scores)):
+            print("Player %d won %d tricks, scoring %d points, and now has %d." % (i, event.tricks_won[i], event.points[i], event.scores[i]))
+            print("======================================")
+
+class DisplaySubscriber(Subscriber):
+    """
+    Draws the hands in a window after each bid. Closing the window
+    (with the space bar) lets the game go on.
+    """
+    def __init__(self, game):
+        self.game = game
+
+    def callbacks(self):
+        return {BIDS : self.bids}
+
+    def bids(self, event):
+        for i in range(len(event.bids)):
+            self.game.status_string = "Player %d bids %d (%s)." % (i, event.bids[i], self.game.players[i].print_hand())
+            self.game.draw()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Exact trick distributions for the first rounds, made offline by playing
+every possible deal of the other hands instead of a random sample. For
+each number of players, seat and canonical hand (see canonical.py), the
+round is played out against all the other players' hands with the
+built-in strategy (through lockstep), once for every bid, and the counts
+are stored as a TrickDistribution whose num_samples is the number of
+deals. A TrickDistributionService given the tables answers those hands
+from them without simulating anything.
+
+The number of deals grows very fast: one card each is 69 deals for 2
+players, 4692 for 3 and 314,364 for 4, while two cards each is 2278
+deals for 2 players but almost 5 million for 3. Tables are only made
+when a hand has at most max_deals deals, which by default covers round 1
+for 2 to 4 players and round 2 for 2 players.
+
+Those default tables are kept in exact_tables.json next to this file,
+made with
+    python exact_tables.py -n 2 3 4
+and a TrickDistributionService loads them once per process unless it is
+given other tables.
+
+Renamed hands share their canonical hand's entry. That is exact for the
+rules, but the built-in strategy breaks ties between equal cards of
+different plain suits by card id, so for a renamed hand of two or more
+cards it is exact only up to those ties.
+"""
+
+import argparse
+import itertools
+from math import comb
+import os
+
+from bidding import distribution_of_deals, read_distributions, write_distributions
+from canonical import canonical_hand
+from card_table import card_ids_in_mask, card_mask
+from deck import DECK_CARD_IDS, DECK_SIZE
+
+DEFAULT_MAX_DEALS = 1000000
+DEFAULT_ROUND_NUMBERS = (1, 2)
+DEFAULT_EXACT_TABLES_FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exact_tables.json")
+
+# The default tables, once they have been loaded
+default_tables = None
+
+def num_deals(num_players, num_cards):
+    """
+    How many ways the other players can be dealt their hands.
+    """
+    count = 1
+    num_left = DECK_SIZE - num_cards
+    for _ in range(num_players - 1):
+        count *= comb(num_left, num_cards)
+        num_left -= num_cards
+    return count
+
+def all_deals(num_rest, num_others, num_cards):
+    """
+    Every way to deal num_others hands of num_cards from num_rest cards,
+    as a (deals x num_others x num_cards) array of positions in the rest
+    of the deck. Cards in a hand are in increasing order.
+    """
+    import numpy as np
+    deals = [()]
+    for _ in range(num_others):
+        next_deals = []
+        for deal in deals:
+            used = set(position for hand in deal for position in hand)
+            left = [position for position in range(num_rest) if not position in used]
+            for hand in itertools.combinations(left, num_cards):
+                next_deals.append(deal + (hand,))
+        deals = next_deals
+    return np.array(deals, dtype=np.int64).reshape(len(deals), num_others, num_cards)
+
+def canonical_hands(num_cards):
+    """
+    The canonical masks of all hands of num_cards, in increasing order.
+    """
+    return sorted(set(canonical_hand(card_mask(hand)) for hand in itertools.combinations(DECK_CARD_IDS, num_cards)))
+
+def exact_distributions(num_players, round_number, max_deals=DEFAULT_MAX_DEALS):
+    """
+    (key, TrickDistribution) for every seat and canonical hand of a round,
+    with keys like TrickDistributionService's.
+    """
+    import numpy as np
+    num_cards = round_number
+    if num_deals(num_players, num_cards) > max_deals:
+        raise ValueError("Round %d with %d players has %d deals per hand, more than the limit of %d."\
+                % (round_number, num_players, num_deals(num_players, num_cards), max_deals))
+    positions = all_deals(DECK_SIZE - num_cards, num_players - 1, num_cards)
+    distributions = []
+    for hand_mask in canonical_hands(num_cards):
+        hand = list(card_ids_in_mask(hand_mask))
+        rest = np.array([card_id for card_id in DECK_CARD_IDS if not hand_mask >> card_id & 1], dtype=np.int64)
+        others = rest[positions]
+        for seat in range(num_players):
+            distributions.append(((num_players, seat, round_number, hand_mask), distribution_of_deals(hand, others, seat, round_number)))
+    return distributions
+
+def build_exact_tables(num_players_list, round_numbers=DEFAULT_ROUND_NUMBERS, max_deals=DEFAULT_MAX_DEALS):
+    """
+    The exact distributions of every round and player count that fits in
+    max_deals. The rest are skipped.
+    """
+    distributions = []
+    for num_players in num_players_list:
+        for round_number in round_numbers:
+            if num_deals(num_players, round_number) <= max_deals:
+                distributions += exact_distributions(num_players, round_number, max_deals)
+    return distributions
+
+def load_exact_tables(filepath=DEFAULT_EXACT_TABLES_FILEPATH):
+    """
+    The tables in a file written by this script, for the exact_tables of
+    a TrickDistributionService.
+    """
+    return dict(read_distributions(filepath)[1])
+
+def default_exact_tables():
+    """
+    The tables in DEFAULT_EXACT_TABLES_FILEPATH, read the first time they
+    are asked for, or no tables if the file is missing.
+    """
+    global default_tables
+    if default_tables == None:
+        if os.path.exists(DEFAULT_EXACT_TABLES_FILEPATH):
+            default_tables = load_exact_tables(DEFAULT_EXACT_TABLES_FILEPATH)
+        else:
+            default_tables = {}
+    return default_tables
+
+def main():
+    parser = argparse.ArgumentParser(description="Make exact trick distributions for the first rounds by playing every deal.")
+    parser.add_argument("-n", "--num-players", type=int, nargs="+", required=True, help="The numbers of players to make tables for")
+    parser.add_argument("--rounds", type=int, nargs="+", default=list(DEFAULT_ROUND_NUMBERS), help="The rounds to make tables for")
+    parser.add_argument("--max-deals", type=int, default=DEFAULT_MAX_DEALS, help="Skip rounds with more deals per hand than this")
+    parser.add_argument("--output-filepath", default=DEFAULT_EXACT_TABLES_FILEPATH, help="Where to write the tables (defaults to the tables services load)")
+    args = parser.parse_args()
+
+    for num_players in args.num_players:
+        for round_number in args.rounds:
+            if num_deals(num_players, round_number) > args.max_deals:
+                print("Skipping round %d with %d players: %d deals per hand." % (round_number, num_players, num_deals(num_players, round_number)))
+    distributions = build_exact_tables(args.num_players, args.rounds, args.max_deals)
+    write_distributions(args.output_filepath, distributions)
+    print("Wrote %d exact distributions to %s." % (len(distributions), args.output_filepath))
+
+if __name__ == "__main__":
+    main()
@@ -1,143 +1,224 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
-import tkinter as tk
+import time
 
+from card_counter import CardCounter
 from deck import *
-from game_writer import GameWriter
+from events import *
+from game_writer import GameWriter, JsonLinesGameWriter
+from latency import BID_DECISION, CARD_DECISION, DecisionTimer, print_decision_latencies
 from player import *
+from seeding import deck_rng, seat_rng, to_seed_sequence
+from strategies import DEFAULT_STRATEGY, make_player, parse_seats
 from trick import *
 
-def points_from_round(players, bids, tricks_won, round_number):
+def points_for_bid(bid, tricks_won, bonus_won, round_number):
     """
-    These 3 lists need to be in sync.
+    One player's points for a round.
+    """
+    if bid == 0:
+        if tricks_won == 0:
+            return 10 * round_number
+        else:
+            return -10 * round_number
+    elif bid != tricks_won:
+        return -20 * abs(bid - tricks_won)
+    else:
+        return 20 * bid + bonus_won
+
+def points_from_round(players, bids, tricks_won, bonus_won, round_number):
+    """
+    These 4 lists need to be in sync. tricks_won is how many tricks each
+    player won and bonus_won is the bonus_points of those tricks.
     """
     points_per_player = []
     for i in range(len(players)):
-        if bids[i] == 0:
-            if len(tricks_won[i]) == 0:
-                points = 10 * round_number
-            else:
-                points = -10 * round_number
-        elif bids[i] != len(tricks_won[i]):
-            points = -20 * abs(bids[i] - len(tricks_won[i]))
-        else:
-            points = 20 * bids[i]
-            for (cards, winning_card) in tricks_won[i]:
-                points += bonus_points(cards, winning_card)
+        points = points_for_bid(bids[i], tricks_won[i], bonus_won[i], round_number)
         points_per_player.append(points)
         players[i].score += points
     return points_per_player
 
 class Game():
-    def __init__(self, num_players, display, print_bids, print_trick_results, print_dealer, print_scores_each_round, print_played_cards, print_hands_before_playing):
-        self.deck = Deck(shuffle=True)
+    def __init__(self, num_players, display, print_bids, print_trick_results, print_dealer, print_scores_each_round, print_played_cards, print_hands_before_playing, seed=None, game_writer=None,\
+            count_cards=False, seats=None, decision_timer=None):
+        """
+        seed is an int or SeedSequence that determines every deal and
+        every random choice in the game. See seeding.py.
+        game_writer is a GameWriter, JsonLinesGameWriter or
+        BinaryGameWriter, or None to not record the game at all.
+        The display and print flags, and the game writer, are subscribers
+        to self.events, which anything else can subscribe to as well.
+        With count_cards, self.card_counter is a CardCounter for the round,
+        which strategies can reach through trick.card_counter. It is off
+        by default since it costs a little for every card played.
+        seats are the names of the strategies to seat (see strategies.py),
+        one per player, and every seat plays the built-in Player if it is
+        None. With a decision_timer (a latency.DecisionTimer) every bid and
+        card choice is timed and recorded under its seat's strategy.
+        """
+        self.seed_sequence = to_seed_sequence(seed)
+        self.deck = Deck(rng=deck_rng(self.seed_sequence))
         self.num_players = num_players
-        self.players = [Player() for _ in range(num_players)]
+        self.seats = list(seats) if seats != None else [DEFAULT_STRATEGY for _ in range(num_players)]
+        self.players = [make_player(self.seats[i], seat_rng(self.seed_sequence, i)) for i in range(num_players)]
+        # Every trick is played with this one Trick
+        self.trick = Trick(self.players, 0)
+        self.card_counter = CardCounter() if count_cards else None
+        self.trick.card_counter = self.card_counter
         self.dealer_index = 0
         self.scores = [0 for _ in range(num_players)]
         self.display = display
         self.status_string = "Starting game."
-        self.print_bids = print_bids
-        self.print_trick_results = print_trick_results
-        self.print_dealer = print_dealer
-        self.print_scores_each_round = print_scores_each_round
-        self.print_played_cards = print_played_cards
-        self.print_hands_before_playing = print_hands_before_playing
-        self.game_writer = GameWriter()
-
-    def draw(self):
-        w = 600
-        h = 400
-        root = tk.Tk()
-        root.title(self.status_string)
-        root.geometry("600x400")
+        self.events = EventBus()
+        for player in self.players:
+            if isinstance(player, Subscriber):
+                player.subscribe(self.events)
+        self.decision_timer = decision_timer
+        ConsolePrinter(self.players, print_bids, print_trick_results, print_dealer, print_scores_each_round, print_played_cards,\
+                print_hands_before_playing).subscribe(self.events)
+        if display:
+            DisplaySubscriber(self).subscribe(self.events)
+        self.game_writer_subscriber = None
+        self.game_writer = game_writer
+        self.game_index = 0
+        # The round being played, for GameState.from_game
+        self.round_number = 0
+        self.tricks_won = [0 for _ in range(num_players)]
+        self.bonus_won = [0 for _ in range(num_players)]
 
-        def close_window(event):
-            root.destroy()
+    @property
+    def game_writer(self):
+        if self.game_writer_subscriber == None:
+            return None
+        return self.game_writer_subscriber.game_writer
 
-        canvas = tk.Canvas(root, width=w, height=h, bg="white")
-        canvas.pack(fill=tk.BOTH, expand=True)
+    @game_writer.setter
+    def game_writer(self, game_writer):
+        if self.game_writer_subscriber != None:
+            self.game_writer_subscriber.unsubscribe(self.events)
+            self.game_writer_subscriber = None
+        if game_writer != None:
+            self.game_writer_subscriber = GameWriterSubscriber(game_writer)
+            self.game_writer_subscriber.subscribe(self.events)
 
-        start_x = 0
-        player_draw_size = w / self.num_players
-        start_y = h - player_draw_size
+    def reset(self, seed=None, game_index=0):
+        """
+        Get ready to play another game with the same deck and players,
+        so batch runs don't have to rebuild them for every game.
+        """
+        self.seed_sequence = to_seed_sequence(seed)
+        self.deck.rng = deck_rng(self.seed_sequence)
+        for i in range(self.num_players):
+            self.players[i].rng = seat_rng(self.seed_sequence, i)
+        self.dealer_index = 0
+        self.scores = [0 for _ in range(self.num_players)]
         for player in self.players:
-            player.draw(canvas, start_x, start_y, player_draw_size)
-            canvas.create_rectangle(start_x, start_y, start_x + player_draw_size, start_y + player_draw_size, fill=None, outline="black")
-            start_x += w / self.num_players
+            player.score = 0
+        self.status_string = "Starting game."
+        self.game_index = game_index
+
+    def draw(self):
+        # tkinter is only loaded when a game is actually displayed.
+        from display import draw_game
+        draw_game(self)
 
-        canvas.create_rectangle(200, 100, 350, 250, fill="", outline="red", width=3)
-        root.bind("<space>", close_window)
-        root.mainloop()
+    def play_round(self, round_number, hands=None):
+        """
+        hands are this round's hands to play instead of shuffling and
+        dealing the deck, like Deck.hands_from_card_ids makes from a
+        BatchDealer deal.
+        """
+        events = self.events
+        subscribers = events.subscribers
+        # The per-card event types are checked once per round instead of
+        # once per card. Their subscriber lists are never replaced.
+        turn_started_subscribers = subscribers[TURN_STARTED]
+        card_played_subscribers = subscribers[CARD_PLAYED]
+        decision_timer = self.decision_timer
 
-    def play_round(self, round_number):
         # Deal the cards and have players make bids
-        if self.print_dealer:
-            print("Player %d is dealing round %d." % (self.dealer_index, round_number))
-        self.deck.shuffle()
-        hands = self.deck.deal(self.num_players, round_number)
-        self.game_writer.add_hands(round_number, hands)
+        if hands == None:
+            self.deck.shuffle()
+            hands = self.deck.deal(self.num_players, round_number)
+        if subscribers[DEAL]:
+            events.publish(DEAL, DealEvent(round_number, self.dealer_index, hands))
+        if self.card_counter != None:
+            self.card_counter.reset()
+        leading_player_index = (self.dealer_index + 1) % self.num_players # who leads each trick
         for i in range(self.num_players):
             self.players[i].get_hand(hands[i])
-            self.players[i].make_bid(self.num_players)
+            if decision_timer == None:
+                self.players[i].make_bid(self.num_players, (i - leading_player_index) % self.num_players, round_number)
+            else:
+                start = time.perf_counter()
+                self.players[i].make_bid(self.num_players, (i - leading_player_index) % self.num_players, round_number)
+                decision_timer.record(self.seats[i], BID_DECISION, time.perf_counter() - start)
         bids = [player.bid for player in self.players]
-        self.game_writer.add_bids(round_number, bids)
-        if self.print_bids:
-            for i in range(len(bids)):
-                self.status_string = "Player %d bids %d (%s)." % (i, bids[i], self.players[i].print_hand())
-                print(self.status_string)
-                if self.display:
-                    self.draw()
-        # Corresponding to each player, we have a list of tuples (trick, winning card) representing tricks that player won
-        tricks_won = [[] for _ in range(self.num_players)]
-
-        # Do all of the tricks
-        leading_player_index = (self.dealer_index + 1) % self.num_players # who leads each trick
-        for trick_number in range(1, round_number + 1):
-            hands_before_trick = [player.hand for player in self.players]
-            if self.print_trick_results:
-                print("Player %d is leading the trick." % (leading_player_index))
-            trick = Trick(self.players, leading_player_index)
+        if subscribers[BIDS]:
+            events.publish(BIDS, BidsEvent(round_number, bids))
+        # How many tricks each player won, and the bonus points in them
+        self.round_number = round_number
+        self.tricks_won = tricks_won = [0 for _ in range(self.num_players)]
+        self.bonus_won = bonus_won = [0 for _ in range(self.num_players)]
+        trick = self.trick
+
+        # Do all of the tricks, one per card dealt (fewer than round_number
+        # when the deck runs out, see deck.choose_num_cards)
+        for trick_number in range(1, len(hands[0]) + 1):
+            if subscribers[TRICK_STARTED]:
+                events.publish(TRICK_STARTED, TrickStartedEvent(round_number, trick_number, leading_player_index))
+            trick.reset(leading_player_index)
             for i in range(self.num_players):
                 player_index = trick.card_index_to_player_index(i)
-                if self.print_hands_before_playing:
-                    print("Player %d's hand: %s." % (player_index, self.players[player_index].print_hand())) 
-                self.players[player_index].determine_illegal_indices(trick)
-                played_card = self.players[player_index].choose_and_play_card(trick, self.num_players)
+                if turn_started_subscribers:
+                    events.publish(TURN_STARTED, TurnStartedEvent(round_number, player_index, self.players[player_index]))
+                if decision_timer == None:
+                    self.players[player_index].determine_illegal_indices(trick)
+                    played_card = self.players[player_index].choose_and_play_card(trick, self.num_players)
+                else:
+                    start = time.perf_counter()
+                    self.players[player_index].determine_illegal_indices(trick)
+                    played_card = self.players[player_index].choose_and_play_card(trick, self.num_players)
+                    decision_timer.record(self.seats[player_index], CARD_DECISION, time.perf_counter() - start)
                 trick.play_card(played_card)
-                if self.print_played_cards:
-                    print("Player %d plays %s." % (player_index, str(played_card)))
+                if card_played_subscribers:
+                    events.publish(CARD_PLAYED, CardPlayedEvent(round_number, player_index, played_card))
             winning_player_index = trick.card_index_to_player_index(trick.current_winning_index)
             self.players[winning_player_index].win_trick()
-            if self.print_trick_results:
-                print("Player %d wins trick %d." % (winning_player_index, trick_number))
-                print("-------------------------------")
-            tricks_won[winning_player_index].append((trick.cards_played, trick.current_winning_card))
-            self.game_writer.add_trick(round_number, leading_player_index, hands_before_trick, trick.cards_played, winning_player_index)
+            tricks_won[winning_player_index] += 1
+            bonus_won[winning_player_index] += bonus_points(trick.cards_played, trick.current_winning_card)
+            if subscribers[TRICK_WON]:
+                events.publish(TRICK_WON, TrickWonEvent(round_number, trick_number, leading_player_index, trick.cards_played,\
+                        winning_player_index))
             leading_player_index = winning_player_index # update who leads the next trick
 
         # Give out points
-        points = points_from_round(self.players, bids, tricks_won, round_number)
+        points = points_from_round(self.players, bids, tricks_won, bonus_won, round_number)
         for i in range(self.num_players):
             self.scores[i] += points[i]
-            if self.print_scores_each_round:
-                print("Player %d won %d tricks, scoring %d points, and now has %d." % (i, len(tricks_won[i]), points[i], self.players[i].score))
-                print("======================================")
-        self.game_writer.add_scores(round_number, list(self.scores))
+        if subscribers[ROUND_SCORED]:
+            events.publish(ROUND_SCORED, RoundScoredEvent(round_number, tricks_won, points, self.scores))
 
         # Update the dealer
         self.dealer_index += 1
         self.dealer_index = self.dealer_index % self.num_players
 
     def run_game(self, output_filepath):
+        """
+        output_filepath is where to write the game as JSON. It needs a
+        GameWriter, which is made here if the game doesn't have one.
+        """
+        if output_filepath and self.game_writer == None:
+            self.game_writer = GameWriter()
+        if self.events.has_subscribers(GAME_STARTED):
+            self.events.publish(GAME_STARTED, GameStartedEvent(self.game_index))
         for i in range(1, 11):
             self.play_round(i)
+        if self.events.has_subscribers(GAME_FINISHED):
+            self.events.publish(GAME_FINISHED, GameFinishedEvent(self.game_index, self.scores))
         if output_filepath:
-            f = open(output_filepath, 'w')
-            f.write(json.dumps(self.game_writer.data))
-            f.close()
+            self.game_writer.write(output_filepath)
 
 def main():
     parser = argparse.ArgumentParser(description="Run a full 10-round skull king with only computer players.")
@@ -150,9 +231,16 @@ def main():
     parser.add_argument("--print-scores-each-round", action='store_true', help="Print each player's score after each round")
     parser.add_argument("--print-played-cards", action='store_true', help="Print the card every time a card is played")
     parser.add_argument("--print-hands-before-playing", action='store_true', help="Print the player's hand right before the player chooses a card")
-    parser.add_argument("--output-filepath", required=False, help="Output json path")
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument("--output-filepath", required=False, help="Output json path")
+    output_group.add_argument("--jsonl-filepath", required=False, help="JSON Lines file to stream the game to (appends if it exists)")
+    output_group.add_argument("--archive-filepath", required=False, help="Binary game archive to add the game to")
+    parser.add_argument("--seed", type=int, required=False, help="Seed for the deals and the players' random choices")
+    parser.add_argument("--seats", required=False, help="Comma separated strategy of each seat, like heuristic,mcts,random")
+    parser.add_argument("--print-latencies", action='store_true', help="Print how long each strategy took to decide")
 
     args = parser.parse_args()
+    seats = parse_seats(args.seats, args.num_players) if args.seats else None
 
     game = Game(args.num_players, args.display,\
             args.print_bids or args.print_all,\
@@ -160,8 +248,18 @@ def main():
             args.print_dealer or args.print_all,\
             args.print_scores_each_round or args.print_all,\
             args.print_played_cards or args.print_all,\
-            args.print_hands_before_playing or args.print_all)
+            args.print_hands_before_playing or args.print_all,\
+            args.seed, seats=seats, decision_timer=DecisionTimer() if args.print_latencies else None)
+    if args.jsonl_filepath:
+        game.game_writer = JsonLinesGameWriter(args.jsonl_filepath)
+    elif args.archive_filepath:
+        from game_archive import BinaryGameWriter
+        game.game_writer = BinaryGameWriter(args.archive_filepath, args.num_players)
     game.run_game(args.output_filepath)
+    if args.jsonl_filepath or args.archive_filepath:
+        game.game_writer.close()
+    if args.print_latencies:
+        print_decision_latencies(game.decision_timer)
 
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+A compact binary format for many games with the same number of players.
+The file is a small header followed by one fixed-size record per game,
+so an archive can be memory-mapped and read as a NumPy structured array
+without parsing anything. Each record holds the index of the game in
+its run (games from parallel workers can be in any order) and then, for
+every round:
+hands:        the card ids dealt to each player (NO_CARD pads short hands)
+bids:         each player's bid
+leaders:      the player who led each trick (NO_CARD if there was no trick)
+cards_played: the play ids of the cards in each trick, in play order
+winners:      the player who won each trick
+scores:       every player's total score at the end of the round
+"""
+
+import os
+
+import numpy as np
+
+from card_table import CARD_STRINGS
+from game_index import find_game, read_index
+from trick import resolve_tricks
+from game_writer import BIDS_KEY, HANDS_KEY, NUM_ROUNDS, SCORES_KEY, TRICKS_KEY, IndexWriter, append_to_file
+
+MAGIC = b"SKGA"
+VERSION = 1
+# magic, version, number of players, then padding
+HEADER_DTYPE = np.dtype([("magic", "S4"), ("version", "<u2"), ("num_players", "u1"), ("padding", "u1", (9,))])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+MAX_CARDS_PER_HAND = 10
+NO_CARD = 255
+
+DEFAULT_FLUSH_SIZE = 1 << 20
+
+def game_record_dtype(num_players):
+    return np.dtype([
+        ("game_index", "<u8"),
+        ("hands", "u1", (NUM_ROUNDS, num_players, MAX_CARDS_PER_HAND)),
+        ("bids", "i1", (NUM_ROUNDS, num_players)),
+        ("leaders", "u1", (NUM_ROUNDS, MAX_CARDS_PER_HAND)),
+        ("cards_played", "u1", (NUM_ROUNDS, MAX_CARDS_PER_HAND, num_players)),
+        ("winners", "u1", (NUM_ROUNDS, MAX_CARDS_PER_HAND)),
+        ("scores", "<i2", (NUM_ROUNDS, num_players)),
+    ])
+
+def is_game_archive(filepath):
+    f = open(filepath, 'rb')
+    magic = f.read(len(MAGIC))
+    f.close()
+    return magic == MAGIC
+
+def read_header(filepath):
+    header = np.fromfile(filepath, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]["magic"] != MAGIC:
+        raise ValueError("%s is not a game archive." % (filepath))
+    if header[0]["version"] != VERSION:
+        raise ValueError("%s has archive version %d, but only version %d can be read." % (filepath, header[0]["version"], VERSION))
+    return header[0]
+
+def create_archive_if_missing(filepath, num_players):
+    """
+    Write the header of a new archive, or check that an existing archive
+    is for the same number of players.
+    """
+    try:
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        if read_header(filepath)["num_players"] != num_players:
+            raise ValueError("%s is an archive of games with a different number of players." % (filepath))
+        return
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["num_players"] = num_players
+    os.write(fd, header.tobytes())
+    os.close(fd)
+
+class BinaryGameWriter():
+    """
+    Has the same methods as GameWriter, and appends each finished game to
+    an archive as one record. Records are buffered and written with single
+    appends, so several processes can add games to the same archive.
+    Where each game starts goes in a seek index (see game_index.py).
+    """
+    def __init__(self, filepath, num_players, flush_size=DEFAULT_FLUSH_SIZE):
+        create_archive_if_missing(filepath, num_players)
+        self.fd = os.open(filepath, os.O_WRONLY | os.O_APPEND)
+        self.index_writer = IndexWriter(filepath)
+        self.no_round_offsets = [0 for _ in range(NUM_ROUNDS)]
+        self.num_players = num_players
+        self.flush_size = flush_size
+        self.buffer = []
+        self.buffered_size = 0
+        self.record = np.zeros(1, dtype=game_record_dtype(num_players))
+        self.trick_index = 0
+
+    def start_game(self, game_index):
+        self.record.fill(0)
+        self.record["game_index"] = game_index
+        self.record["hands"] = NO_CARD
+        self.record["leaders"] = NO_CARD
+        self.record["cards_played"] = NO_CARD
+        self.record["winners"] = NO_CARD
+
+    def add_hands(self, round_number, hands):
+        for i in range(len(hands)):
+            self.record["hands"][0, round_number - 1, i, :len(hands[i])] = [card.card_id for card in hands[i]]
+
+    def add_bids(self, round_number, bids):
+        self.record["bids"][0, round_number - 1] = bids
+        self.trick_index = 0
+
+    def add_trick(self, round_number, starting_index, cards_played, winner_index):
+        self.record["leaders"][0, round_number - 1, self.trick_index] = starting_index
+        self.record["cards_played"][0, round_number - 1, self.trick_index] = [card.play_id for card in cards_played]
+        self.record["winners"][0, round_number - 1, self.trick_index] = winner_index
+        self.trick_index += 1
+
+    def add_scores(self, round_number, scores):
+        self.record["scores"][0, round_number - 1] = scores
+
+    def finish_game(self, scores):
+        data = self.record.tobytes()
+        self.index_writer.add_game(int(self.record["game_index"][0]), self.buffered_size, self.no_round_offsets)
+        self.buffer.append(data)
+        self.buffered_size += len(data)
+        if self.buffered_size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        buffer_start = append_to_file(self.fd, b"".join(self.buffer))
+        self.index_writer.flush(buffer_start)
+        self.buffer = []
+        self.buffered_size = 0
+
+    def close(self):
+        self.flush()
+        os.close(self.fd)
+        self.index_writer.close()
+
+class GameArchive():
+    """
+    Read-only, memory-mapped view of an archive. games is a structured
+    array with one element per game, using the fields described above.
+    """
+    def __init__(self, filepath):
+        header = read_header(filepath)
+        self.filepath = filepath
+        self.num_players = int(header["num_players"])
+        self.dtype = game_record_dtype(self.num_players)
+        num_games = (os.path.getsize(filepath) - HEADER_SIZE) // self.dtype.itemsize
+        if num_games == 0:
+            self.games = np.zeros(0, dtype=self.dtype)
+        else:
+            self.games = np.memmap(filepath, dtype=self.dtype, mode='r', offset=HEADER_SIZE, shape=(num_games,))
+
+    def __len__(self):
+        return len(self.games)
+
+    def __getitem__(self, position):
+        return self.games[position]
+
+    def find_game(self, game_index):
+        """
+        The record of the game with this game_index, found with the seek
+        index if the archive has one.
+        """
+        index = read_index(self.filepath)
+        if index is not None:
+            entry = find_game(index, game_index)
+            return self.games[(int(entry["offset"]) - HEADER_SIZE) // self.dtype.itemsize]
+        matches = np.flatnonzero(self.games["game_index"] == game_index)
+        if len(matches) == 0:
+            raise ValueError("Game %d is not in the archive." % (game_index))
+        return self.games[matches[0]]
+
+def card_ids_to_strings(card_ids):
+    return [CARD_STRINGS[card_id] for card_id in card_ids if card_id != NO_CARD]
+
+def game_record_to_round(record, round_index):
+    """
+    Convert one round of a record to the same round dictionary that
+    GameWriter makes, so tools that read JSON games can read archives too.
+    """
+    num_players = record["bids"].shape[1]
+    tricks = []
+    for trick_index in range(MAX_CARDS_PER_HAND):
+        if record["leaders"][round_index, trick_index] == NO_CARD:
+            break
+        tricks.append({"starting_index" : int(record["leaders"][round_index, trick_index]),\
+                "cards_played" : card_ids_to_strings(record["cards_played"][round_index, trick_index]),\
+                "winner_index" : int(record["winners"][round_index, trick_index])})
+    return {BIDS_KEY : record["bids"][round_index].tolist(),\
+            HANDS_KEY : [card_ids_to_strings(record["hands"][round_index, i]) for i in range(num_players)],\
+            TRICKS_KEY : tricks,\
+            SCORES_KEY : record["scores"][round_index].tolist()}
+
+def game_record_to_rounds(record):
+    return [game_record_to_round(record, round_index) for round_index in range(NUM_ROUNDS)]
+
+def rescore_games(games):
+    """
+    Work out every trick winner and every score again from the cards
+    played and the bids, for all the games in a structured array (like
+    GameArchive.games) at once. Returns (winners, scores) shaped like the
+    fields of the same names, so an archive can be checked against them.
+    """
+    num_players = games["bids"].shape[2]
+    played = games["leaders"] != NO_CARD
+    (winners, bonus) = resolve_tricks(games["cards_played"][played], games["leaders"][played])
+    all_winners = np.full(games["winners"].shape, NO_CARD, dtype=games["winners"].dtype)
+    all_winners[played] = winners
+    # tricks_won and bonus_won are (games, rounds, players)
+    won = all_winners[..., np.newaxis] == np.arange(num_players)
+    tricks_won = won.sum(axis=2)
+    all_bonus = np.zeros(played.shape, dtype=np.int32)
+    all_bonus[played] = bonus
+    bonus_won = (won * all_bonus[..., np.newaxis]).sum(axis=2)
+    bids = games["bids"].astype(np.int32)
+    round_numbers = np.arange(1, NUM_ROUNDS + 1)[np.newaxis, :, np.newaxis]
+    points = np.where(bids == tricks_won, 20 * bids + bonus_won, -20 * np.abs(bids - tricks_won))
+    points = np.where(bids == 0, np.where(tricks_won == 0, 10 * round_numbers, -10 * round_numbers), points)
+    return (all_winners, np.cumsum(points, axis=1).astype(games["scores"].dtype))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Seek indexes for game logs, so one game, round or trick can be read from
+a large JSON Lines log or game archive without reading what comes before.
+The index of a log is a file next to it (the log's path plus INDEX_SUFFIX)
+holding one fixed-size entry per game:
+game_index:    the index of the game in its run
+offset:        the byte offset in the log where the game starts
+round_offsets: the byte offset of each round's deal record in JSON Lines
+               logs (zeros for archives, which keep a game's rounds
+               together in one record)
+Writers append entries after every flush (see IndexWriter in
+game_writer.py), using the position their own append ended at, so the
+entries are right even when processes share a log.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from game_writer import BIDS_KEY, DEAL_RECORD, GAME_KEY, GAME_RECORD, HANDS_KEY, NUM_ROUNDS, RECORD_TYPE_KEY, ROUND_KEY, ROUND_RECORD,\
+        SCORES_KEY, TRICK_RECORD, TRICKS_KEY, index_filepath
+
+# The same layout as INDEX_ENTRY_FORMAT in game_writer.py
+INDEX_DTYPE = np.dtype([("game_index", "<u8"), ("offset", "<u8"), ("round_offsets", "<u8", (NUM_ROUNDS,))])
+
+def read_index(filepath):
+    """
+    The index of a log as a structured array, or None if it has none.
+    """
+    if not os.path.exists(index_filepath(filepath)):
+        return None
+    return np.fromfile(index_filepath(filepath), dtype=INDEX_DTYPE)
+
+def find_game(index, game_index):
+    matches = np.flatnonzero(index["game_index"] == game_index)
+    if len(matches) == 0:
+        raise ValueError("Game %d is not in the index." % (game_index))
+    return index[matches[0]]
+
+def is_json_lines_log(filepath):
+    f = open(filepath, 'rb')
+    first_byte = f.read(1)
+    f.close()
+    return first_byte == b"{"
+
+def read_json_lines_round(f):
+    """
+    Read one round from a JSON Lines log, starting at its deal record,
+    into the same dictionary GameWriter makes for a round.
+    """
+    record = json.loads(f.readline())
+    if record[RECORD_TYPE_KEY] != DEAL_RECORD:
+        raise ValueError("Expected a deal record but found a %s record." % (record[RECORD_TYPE_KEY]))
+    round_data = {BIDS_KEY : record[BIDS_KEY], HANDS_KEY : record[HANDS_KEY], TRICKS_KEY : []}
+    while True:
+        record = json.loads(f.readline())
+        if record[RECORD_TYPE_KEY] == TRICK_RECORD:
+            round_data[TRICKS_KEY].append({"starting_index" : record["starting_index"], "cards_played" : record["cards_played"],\
+                    "winner_index" : record["winner_index"]})
+        elif record[RECORD_TYPE_KEY] == ROUND_RECORD:
+            round_data[SCORES_KEY] = record[SCORES_KEY]
+            return round_data
+        else:
+            raise ValueError("Unexpected %s record inside a round." % (record[RECORD_TYPE_KEY]))
+
+def read_json_lines_game(filepath, offset):
+    """
+    Read the game starting at offset as a list of round dictionaries.
+    """
+    f = open(filepath, 'r')
+    f.seek(offset)
+    rounds = [read_json_lines_round(f) for _ in range(NUM_ROUNDS)]
+    if json.loads(f.readline())[RECORD_TYPE_KEY] != GAME_RECORD:
+        raise ValueError("Expected a game record after round %d." % (NUM_ROUNDS))
+    f.close()
+    return rounds
+
+def read_json_lines_round_at(filepath, offset):
+    f = open(filepath, 'r')
+    f.seek(offset)
+    round_data = read_json_lines_round(f)
+    f.close()
+    return round_data
+
+def build_json_lines_index(filepath):
+    """
+    Make an index by reading a whole JSON Lines log, for logs that were
+    written without one.
+    """
+    entries = {}
+    f = open(filepath, 'rb')
+    offset = 0
+    for line in f:
+        record = json.loads(line)
+        if record[RECORD_TYPE_KEY] == DEAL_RECORD:
+            game_index = record[GAME_KEY]
+            if record[ROUND_KEY] == 1:
+                entries[game_index] = (offset, [0 for _ in range(NUM_ROUNDS)])
+            entries[game_index][1][record[ROUND_KEY] - 1] = offset
+        offset += len(line)
+    f.close()
+    index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+    for (i, game_index) in enumerate(entries):
+        index[i]["game_index"] = game_index
+        index[i]["offset"] = entries[game_index][0]
+        index[i]["round_offsets"] = entries[game_index][1]
+    return index
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+A compact state of a game in the middle of a round, for search and
+what-if replays. Hands are card_table bitmasks of card ids, moves are
+play ids (so the Tigress is played as TIGRESS_ID or TIGRESS_ESCAPE_ID),
+and nothing in it is a Card or Player object, so copy() is a handful of
+list copies instead of a deepcopy of the game.
+
+apply(move) plays a move and undo() takes back the last one, both in
+constant time: each move pushes what it changed onto a history stack,
+and a finished trick's cards are kept with it rather than cleared.
+The rules are the ones Trick and Player.determine_illegal_indices use,
+and default_move() is the move the built-in Player strategy would make,
+as lockstep plays it.
+"""
+
+from card_table import *
+from game import points_for_bid
+from trick import bonus_points
+
+# BONUS[play_id][winning_id] is what play_id adds to bonus_points() when winning_id wins
+BONUS = [[bonus_points([card], winning_card) for winning_card in REFERENCE_CARDS] for card in REFERENCE_CARDS]
+# The play ids that count as pirates in a trick, like Trick.contains_pirate
+PLAYED_PIRATE_MASK = PIRATE_MASK | TIGRESS_MASK
+
+def card_id_of_move(move):
+    return TIGRESS_ID if move == TIGRESS_ESCAPE_ID else move
+
+class GameState():
+    """
+    hands, bids, tricks_won and bonus_won (the bonus points of the tricks
+    won) are this round's, by player index, and scores are the totals
+    from the rounds before it. leader led the current trick and played
+    are the play ids played in it so far.
+    """
+    def __init__(self, hands, bids, leader, round_number, tricks_won=None, bonus_won=None, scores=None, played=()):
+        self.num_players = len(hands)
+        self.hands = list(hands)
+        self.bids = list(bids)
+        self.round_number = round_number
+        self.tricks_won = list(tricks_won) if tricks_won != None else [0 for _ in hands]
+        self.bonus_won = list(bonus_won) if bonus_won != None else [0 for _ in hands]
+        self.scores = list(scores) if scores != None else [0 for _ in hands]
+        self.history = []
+        self.start_trick(leader)
+        for move in played:
+            self.add_to_trick(move)
+
+    @staticmethod
+    def from_game(game):
+        """
+        The state of a Game's current round, like from a subscriber to
+        its events or from a player choosing a card.
+        """
+        trick = game.trick
+        return GameState([player.hand_mask for player in game.players], [player.bid for player in game.players],\
+                trick.leading_player_index, game.round_number, game.tricks_won, game.bonus_won, game.scores,\
+                [card.play_id for card in trick.cards_played])
+
+    def copy(self):
+        """
+        The same state with its own lists, which can be played on and
+        undone separately. The entries of the history are shared, since
+        they are never changed.
+        """
+        state = GameState.__new__(GameState)
+        state.num_players = self.num_players
+        state.hands = list(self.hands)
+        state.bids = self.bids
+        state.round_number = self.round_number
+        state.tricks_won = list(self.tricks_won)
+        state.bonus_won = list(self.bonus_won)
+        state.scores = self.scores
+        state.history = list(self.history)
+        state.leader = self.leader
+        state.played = list(self.played)
+        state.played_mask = self.played_mask
+        state.trump_index = self.trump_index
+        state.winning_id = self.winning_id
+        state.winning_position = self.winning_position
+        return state
+
+    def start_trick(self, leader):
+        self.leader = leader
+        self.played = []
+        self.played_mask = 0
+        self.trump_index = NO_TRUMP
+        self.winning_id = -1
+        self.winning_position = 0
+
+    def player_to_move(self):
+        return (self.leader + len(self.played)) % self.num_players
+
+    def is_round_over(self):
+        return len(self.played) == 0 and self.hands[self.leader] == 0
+
+    def legal_moves(self):
+        """
+        The play ids the player to move can play, like
+        Player.determine_illegal_indices with both ways to play the Tigress.
+        """
+        legal = legal_mask(self.hands[self.player_to_move()], self.trump_index)
+        moves = list(card_ids_in_mask(legal))
+        if legal & TIGRESS_MASK:
+            moves.append(TIGRESS_ESCAPE_ID)
+        return moves
+
+    def add_to_trick(self, move):
+        """
+        Like Trick.play_card.
+        """
+        (self.trump_index, self.winning_id, self.winning_position) = advance_trick(self.trump_index, self.winning_id,\
+                self.winning_position, len(self.played), move)
+        self.played.append(move)
+        self.played_mask |= 1 << move
+
+    def apply(self, move):
+        player = self.player_to_move()
+        trick_summary = (self.played_mask, self.trump_index, self.winning_id, self.winning_position)
+        self.hands[player] &= ~(1 << card_id_of_move(move))
+        self.add_to_trick(move)
+        finished_trick = None
+        if len(self.played) == self.num_players:
+            winner = (self.leader + self.winning_position) % self.num_players
+            winning_bonus = 0
+            for other_id in self.played:
+                winning_bonus += BONUS[other_id][self.winning_id]
+            self.tricks_won[winner] += 1
+            self.bonus_won[winner] += winning_bonus
+            finished_trick = (self.leader, self.played, winner, winning_bonus)
+            self.start_trick(winner)
+        self.history.append((player, move, trick_summary, finished_trick))
+
+    def undo(self):
+        (player, move, trick_summary, finished_trick) = self.history.pop()
+        if finished_trick != None:
+            (self.leader, played, winner, winning_bonus) = finished_trick
+            # A copy, since copies of this state share the history
+            self.played = list(played)
+            self.tricks_won[winner] -= 1
+            self.bonus_won[winner] -= winning_bonus
+        self.played.pop()
+        (self.played_mask, self.trump_index, self.winning_id, self.winning_position) = trick_summary
+        self.hands[player] |= 1 << card_id_of_move(move)
+
+    def default_move(self):
+        """
+        The play id Player.choose_and_play_card would play, as lockstep
+        plays it.
+        """
+        player = self.player_to_move()
+        hand = self.hands[player]
+        done = self.tricks_won[player] >= self.bids[player]
+        # Players who bid 0 or already have their bid play the Tigress as an escape
+        tigress_escapes = done or self.bids[player] == 0
+        pirates = hand & (PIRATE_MASK if tigress_escapes else PIRATE_MASK | TIGRESS_MASK)
+        if done:
+            card_id = lowest_card_id(legal_mask(hand, self.trump_index))
+        elif self.played_mask & MERMAID_MASK and pirates:
+            card_id = lowest_card_id(pirates)
+        elif self.played_mask & PLAYED_PIRATE_MASK and hand & SKULL_KING_MASK:
+            card_id = SKULL_KING_ID
+        elif self.played_mask & SKULL_KING_MASK and hand & MERMAID_MASK:
+            card_id = lowest_card_id(hand & MERMAID_MASK)
+        else:
+            if len(self.played) == 0:
+                winning = hand
+            else:
+                play_mask = hand
+                if tigress_escapes and hand & TIGRESS_MASK:
+                    play_mask = hand & ~TIGRESS_MASK | TIGRESS_ESCAPE_MASK
+                winning = play_mask & DEFEATS_MASKS[self.trump_index][self.winning_id]
+                if winning & TIGRESS_ESCAPE_MASK:
+                    winning = winning & ~TIGRESS_ESCAPE_MASK | TIGRESS_MASK
+            if winning:
+                card_id = lowest_card_id(winning)
+            else:
+                card_id = lowest_card_id(legal_mask(hand, self.trump_index))
+        if card_id == TIGRESS_ID and tigress_escapes:
+            return TIGRESS_ESCAPE_ID
+        return card_id
+
+    def play_out(self):
+        """
+        Finish the round with every player playing default_move().
+        """
+        while not self.is_round_over():
+            self.apply(self.default_move())
+
+    def round_points(self):
+        return [points_for_bid(self.bids[i], self.tricks_won[i], self.bonus_won[i], self.round_number) for i in range(self.num_players)]
+
+    def final_scores(self):
+        """
+        The scores once this round's points are added, when it is over.
+        """
+        return [score + points for (score, points) in zip(self.scores, self.round_points())]
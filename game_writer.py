@@ -8,23 +8,119 @@ It should work like this
 [ array of dictionaries of round data
 "bids" : [array of bids],
 "hands" : [array of hands],
-"tricks" : [array of trick info maps {"starting_index" : _, "hands" : [array of hands], "cards_played" : [array of cards], "winner_index" : _}]
+"tricks" : [array of trick info maps {"starting_index" : _, "cards_played" : [array of cards], "winner_index" : _}]
 "scores" : [array of scores at end of round]
 ]
+Only the dealt hands are stored. The hands at any later point follow
+from the cards played so far, and hand_before_trick() rebuilds them.
+JsonLinesGameWriter has the same methods but streams records to a file
+instead of keeping the game in memory.
 """
 
+import json
+import os
+import struct
+
 BIDS_KEY = "bids"
 HANDS_KEY = "hands"
 TRICKS_KEY = "tricks"
+SCORES_KEY = "scores"
+
+# Keys and record types for JSON Lines logs
+RECORD_TYPE_KEY = "type"
+GAME_KEY = "game"
+ROUND_KEY = "round"
+TRICK_KEY = "trick"
+DEAL_RECORD = "deal"
+TRICK_RECORD = "trick"
+ROUND_RECORD = "round"
+GAME_RECORD = "game"
+
+NUM_ROUNDS = 10
+DEFAULT_FLUSH_SIZE = 1 << 20
+
+# The seek index written next to a log. See game_index.py.
+INDEX_SUFFIX = ".idx"
+# game_index, offset, then the round offsets, all little-endian uint64
+INDEX_ENTRY_FORMAT = "<QQ%dQ" % (NUM_ROUNDS)
+
+def index_filepath(filepath):
+    return filepath + INDEX_SUFFIX
+
+class IndexWriter():
+    """
+    Collects entries for games in a writer's buffer. Offsets are relative
+    to the start of the buffer until flush() learns where it was written.
+    """
+    def __init__(self, filepath):
+        self.fd = os.open(index_filepath(filepath), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.entries = []
+
+    def add_game(self, game_index, offset, round_offsets):
+        self.entries.append((game_index, offset, round_offsets))
+
+    def flush(self, buffer_start):
+        if len(self.entries) == 0:
+            return
+        data = []
+        for (game_index, offset, round_offsets) in self.entries:
+            data.append(struct.pack(INDEX_ENTRY_FORMAT, game_index, buffer_start + offset,\
+                    *[buffer_start + round_offset for round_offset in round_offsets]))
+        os.write(self.fd, b"".join(data))
+        self.entries = []
+
+    def close(self):
+        os.close(self.fd)
 
 def hand_to_card_strings(hand):
     return [str(card) for card in hand]
 def hands_to_card_strings_lists(hands):
     return [hand_to_card_strings(hand) for hand in hands]
 
+def hand_before_trick(round_data, trick_index, player_index):
+    """
+    Rebuild a player's hand right before the trick at trick_index
+    (0 is the first trick) from the dealt hand and the cards played.
+    Works on one round of a game in the format described above.
+    """
+    hand = list(round_data[HANDS_KEY][player_index])
+    num_players = len(round_data[HANDS_KEY])
+    for trick in round_data[TRICKS_KEY][:trick_index]:
+        i = (player_index - trick["starting_index"]) % num_players
+        # Copies of the same card (like "Pirate") have the same string,
+        # so removing any of them gives the same hand.
+        hand.remove(trick["cards_played"][i])
+    return hand
+
+def hands_before_trick(round_data, trick_index):
+    return [hand_before_trick(round_data, trick_index, i) for i in range(len(round_data[HANDS_KEY]))]
+
+def append_to_file(fd, data):
+    """
+    Append data to a file opened with O_APPEND and return the offset it
+    was written at. With O_APPEND our own file offset ends up right after
+    our data, even if other processes are appending to the same file.
+    """
+    size = len(data)
+    while data:
+        num_written = os.write(fd, data)
+        data = data[num_written:]
+    return os.lseek(fd, 0, os.SEEK_CUR) - size
+
 class GameWriter():
     def __init__(self):
-        self.data = [{TRICKS_KEY : []} for _ in range(1, 11)]
+        self.data = [{TRICKS_KEY : []} for _ in range(NUM_ROUNDS)]
+
+    def start_game(self, game_index):
+        self.data = [{TRICKS_KEY : []} for _ in range(NUM_ROUNDS)]
+
+    def finish_game(self, scores):
+        pass
+
+    def write(self, filepath):
+        f = open(filepath, 'w')
+        f.write(json.dumps(self.data))
+        f.close()
 
     def add_bids(self, round_number, bids):
         self.data[round_number - 1][BIDS_KEY] = bids
@@ -32,8 +128,78 @@ class GameWriter():
     def add_hands(self, round_number, hands):
         self.data[round_number - 1][HANDS_KEY] = hands_to_card_strings_lists(hands)
 
-    def add_trick(self, round_number, starting_index, hands, cards_played, winner_index):
-        self.data[round_number - 1][TRICKS_KEY].append({"starting_index" : starting_index, "hands" : hands_to_card_strings_lists(hands), "cards_played" : hand_to_card_strings(cards_played), "winner_index" : winner_index})
+    def add_trick(self, round_number, starting_index, cards_played, winner_index):
+        self.data[round_number - 1][TRICKS_KEY].append({"starting_index" : starting_index, "cards_played" : hand_to_card_strings(cards_played), "winner_index" : winner_index})
+
+    def add_scores(self, round_number, scores):
+        self.data[round_number - 1][SCORES_KEY] = scores
+
+class JsonLinesGameWriter():
+    """
+    Writes one JSON object per line: a deal record (hands and bids) at the
+    start of each round, a record for every trick, a round record with the
+    scores, and a game record with the final scores. Every record has the
+    game and round it belongs to, so many games can be appended to one file.
+    Lines are buffered and only written at the end of a game, with a single
+    write to a file opened for appending, so several processes can share a
+    file without their games getting mixed up.
+    Where each game and round starts goes in a seek index (see game_index.py).
+    """
+    def __init__(self, filepath, flush_size=DEFAULT_FLUSH_SIZE):
+        self.fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.index_writer = IndexWriter(filepath)
+        self.flush_size = flush_size
+        self.buffer = []
+        self.buffered_size = 0
+        self.game_index = 0
+        self.game_offset = 0
+        self.round_offsets = [0 for _ in range(NUM_ROUNDS)]
+        self.hands = None
+        self.trick_number = 0
+
+    def write_record(self, record):
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+        self.buffer.append(line)
+        self.buffered_size += len(line)
+
+    def start_game(self, game_index):
+        self.game_index = game_index
+        self.game_offset = self.buffered_size
+
+    def add_hands(self, round_number, hands):
+        self.hands = hands_to_card_strings_lists(hands)
+
+    def add_bids(self, round_number, bids):
+        self.trick_number = 0
+        self.round_offsets[round_number - 1] = self.buffered_size
+        self.write_record({RECORD_TYPE_KEY : DEAL_RECORD, GAME_KEY : self.game_index, ROUND_KEY : round_number,\
+                HANDS_KEY : self.hands, BIDS_KEY : bids})
+
+    def add_trick(self, round_number, starting_index, cards_played, winner_index):
+        self.trick_number += 1
+        self.write_record({RECORD_TYPE_KEY : TRICK_RECORD, GAME_KEY : self.game_index, ROUND_KEY : round_number,\
+                TRICK_KEY : self.trick_number, "starting_index" : starting_index, "cards_played" : hand_to_card_strings(cards_played),\
+                "winner_index" : winner_index})
 
     def add_scores(self, round_number, scores):
-        self.data[round_number - 1]["scores"] = scores
+        self.write_record({RECORD_TYPE_KEY : ROUND_RECORD, GAME_KEY : self.game_index, ROUND_KEY : round_number, SCORES_KEY : scores})
+
+    def finish_game(self, scores):
+        self.write_record({RECORD_TYPE_KEY : GAME_RECORD, GAME_KEY : self.game_index, SCORES_KEY : list(scores)})
+        self.index_writer.add_game(self.game_index, self.game_offset, list(self.round_offsets))
+        if self.buffered_size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        # json.dumps escapes everything outside ASCII, so the buffered size
+        # in characters is also the size in bytes.
+        data = "".join(self.buffer).encode()
+        buffer_start = append_to_file(self.fd, data)
+        self.index_writer.flush(buffer_start)
+        self.buffer = []
+        self.buffered_size = 0
+
+    def close(self):
+        self.flush()
+        os.close(self.fd)
+        self.index_writer.close()
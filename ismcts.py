@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+A player that searches instead of following rules: information-set
+Monte Carlo tree search (the single-observer kind) from its own view of
+the round. Every iteration deals the cards it can't see to the other
+players at random (a determinization), walks down one shared tree of
+moves, picking moves with UCB among the ones that are legal in that
+deal, and plays the rest of the round out with the built-in strategy on
+a GameState. Each move's node keeps the rewards of the player
+who made it, so every player in the tree plays for themselves. The move
+played is the most visited one at the root.
+
+Searches stop after a number of iterations, a time budget, or whichever
+comes first. With num_workers above 1 the search is root parallel:
+every worker process grows its own tree from its own seed, and their
+root visit counts are added up. Processes are used instead of threads,
+since the search is pure Python and threads would share one interpreter lock.
+Worker processes of a Pool (like simulate.py's) can't start processes
+of their own, so players there have to search with one worker.
+
+Deals come from a HandSampler (see sampler.py), so they respect the
+suits other players are known to be out of, and can be weighted by how
+likely their bids are. The sampler learns what has been played from the
+game's events, so the player has to be subscribed to them, like
+    game.players[seat] = ISMCTSPlayer()
+    game.players[seat].subscribe(game.events)
+"""
+
+from bisect import bisect_right
+import math
+from multiprocessing import Pool, current_process
+import time
+
+from card_table import *
+from events import Subscriber
+from game_state import GameState
+from player import Player
+from sampler import HandSampler
+from seeding import child_seed_sequence, new_rng, to_seed_sequence
+
+DEFAULT_ITERATIONS = 1000
+DEFAULT_EXPLORATION = 0.7
+# How many deals are weighted by a bid model for each decision
+DEFAULT_NUM_PARTICLES = 500
+
+class PlayerView():
+    """
+    What a player can see when it has to play: a ConstrainedDealer for
+    the cards it can't see, the bids and tricks won, and the current
+    trick as play ids. particles, if given, are (deals, cumulative
+    weights) to draw deals from instead of the dealer.
+    """
+    def __init__(self, dealer, bids, tricks_won, leader, played, round_number, particles=None):
+        self.dealer = dealer
+        self.bids = bids
+        self.tricks_won = tricks_won
+        self.leader = leader
+        self.played = played
+        self.round_number = round_number
+        self.particles = particles
+
+    def deal(self, rng):
+        """
+        A GameState with the unseen cards dealt to the other players.
+        """
+        if self.particles == None:
+            hands = self.dealer.deal(rng)
+        else:
+            (deals, cumulative_weights) = self.particles
+            r = rng.random() * cumulative_weights[-1]
+            hands = deals[min(bisect_right(cumulative_weights, r), len(deals) - 1)]
+        return GameState(hands, self.bids, self.leader, self.round_number, self.tricks_won, played=self.played)
+
+class Node():
+    """
+    A move in the tree. rewards are the total rewards of the player who
+    made it, and availability is how many times it was legal when its
+    parent was visited.
+    """
+    def __init__(self, player, move):
+        self.player = player
+        self.move = move
+        self.children = {}
+        self.visits = 0
+        self.availability = 0
+        self.rewards = 0.0
+
+    def ucb(self, exploration):
+        return self.rewards / self.visits + exploration * math.sqrt(math.log(self.availability) / self.visits)
+
+def search(view, seed, iterations=DEFAULT_ITERATIONS, time_budget=None, exploration=DEFAULT_EXPLORATION):
+    """
+    Grow a tree from view for iterations, or until time_budget seconds
+    have passed if that comes first (either can be None). Returns
+    (visits, num_iterations) where visits maps each root move to how
+    many times it was chosen.
+    """
+    rng = new_rng(seed)
+    deadline = None if time_budget == None else time.perf_counter() + time_budget
+    # Rewards are points scaled so that bidding 0 is worth 1
+    scale = 10 * view.round_number
+    root = Node(None, None)
+    num_iterations = 0
+    while (iterations == None or num_iterations < iterations) and (deadline == None or time.perf_counter() < deadline):
+        state = view.deal(rng)
+        node = root
+        path = []
+        while not state.is_round_over():
+            player = state.player_to_move()
+            untried = []
+            best = None
+            best_value = None
+            for move in state.legal_moves():
+                child = node.children.get(move)
+                if child == None:
+                    untried.append(move)
+                    continue
+                child.availability += 1
+                if untried:
+                    continue
+                value = child.ucb(exploration)
+                if best == None or value > best_value:
+                    best = child
+                    best_value = value
+            if untried:
+                move = untried[rng.integers(len(untried))]
+                child = Node(player, move)
+                child.availability = 1
+                node.children[move] = child
+                state.apply(move)
+                path.append(child)
+                break
+            node = best
+            state.apply(node.move)
+            path.append(node)
+        state.play_out()
+        points = state.round_points()
+        for node in path:
+            node.visits += 1
+            node.rewards += points[node.player] / scale
+        num_iterations += 1
+    return ({move : child.visits for (move, child) in root.children.items()}, num_iterations)
+
+def search_worker(arguments):
+    return search(*arguments)
+
+class ISMCTSPlayer(Player, Subscriber):
+    """
+    Bids like Player and plays the card IS-MCTS likes best. iterations
+    and time_budget (in seconds) limit each decision, and at least one of
+    them has to be given. With a bid_model (like sampler.BaselineBidModel)
+    each decision deals num_particles hands and searches them weighted
+    by how likely the other players' bids are with them.
+    """
+    def __init__(self, rng=None, iterations=DEFAULT_ITERATIONS, time_budget=None, num_workers=1, exploration=DEFAULT_EXPLORATION,\
+            bid_model=None, num_particles=DEFAULT_NUM_PARTICLES):
+        super().__init__(rng)
+        if iterations == None and time_budget == None:
+            raise ValueError("A search needs a number of iterations or a time budget.")
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.num_workers = num_workers
+        self.exploration = exploration
+        self.bid_model = bid_model
+        self.num_particles = num_particles
+        self.pool = None
+        self.sampler = HandSampler()
+        self.num_iterations = 0
+
+    def callbacks(self):
+        return self.sampler.callbacks()
+
+    def view(self, trick):
+        players = trick.players
+        player_index = players.index(self)
+        bids = [player.bid for player in players]
+        dealer = self.sampler.dealer(player_index, self.hand_mask)
+        particles = None
+        if self.bid_model != None:
+            deals = [dealer.deal(self.rng) for _ in range(self.num_particles)]
+            weights = self.sampler.bid_weights(deals, player_index, bids, self.bid_model)
+            particles = (deals, weights.cumsum().tolist())
+        # The hands are the sizes dealt, which can be fewer cards than the
+        # round number, and the round number only scores bids of 0.
+        return PlayerView(dealer, bids, [player.tricks_won for player in players], trick.leading_player_index,\
+                [card.play_id for card in trick.cards_played], self.sampler.round_number, particles)
+
+    def choose_move(self, view):
+        """
+        The most visited root move over all the workers' trees.
+        """
+        seed_sequence = to_seed_sequence(int(self.rng.integers(2 ** 63)))
+        arguments = [(view, child_seed_sequence(seed_sequence, worker), self.iterations, self.time_budget, self.exploration)\
+                for worker in range(self.num_workers)]
+        if self.num_workers == 1:
+            results = [search_worker(arguments[0])]
+        else:
+            if self.pool == None:
+                if current_process().daemon:
+                    raise ValueError("A search with %d workers can't run in a worker process, like simulate's. Use 1 worker there."\
+                            % (self.num_workers))
+                self.pool = Pool(self.num_workers)
+            results = self.pool.map(search_worker, arguments)
+        visits = {}
+        self.num_iterations = 0
+        for (worker_visits, num_iterations) in results:
+            self.num_iterations += num_iterations
+            for (move, count) in worker_visits.items():
+                visits[move] = visits.get(move, 0) + count
+        # Ties go to the weakest move
+        return min(visits, key=lambda move: (-visits[move], move))
+
+    def choose_and_play_card(self, trick, num_players):
+        legal_mask = self.legal_index_holder.legal_mask
+        if legal_mask & (legal_mask - 1) == 0 and not legal_mask & TIGRESS_MASK:
+            # Only one card can be played
+            return self.play_card_with_id(lowest_card_id(legal_mask))
+        return self.play_move(self.choose_move(self.view(trick)))
+
+    def close(self):
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+How long strategies take to decide. A Game with a DecisionTimer times
+every bid and every card choice of every seat and records it under the
+seat's strategy name, so a tournament can show which strategies are
+slow. Times go into histograms with power of two buckets in
+microseconds, which are small, cheap to add to and can be merged across
+worker processes like SeatStatistics.
+"""
+
+BID_DECISION = "bid"
+CARD_DECISION = "card"
+
+# Bucket i holds times under 2 ** i microseconds (and at least half that)
+NUM_BUCKETS = 40
+
+class LatencyHistogram():
+    def __init__(self):
+        self.counts = [0 for _ in range(NUM_BUCKETS)]
+        self.num_decisions = 0
+        self.total = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds):
+        bucket = min(int(seconds * 1e6).bit_length(), NUM_BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.num_decisions += 1
+        self.total += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def merge(self, other):
+        for i in range(NUM_BUCKETS):
+            self.counts[i] += other.counts[i]
+        self.num_decisions += other.num_decisions
+        self.total += other.total
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+
+    def mean(self):
+        return self.total / self.num_decisions
+
+    def percentile(self, fraction):
+        """
+        An upper bound in seconds on the time that fraction of the
+        decisions took, from the bucket it falls in.
+        """
+        needed = fraction * self.num_decisions
+        seen = 0
+        for i in range(NUM_BUCKETS):
+            seen += self.counts[i]
+            if seen >= needed and seen > 0:
+                return min((1 << i) / 1e6, self.max_seconds)
+        return self.max_seconds
+
+class DecisionTimer():
+    """
+    histograms maps (strategy name, BID_DECISION or CARD_DECISION) to a
+    LatencyHistogram.
+    """
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, strategy, decision, seconds):
+        key = (strategy, decision)
+        histogram = self.histograms.get(key)
+        if histogram == None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def merge(self, other):
+        for (key, histogram) in other.histograms.items():
+            if not key in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge(histogram)
+
+def print_decision_latencies(decision_timer):
+    # Strategies with options can have long names
+    width = max([15] + [len(strategy) for (strategy, _) in decision_timer.histograms])
+    print("%-*s Decision  Count  Mean ms   p50 ms   p90 ms   p99 ms   Max ms" % (width, "Strategy"))
+    for (strategy, decision) in sorted(decision_timer.histograms):
+        histogram = decision_timer.histograms[(strategy, decision)]
+        print("%-*s %-8s %6d %8.3f %8.3f %8.3f %8.3f %8.3f" % (width, strategy, decision, histogram.num_decisions, 1000 * histogram.mean(),\
+                1000 * histogram.percentile(0.5), 1000 * histogram.percentile(0.9), 1000 * histogram.percentile(0.99),\
+                1000 * histogram.max_seconds))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+"""
+Plays many games of the built-in Player strategy at once, in lockstep,
+with the state of every game held in NumPy arrays (one row per game)
+instead of in Card and Player objects. Every step (a bid, or one seat
+playing a card) is done for all the games together with array
+operations, following exactly the same rules as Player.make_bid and
+Player.choose_and_play_card. For the same seeds it deals the same cards
+and gets the same bids, trick winners and scores as Game, so it can be
+used for studies of the baseline strategy that need many games.
+
+Dealt hands are (games x players x cards) arrays of card ids. While a
+round is played, each hand is a card_table bitmask split into two
+uint64 words (ids below 64 and the rest), so finding a player's weakest
+legal or winning card is a few bit operations per game.
+play_round() plays one round from dealt hands and can be reused by
+anything that needs to play out many deals of a round.
+"""
+
+from card import *
+from card_table import *
+from deck import BatchDealer
+from game_writer import NUM_ROUNDS
+from player import WinningChances, evaluate_winning_chances
+from seeding import deck_rng, new_rng, to_seed_sequence
+from trick import bonus_points
+
+# Fills the places in a hand of cards that have been played. It is one
+# past the last card id, so it can index the tables below.
+NO_CARD = NUM_CARD_IDS
+LOW_WORD_BITS = 64
+LOW_WORD_MASK = (1 << LOW_WORD_BITS) - 1
+
+# The amount each card adds to a player's expected wins in make_bid
+BID_WEIGHTS = {WinningChances.High : 1, WinningChances.Likely : 0.7, WinningChances.Possible : 0.4, WinningChances.Unlikely : 0.2,\
+        WinningChances.Loser : 0}
+
+class LockstepTables():
+    """
+    The card_table lookups as NumPy arrays, with an extra entry at NO_CARD
+    that never wins, never sets a trump and is worth nothing.
+    """
+    def __init__(self):
+        import numpy as np
+        num_ids = NUM_CARD_IDS + 1
+        self.defeats = np.zeros((NUM_TRUMP_INDICES, num_ids, num_ids), dtype=bool)
+        self.defeats[:, :NUM_CARD_IDS, :NUM_CARD_IDS] = DEFEATS
+        self.is_escape = np.array(IS_ESCAPE + [True], dtype=bool)
+        self.first_trump_index = np.array(FIRST_TRUMP_INDEX + [NO_TRUMP], dtype=np.intp)
+        self.is_mermaid = np.array([category == CardCategory.Mermaid for category in CARD_CATEGORY] + [False], dtype=bool)
+        self.is_pirate = np.array([card.is_pirate() for card in REFERENCE_CARDS] + [False], dtype=bool)
+        self.is_skull_king = np.array([category == CardCategory.SkullKing for category in CARD_CATEGORY] + [False], dtype=bool)
+        # Tigress in pirate mode, which is how every hand is dealt
+        self.bid_weight = np.array([BID_WEIGHTS[evaluate_winning_chances(card)] for card in REFERENCE_CARDS[:TIGRESS_ESCAPE_ID]]\
+                + [0, 0], dtype=np.float64)
+        # Masks of card (or play) ids are split into two words, for ids
+        # below 64 and for the rest. beats_*[trump_index][winning_id] are
+        # the play ids that would take the trick from winning_id.
+        self.beats_low = np.zeros((NUM_TRUMP_INDICES, num_ids), dtype=np.uint64)
+        self.beats_high = np.zeros((NUM_TRUMP_INDICES, num_ids), dtype=np.uint64)
+        for trump_index in range(NUM_TRUMP_INDICES):
+            for winning_id in range(NUM_CARD_IDS):
+                beats = card_mask(card_id for card_id in range(NUM_CARD_IDS) if DEFEATS[trump_index][card_id][winning_id])
+                (self.beats_low[trump_index, winning_id], self.beats_high[trump_index, winning_id]) = split_mask(beats)
+        # The suit cards that can't be played when a trump suit is set
+        self.off_suit_low = np.array([split_mask(off_suit_mask)[0] for off_suit_mask in OFF_SUIT_MASKS], dtype=np.uint64)
+        self.bonus = np.zeros((num_ids, num_ids), dtype=np.int32)
+        self.bonus[:NUM_CARD_IDS, :NUM_CARD_IDS] = [[bonus_points([card], winning_card) for winning_card in REFERENCE_CARDS]\
+                for card in REFERENCE_CARDS]
+
+def split_mask(mask):
+    """
+    A card_table bitmask as (low word, high word).
+    """
+    return (mask & LOW_WORD_MASK, mask >> LOW_WORD_BITS)
+
+lockstep_tables = None
+
+def get_lockstep_tables():
+    global lockstep_tables
+    if lockstep_tables == None:
+        lockstep_tables = LockstepTables()
+    return lockstep_tables
+
+def make_bids(hands):
+    """
+    The bid Player.make_bid makes for every hand in a (games x players x
+    cards) array. The expected wins are added up card by card in hand
+    order, like make_bid does, so the floating point sums and the
+    rounding come out exactly the same.
+    """
+    import numpy as np
+    tables = get_lockstep_tables()
+    weights = tables.bid_weight[hands]
+    expected_wins = np.zeros(hands.shape[:2], dtype=np.float64)
+    for i in range(hands.shape[2]):
+        expected_wins += weights[:, :, i]
+    if hands.shape[2] == 1:
+        # High and Likely cards bid 1
+        return (weights[:, :, 0] >= BID_WEIGHTS[WinningChances.Likely]).astype(np.int64)
+    return np.round(expected_wins).astype(np.int64)
+
+def round_points(bids, tricks_won, bonus_won, round_number):
+    """
+    points_from_round for arrays of bids, tricks won and the bonus points
+    of the tricks won, all (games x players).
+    """
+    import numpy as np
+    points = np.where(bids == tricks_won, 20 * bids + bonus_won, -20 * np.abs(bids - tricks_won))
+    return np.where(bids == 0, np.where(tricks_won == 0, 10 * round_number, -10 * round_number), points)
+
+class RoundResults():
+    """
+    What happened in a round of every game. Tricks are in the order they
+    were played, and cards_played holds play ids in play order.
+    bids, tricks_won, points: (games x players)
+    leaders, winners:         (games x tricks) player indices
+    cards_played:             (games x tricks x players)
+    """
+    def __init__(self, bids, leaders, cards_played, winners, tricks_won, points):
+        self.bids = bids
+        self.leaders = leaders
+        self.cards_played = cards_played
+        self.winners = winners
+        self.tricks_won = tricks_won
+        self.points = points
+
+def lowest_card_ids(low, high):
+    """
+    The lowest id in each two-word mask, or NO_CARD if the mask is empty.
+    The lowest set bit is isolated and its exponent read off as a float,
+    which is exact for powers of two.
+    """
+    import numpy as np
+    one = np.uint64(1)
+    low_exponent = np.frexp((low & (~low + one)).astype(np.float64))[1]
+    high_exponent = np.frexp((high & (~high + one)).astype(np.float64))[1]
+    return np.where(low != 0, low_exponent - 1, np.where(high != 0, high_exponent - 1 + LOW_WORD_BITS, NO_CARD)).astype(np.int64)
+
+def hand_masks(hands):
+    """
+    Two-word masks (games x players) of a (games x players x cards) array
+    of card ids.
+    """
+    import numpy as np
+    one = np.uint64(1)
+    is_low = hands < LOW_WORD_BITS
+    bits = np.left_shift(one, (hands % LOW_WORD_BITS).astype(np.uint64))
+    low = np.bitwise_or.reduce(np.where(is_low, bits, np.uint64(0)), axis=2)
+    high = np.bitwise_or.reduce(np.where(is_low, np.uint64(0), bits), axis=2)
+    return (low, high)
+
+def play_round(hands, first_leaders, round_number, bids=None):
+    """
+    Play one round of every game, from the dealt hands (games x players x
+    cards) and the player who leads the first trick of each game. If bids
+    aren't given, the players bid like Player.make_bid.
+    """
+    import numpy as np
+    tables = get_lockstep_tables()
+    (num_games, num_players, num_cards) = hands.shape
+    rows = np.arange(num_games)
+    if bids is None:
+        bids = make_bids(np.sort(hands, axis=2))
+    bids = np.asarray(bids, dtype=np.int64)
+    (hands_low, hands_high) = hand_masks(hands)
+    one = np.uint64(1)
+    (pirate_low, pirate_high) = [np.uint64(word) for word in split_mask(PIRATE_MASK)]
+    mermaid_low = np.uint64(split_mask(MERMAID_MASK)[0])
+    (tigress_high, skull_king_high, tigress_escape_high) = [np.uint64(split_mask(1 << card_id)[1])\
+            for card_id in (TIGRESS_ID, SKULL_KING_ID, TIGRESS_ESCAPE_ID)]
+    tricks_won = np.zeros((num_games, num_players), dtype=np.int64)
+    bonus_won = np.zeros((num_games, num_players), dtype=np.int64)
+    # Players who bid 0 play the Tigress as an escape, and so do players
+    # once they have won as many tricks as they bid.
+    tigress_escapes = bids == 0
+    leaders = np.zeros((num_games, num_cards), dtype=np.int64)
+    cards_played = np.zeros((num_games, num_cards, num_players), dtype=np.int64)
+    winners = np.zeros((num_games, num_cards), dtype=np.int64)
+    leader = np.broadcast_to(np.asarray(first_leaders, dtype=np.int64), (num_games,)).copy()
+
+    for trick_index in range(num_cards):
+        leaders[:, trick_index] = leader
+        # The state of the trick in every game, like the fields of Trick
+        trump_index = np.full(num_games, NO_TRUMP, dtype=np.intp)
+        non_escape_has_been_played = np.zeros(num_games, dtype=bool)
+        winning_id = np.full(num_games, NO_CARD, dtype=np.intp)
+        winning_position = np.zeros(num_games, dtype=np.int64)
+        contains_mermaid = np.zeros(num_games, dtype=bool)
+        contains_pirate = np.zeros(num_games, dtype=bool)
+        contains_skull_king = np.zeros(num_games, dtype=bool)
+
+        for position in range(num_players):
+            player = (leader + position) % num_players
+            low = hands_low[rows, player]
+            high = hands_high[rows, player]
+            tigress_escape = tigress_escapes[rows, player]
+
+            # Player.determine_illegal_indices. Only a suit card's trump
+            # index is ever set, and suit cards are all in the low word.
+            legal_low = low & ~tables.off_suit_low[trump_index]
+            legal_low = np.where((legal_low == 0) & (high == 0), low, legal_low)
+            weakest_legal = lowest_card_ids(legal_low, high)
+
+            # Player.choose_and_play_card
+            lowest_pirate = lowest_card_ids(low & pirate_low, high & np.where(tigress_escape, pirate_high, pirate_high | tigress_high))
+            lowest_mermaid = lowest_card_ids(low & mermaid_low, np.zeros_like(high))
+            has_skull_king = (high & skull_king_high) != 0
+            if position == 0:
+                weakest_winning = lowest_card_ids(low, high)
+            else:
+                # An escaped Tigress is looked up by its play id, then put
+                # back at its card id so the weakest card is by card id.
+                escaped_tigress = tigress_escape & ((high & tigress_high) != 0)
+                play_high = np.where(escaped_tigress, (high & ~tigress_high) | tigress_escape_high, high)
+                winning_low = low & tables.beats_low[trump_index, winning_id]
+                winning_high = play_high & tables.beats_high[trump_index, winning_id]
+                winning_high = np.where((winning_high & tigress_escape_high) != 0, (winning_high & ~tigress_escape_high) | tigress_high,\
+                        winning_high)
+                weakest_winning = lowest_card_ids(winning_low, winning_high)
+            card_id = np.select([tricks_won[rows, player] >= bids[rows, player],\
+                    contains_mermaid & (lowest_pirate != NO_CARD),\
+                    contains_pirate & has_skull_king,\
+                    contains_skull_king & (lowest_mermaid != NO_CARD),\
+                    weakest_winning != NO_CARD],\
+                    [weakest_legal, lowest_pirate, SKULL_KING_ID, lowest_mermaid, weakest_winning], weakest_legal)
+            card_bit = np.left_shift(one, (card_id % LOW_WORD_BITS).astype(np.uint64))
+            in_low_word = card_id < LOW_WORD_BITS
+            hands_low[rows, player] = np.where(in_low_word, low & ~card_bit, low)
+            hands_high[rows, player] = np.where(in_low_word, high, high & ~card_bit)
+            play_id = np.where((card_id == TIGRESS_ID) & tigress_escape, TIGRESS_ESCAPE_ID, card_id)
+            cards_played[:, trick_index, position] = play_id
+
+            # Trick.play_card
+            first_non_escape = ~non_escape_has_been_played & ~tables.is_escape[play_id]
+            trump_index[first_non_escape] = tables.first_trump_index[play_id[first_non_escape]]
+            non_escape_has_been_played |= first_non_escape
+            wins = first_non_escape | (non_escape_has_been_played & tables.defeats[trump_index, play_id, winning_id])
+            if position == 0:
+                wins[:] = True
+            winning_id[wins] = play_id[wins]
+            winning_position[wins] = position
+            contains_mermaid |= tables.is_mermaid[play_id]
+            contains_pirate |= tables.is_pirate[play_id]
+            contains_skull_king |= tables.is_skull_king[play_id]
+
+        winner = (leader + winning_position) % num_players
+        winners[:, trick_index] = winner
+        tricks_won[rows, winner] += 1
+        bonus_won[rows, winner] += tables.bonus[cards_played[:, trick_index], winning_id[:, np.newaxis]].sum(axis=1)
+        tigress_escapes[rows, winner] |= tricks_won[rows, winner] >= bids[rows, winner]
+        leader = winner
+
+    points = round_points(bids, tricks_won, bonus_won, round_number)
+    return RoundResults(bids, leaders, cards_played, winners, tricks_won, points)
+
+class LockstepResults():
+    """
+    Every game played by play_games(), with the same layout as the
+    records of a game archive (but with -1 where there was no trick).
+    bids, scores:  (games x rounds x players), scores are running totals
+    leaders, winners:       (games x rounds x tricks)
+    cards_played:           (games x rounds x tricks x players)
+    """
+    def __init__(self, num_games, num_players):
+        import numpy as np
+        self.bids = np.zeros((num_games, NUM_ROUNDS, num_players), dtype=np.int64)
+        self.scores = np.zeros((num_games, NUM_ROUNDS, num_players), dtype=np.int64)
+        self.leaders = np.full((num_games, NUM_ROUNDS, NUM_ROUNDS), -1, dtype=np.int64)
+        self.winners = np.full((num_games, NUM_ROUNDS, NUM_ROUNDS), -1, dtype=np.int64)
+        self.cards_played = np.full((num_games, NUM_ROUNDS, NUM_ROUNDS, num_players), -1, dtype=np.int64)
+
+    def final_scores(self):
+        return self.scores[:, -1]
+
+def play_dealt_games(dealer):
+    """
+    Play a full game of each of the games a BatchDealer deals, all at once.
+    """
+    num_players = dealer.num_players
+    results = LockstepResults(dealer.num_games, num_players)
+    scores = 0
+    for round_number in range(1, NUM_ROUNDS + 1):
+        dealer_index = (round_number - 1) % num_players
+        hands = dealer.deal(round_number)
+        round_results = play_round(hands, (dealer_index + 1) % num_players, round_number)
+        round_index = round_number - 1
+        num_tricks = hands.shape[2]
+        scores = scores + round_results.points
+        results.bids[:, round_index] = round_results.bids
+        results.scores[:, round_index] = scores
+        results.leaders[:, round_index, :num_tricks] = round_results.leaders
+        results.winners[:, round_index, :num_tricks] = round_results.winners
+        results.cards_played[:, round_index, :num_tricks] = round_results.cards_played
+    return results
+
+def play_games(num_players, game_seeds):
+    """
+    Play a full game for each seed in game_seeds (ints or SeedSequences,
+    like the seed of a Game), all at once. The results are the same as
+    playing each seed with Game.
+    """
+    return play_dealt_games(BatchDealer(num_players, rngs=[deck_rng(to_seed_sequence(seed)) for seed in game_seeds]))
+
+def play_games_fast(num_players, num_games, seed=None):
+    """
+    Play num_games games with every deck shuffled by one Generator, for
+    when the games don't need to match Game's.
+    """
+    return play_dealt_games(BatchDealer(num_players, rng=new_rng(to_seed_sequence(seed)), num_games=num_games))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+"""
+Head-to-head matches between two strategies that stop as soon as the
+result is clear. Each pair of games is dealt from the same seed: one
+game seats the first strategy in the test seat and the other seats the
+second strategy there, with the field strategy (the first one, unless
+another is given) in every other seat. Since the deals and the other
+seats' random choices are the same in both games (see seeding.py), the
+difference between the two scores in the test seat is mostly the
+difference between the strategies, and much less noisy than comparing
+scores from different deals. The test seat moves around the table from
+one pair to the next.
+
+After every pair a SequentialTest updates a sequential probability
+ratio test (Wald's SPRT, with the variance of the differences estimated
+from the pairs so far) of "the second strategy scores delta more per
+game" and of "it scores delta less", each against "no difference". The
+match stops when either is accepted, or when both say no difference,
+and otherwise gives up after max_pairs pairs.
+"""
+
+import argparse
+from enum import Enum
+import math
+from statistics import NormalDist
+
+from game import Game
+from latency import DecisionTimer, print_decision_latencies
+from seeding import game_seed_sequence, to_seed_sequence
+from strategies import check_strategy
+
+DEFAULT_DELTA = 20
+DEFAULT_ALPHA = 0.05
+DEFAULT_BETA = 0.05
+DEFAULT_MAX_PAIRS = 10000
+# The variance isn't trusted before this many pairs
+DEFAULT_MIN_PAIRS = 10
+
+class MatchOutcome(Enum):
+    Undecided = 1
+    SecondIsBetter = 2
+    FirstIsBetter = 3
+    NoDifference = 4
+
+class SequentialTest():
+    """
+    Two one-sided SPRTs on the mean of a stream of differences. alpha is
+    the chance of declaring a winner when there is no difference (split
+    between the two sides), and beta the chance of missing a difference
+    of delta.
+    """
+    def __init__(self, delta=DEFAULT_DELTA, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA, min_samples=DEFAULT_MIN_PAIRS):
+        self.delta = delta
+        self.alpha = alpha
+        self.beta = beta
+        self.min_samples = min_samples
+        # Accept H1 above upper_bound and H0 below lower_bound
+        self.lower_bound = math.log(beta / (1 - alpha / 2))
+        self.upper_bound = math.log((1 - beta) / (alpha / 2))
+        self.num_samples = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+
+    def add(self, difference):
+        self.num_samples += 1
+        self.total += difference
+        self.total_squared += difference * difference
+
+    def mean(self):
+        return self.total / self.num_samples
+
+    def variance(self):
+        """
+        The sample variance, at least 1 so that identical results (like
+        a strategy against itself) don't divide by 0.
+        """
+        if self.num_samples < 2:
+            return 1.0
+        mean = self.mean()
+        return max((self.total_squared - self.num_samples * mean * mean) / (self.num_samples - 1), 1.0)
+
+    def log_likelihood_ratio(self, shift):
+        """
+        log(P(differences | mean = shift) / P(differences | mean = 0)) for
+        normally distributed differences.
+        """
+        return shift * (self.total - self.num_samples * shift / 2) / self.variance()
+
+    def outcome(self):
+        if self.num_samples < self.min_samples:
+            return MatchOutcome.Undecided
+        better = self.log_likelihood_ratio(self.delta)
+        worse = self.log_likelihood_ratio(-self.delta)
+        if better >= self.upper_bound:
+            return MatchOutcome.SecondIsBetter
+        if worse >= self.upper_bound:
+            return MatchOutcome.FirstIsBetter
+        if better <= self.lower_bound and worse <= self.lower_bound:
+            return MatchOutcome.NoDifference
+        return MatchOutcome.Undecided
+
+    def fixed_sample_size(self):
+        """
+        How many pairs a test with a fixed number of them would need for
+        the same error rates, at the variance seen so far.
+        """
+        z = NormalDist().inv_cdf(1 - self.alpha / 2) + NormalDist().inv_cdf(1 - self.beta)
+        return math.ceil(z * z * self.variance() / (self.delta * self.delta))
+
+class Match():
+    """
+    first, second and field are strategy names (see strategies.py).
+    Games are made once per seat and side and reset for every pair, like
+    simulate.py's workers do.
+    """
+    def __init__(self, num_players, first, second, field=None, master_seed=None, test=None, max_pairs=DEFAULT_MAX_PAIRS,\
+            decision_timer=None):
+        for name in [first, second, field]:
+            if name != None:
+                check_strategy(name)
+        self.num_players = num_players
+        self.strategies = (first, second)
+        self.field = field if field != None else first
+        self.master_seed = to_seed_sequence(master_seed)
+        self.test = test if test != None else SequentialTest()
+        self.max_pairs = max_pairs
+        self.decision_timer = decision_timer
+        self.games = {}
+        self.num_pairs = 0
+
+    def game(self, side, seat):
+        key = (side, seat)
+        if not key in self.games:
+            seats = [self.field for _ in range(self.num_players)]
+            seats[seat] = self.strategies[side]
+            self.games[key] = Game(self.num_players, False, False, False, False, False, False, False, seats=seats,\
+                    decision_timer=self.decision_timer)
+        return self.games[key]
+
+    def play_pair(self):
+        """
+        Play the next pair of games and return how many more points the
+        second strategy scored than the first in the test seat.
+        """
+        seat = self.num_pairs % self.num_players
+        seed = game_seed_sequence(self.master_seed, self.num_pairs)
+        scores = []
+        for side in range(2):
+            game = self.game(side, seat)
+            game.reset(seed, self.num_pairs)
+            game.run_game(None)
+            scores.append(game.scores[seat])
+        self.num_pairs += 1
+        return scores[1] - scores[0]
+
+    def run(self):
+        """
+        Play pairs until the test decides, or max_pairs have been played.
+        """
+        outcome = self.test.outcome()
+        while outcome == MatchOutcome.Undecided and self.num_pairs < self.max_pairs:
+            self.test.add(self.play_pair())
+            outcome = self.test.outcome()
+        return outcome
+
+def main():
+    parser = argparse.ArgumentParser(description="Play pairs of games on the same deals until one strategy is clearly better, or clearly not.")
+    parser.add_argument("-n", "--num-players", type=int, required=True, help="How many players each game has")
+    parser.add_argument("--first", required=True, help="The strategy to compare against, like heuristic")
+    parser.add_argument("--second", required=True, help="The strategy being tested, like mcts")
+    parser.add_argument("--field", required=False, help="The strategy in the other seats (defaults to --first)")
+    parser.add_argument("--delta", type=float, default=DEFAULT_DELTA, help="The smallest difference in points per game worth detecting")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="The chance of declaring a winner when there is no difference")
+    parser.add_argument("--beta", type=float, default=DEFAULT_BETA, help="The chance of missing a difference of --delta")
+    parser.add_argument("--max-pairs", type=int, default=DEFAULT_MAX_PAIRS, help="How many pairs of games to play at most")
+    parser.add_argument("--seed", type=int, required=False, help="Master seed for every pair of games")
+    parser.add_argument("--print-latencies", action='store_true', help="Print how long each strategy took to decide")
+
+    args = parser.parse_args()
+
+    master_seed = to_seed_sequence(args.seed)
+    print("Master seed: %d" % (master_seed.entropy))
+    test = SequentialTest(args.delta, args.alpha, args.beta)
+    match = Match(args.num_players, args.first, args.second, args.field, master_seed, test, args.max_pairs,\
+            DecisionTimer() if args.print_latencies else None)
+    outcome = match.run()
+    print("%s after %d pairs of games." % (outcome.name, match.num_pairs))
+    print("%s scored %.1f points per game more than %s (standard error %.1f)." % (args.second, test.mean(), args.first,\
+            math.sqrt(test.variance() / test.num_samples)))
+    print("A test with a fixed number of pairs would need %d." % (test.fixed_sample_size()))
+    if args.print_latencies:
+        print_decision_latencies(match.decision_timer)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 from enum import Enum
-import random
 
 from card import CardCategory, Suit
+from card_table import *
+from seeding import new_rng
 
 class WinningChances(Enum):
     High = 1
@@ -26,45 +27,70 @@ def evaluate_winning_chances(card):
 
 class LegalIndexHolder():
     def __init__(self):
-        self.indices = []
+        self.legal_mask = 0
+        self.hand_mask = 0
         self.up_to_date = False
 
-    def update(self, illegal_indices, num_cards):
-        if len(illegal_indices) == num_cards:
-            # If every card is illegal, then all are legal
-            self.indices = illegal_indices
-        else:
-            self.indices = [i for i in range(num_cards) if not i in illegal_indices]
+    def update(self, legal_mask, hand_mask):
+        self.legal_mask = legal_mask
+        self.hand_mask = hand_mask
         self.up_to_date = True
 
-    def get_random_legal_index(self):
-        index_of_legal_index = random.randint(0, len(self.indices) - 1)
-        return self.indices[index_of_legal_index]
+    @property
+    def indices(self):
+        """
+        Positions in the hand of the legal cards, weakest first.
+        """
+        return [i for (i, card_id) in enumerate(card_ids_in_mask(self.hand_mask)) if self.legal_mask >> card_id & 1]
+
+    def get_random_legal_index(self, rng):
+        indices = self.indices
+        index_of_legal_index = rng.integers(len(indices))
+        return indices[index_of_legal_index]
 
 class Player():
-    def __init__(self):
+    def __init__(self, rng=None):
+        """
+        rng is the numpy Generator for this player's random choices.
+        """
+        if rng == None:
+            rng = new_rng()
+        self.rng = rng
         self.score = 0
         self.hand = []
+        # The hand as a bitmask over card ids, kept in sync with self.hand
+        self.hand_mask = 0
+        # The cards in the hand that currently count as pirates
+        self.pirate_mask = 0
         self.bid = -1
         self.tricks_won = 0
         self.legal_index_holder = LegalIndexHolder()
 
-    def draw(self, canvas, start_x, start_y, draw_size):
-        card_width = draw_size / (len(self.hand)/1.75 + 2)
-        card_start_x = start_x + card_width
-        for card in self.hand:
-            card.draw(canvas, card_start_x, start_y, card_start_x + card_width, start_y + draw_size)
-            card_start_x += card_width / 2
-
     def get_hand(self, hand):
         self.tricks_won = 0
         self.hand = hand
+        self.hand_mask = card_mask(card.card_id for card in hand)
+        self.pirate_mask = PIRATE_MASK | TIGRESS_MASK
         self.sort_hand()
 
     def sort_hand(self):
-        self.hand.sort(key=lambda x: x.power, reverse=False)
-
-    def make_bid(self, num_players):
+        """
+        Card ids are ordered by power, so this sorts by power and keeps
+        the hand in the same order as the bits of hand_mask.
+        """
+        self.hand.sort(key=lambda x: x.card_id, reverse=False)
+
+    def index_of_card_id(self, card_id):
+        """
+        The position in the hand of a card that is in the hand.
+        """
+        return (self.hand_mask & ((1 << card_id) - 1)).bit_count()
+
+    def make_bid(self, num_players, seat=0, round_number=None):
+        """
+        seat is this player's place in the first trick (0 leads it). This
+        strategy only looks at the hand, but others can use seat and round_number.
+        """
         num_tricks = len(self.hand)
         if num_tricks == 1:
             winning_chances = evaluate_winning_chances(self.hand[0])
@@ -103,85 +129,90 @@ class Player():
             self.make_tigress_escape()
 
     def make_tigress_escape(self):
-        for card in self.hand:
-            if card.card_category == CardCategory.Tigress:
-                card.escape()
+        """
+        The Tigress in the hand stays the same card. Only how this player
+        will play it changes, see card_to_play.
+        """
+        self.pirate_mask = PIRATE_MASK
+
+    def card_to_play(self, card):
+        """
+        The card that playing this card from the hand puts in the trick,
+        which is the escape Tigress once the Tigress has been made an escape.
+        """
+        if card.card_id == TIGRESS_ID and not self.pirate_mask & TIGRESS_MASK:
+            return REFERENCE_CARDS[TIGRESS_ESCAPE_ID]
+        return card
 
     def contains_mermaid(self):
-        for card in self.hand:
-            if card.card_category == CardCategory.Mermaid:
-                return True
-        return False
+        return self.hand_mask & MERMAID_MASK != 0
 
     def contains_pirate(self):
-        for card in self.hand:
-            if card.is_pirate():
-                return True
-        return False
+        return self.hand_mask & self.pirate_mask != 0
 
     def contains_skull_king(self):
-        for card in self.hand:
-            if card.card_category == CardCategory.SkullKing:
-                return True
-        return False
+        return self.hand_mask & SKULL_KING_MASK != 0
 
     def play_card_at_index(self, i):
         if not self.legal_index_holder.up_to_date:
             raise ValueError("Developer error: Must call `determine_illegal_indices()` before playing a card.")
         card = self.hand[i]
         del self.hand[i]
+        self.hand_mask ^= 1 << card.card_id
         self.legal_index_holder.up_to_date = False
-        return card
+        return self.card_to_play(card)
 
     def can_follow_trump_suit(self, trick):
-        if trick.trump_suit == None:
-            return False
-        for card in self.hand:
-            if card.card_category == CardCategory.Suit and card.suit == trick.trump_suit:
-                return True
-        return False
+        return self.hand_mask & SUIT_MASKS[trick.trump_index] != 0
 
     def determine_illegal_indices(self, trick):
-        illegal_indices = []
-        if trick.trump_suit == None:
-            pass
-        else:
-            for i in range(len(self.hand)):
-                if self.hand[i].card_category == CardCategory.Suit and self.hand[i].suit != trick.trump_suit:
-                    illegal_indices.append(i)
-        self.legal_index_holder.update(illegal_indices, len(self.hand))
+        self.legal_index_holder.update(legal_mask(self.hand_mask, trick.trump_index), self.hand_mask)
+
+    def play_card_with_id(self, card_id):
+        return self.play_card_at_index(self.index_of_card_id(card_id))
+
+    def play_move(self, play_id):
+        """
+        Play a card by its play id, which also picks how the Tigress is
+        played: TIGRESS_ESCAPE_ID plays it as an escape and TIGRESS_ID as
+        a pirate.
+        """
+        if play_id == TIGRESS_ESCAPE_ID:
+            self.make_tigress_escape()
+            return self.play_card_with_id(TIGRESS_ID)
+        if play_id == TIGRESS_ID:
+            self.pirate_mask = PIRATE_MASK | TIGRESS_MASK
+        return self.play_card_with_id(play_id)
 
     def play_random_card(self):
-        card_index = self.legal_index_holder.get_random_legal_index()
+        card_index = self.legal_index_holder.get_random_legal_index(self.rng)
         return self.play_card_at_index(card_index)
 
     def play_pirate(self):
-        for i in range(len(self.hand)):
-            if self.hand[i].is_pirate():
-                return self.play_card_at_index(i)
+        pirates = self.hand_mask & self.pirate_mask
+        if pirates:
+            return self.play_card_with_id(lowest_card_id(pirates))
         return self.play_random_card()
 
     def play_mermaid(self):
-        for i in range(len(self.hand)):
-            if self.hand[i].card_category == CardCategory.Mermaid:
-                return self.play_card_at_index(i)
+        mermaids = self.hand_mask & MERMAID_MASK
+        if mermaids:
+            return self.play_card_with_id(lowest_card_id(mermaids))
         return self.play_random_card()
 
     def play_skull_king(self):
-        for i in range(len(self.hand)):
-            if self.hand[i].card_category == CardCategory.SkullKing:
-                return self.play_card_at_index(i)
+        if self.hand_mask & SKULL_KING_MASK:
+            return self.play_card_with_id(SKULL_KING_ID)
         return self.play_random_card()
 
     def play_weakest_card(self):
-        return self.play_card_at_index(self.legal_index_holder.indices[0])
+        return self.play_card_with_id(lowest_card_id(self.legal_index_holder.legal_mask))
 
     def play_weakest_winning_card(self, trick):
-        indices_of_winning_cards = self.indices_of_potential_winning_cards(trick)
-        if len(indices_of_winning_cards) == 0:
+        index = self.index_of_weakest_winning_card(trick)
+        if index == -1:
             return self.play_random_card()
         else:
-            index = indices_of_winning_cards[0]
             return self.play_card_at_index(index)
 
     def play_strongest_losing_card(self):
@@ -192,17 +223,15 @@ class Player():
         return self.play_random_card()
 
     def play_strongest_non_special_card(self):
-        for i in range(len(self.legal_index_holder.indices) - 1, -1, -1):
-            if self.hand[self.legal_index_holder.indices[i]].card_category == CardCategory.Suit:
-                return self.play_card_at_index(self.legal_index_holder.indices[i])
+        suit_cards = self.legal_index_holder.legal_mask & ALL_SUIT_CARDS_MASK
+        if suit_cards:
+            return self.play_card_with_id(highest_card_id(suit_cards))
         return self.play_random_card()
 
     def play_strongest_plain_suit_card(self):
-        for i in range(len(self.legal_index_holder.indices) - 1, -1, -1):
-            index = self.legal_index_holder.indices[i]
-            card = self.hand[index]
-            if card.card_category == CardCategory.Suit and card.suit != Suit.JollyRoger:
-                return self.play_card_at_index(index)
+        plain_suit_cards = self.legal_index_holder.legal_mask & PLAIN_SUIT_CARDS_MASK
+        if plain_suit_cards:
+            return self.play_card_with_id(highest_card_id(plain_suit_cards))
         return self.play_random_card()
 
     def choose_leading_card(self, num_players):
@@ -214,21 +243,39 @@ class Player():
         else:
             return self.play_strongest_plain_suit_card()
 
+    def winning_card_mask(self, trick):
+        """
+        The cards in the hand that would win the trick, as a mask of card
+        ids, checked against the trick all at once.
+        """
+        winning_mask = trick.winning_cards(self.hand_mask)
+        if self.hand_mask & TIGRESS_MASK and not self.pirate_mask & TIGRESS_MASK:
+            # The Tigress would be played as an escape.
+            winning_mask &= ~TIGRESS_MASK
+            if trick.winning_cards(TIGRESS_ESCAPE_MASK):
+                winning_mask |= TIGRESS_MASK
+        return winning_mask
+
     def indices_of_potential_winning_cards(self, trick):
-        indices = []
-        for i in range(len(self.hand)):
-            if trick.would_win(self.hand[i]):
-                indices.append(i)
-        return indices
+        return [self.index_of_card_id(card_id) for card_id in card_ids_in_mask(self.winning_card_mask(trick))]
+
+    def index_of_weakest_winning_card(self, trick):
+        """
+        The first of indices_of_potential_winning_cards, or -1 if there
+        are none, without making the list.
+        """
+        winning_mask = self.winning_card_mask(trick)
+        if winning_mask == 0:
+            return -1
+        return self.index_of_card_id(lowest_card_id(winning_mask))
 
     def can_win(self, trick):
-        return len(self.indices_of_potential_winning_cards(trick)) > 0
+        return self.index_of_weakest_winning_card(trick) != -1
 
     def choose_closing_card(self, trick):
         if self.tricks_won >= self.bid:
             return self.play_weakest_card()
-        winning_indices = self.indices_of_potential_winning_cards(trick)
-        if len(winning_indices) > 0:
+        if self.can_win(trick):
             return self.play_weakest_winning_card(trick)
         else:
             return self.play_weakest_card()
@@ -242,8 +289,9 @@ class Player():
             return self.play_skull_king()
         elif trick.contains_skull_king() and self.contains_mermaid():
             return self.play_mermaid()
-        elif self.can_win(trick):
-            return self.play_weakest_winning_card(trick)
+        index = self.index_of_weakest_winning_card(trick)
+        if index != -1:
+            return self.play_card_at_index(index)
         else:
             return self.play_weakest_card()
 
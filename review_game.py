@@ -3,68 +3,135 @@
 import argparse
 import json
 
-from game_writer import BIDS_KEY, HANDS_KEY, TRICKS_KEY
+from game_archive import GameArchive, game_record_to_round, game_record_to_rounds, is_game_archive
+from game_index import build_json_lines_index, find_game, is_json_lines_log, read_index, read_json_lines_game, read_json_lines_round_at
+from game_writer import BIDS_KEY, HANDS_KEY, NUM_ROUNDS, SCORES_KEY, TRICKS_KEY, hand_before_trick
 
-def main():
-    parser = argparse.ArgumentParser(description="Read a saved game's JSON and go through the steps one at a time.")
-    parser.add_argument("-f", "--json-filepath", required=True, help="Path to JSON file of the game you want to review")
-
-    args = parser.parse_args()
-    f = open(args.json_filepath, 'r')
+def load_json_game(filepath):
+    f = open(filepath, 'r')
     json_data = json.loads(f.read())
     f.close()
+    return json_data
 
-    num_players = len(json_data[0][BIDS_KEY])
-    dealer_index = 0
-    for round_index in range(10):
-        round_number = round_index + 1
-        print("\n===== Round %d ======" % (round_number))
-        # Display each player's hand
-        for player_index in range(num_players):
-            player_number = player_index + 1
-            print("Player %d's hand: " % (player_number) + str(json_data[round_index][HANDS_KEY][player_index]))
-        
-        # State who is dealing
-        dealer_number = dealer_index + 1
-        print("Player %d is dealing." % (dealer_number))
+def json_lines_index_entry(filepath, game_index):
+    index = read_index(filepath)
+    if index is None:
+        index = build_json_lines_index(filepath)
+    return find_game(index, game_index)
 
-        # Display the bids
-        for player_index in range(num_players):
-            player_number = player_index + 1
-            print("Player %d bids %d." % (player_number, json_data[round_index][BIDS_KEY][player_index]))
-
-        # Iterate over the tricks
-        leader_index = dealer_index + 1
-        for trick_index in range(round_number):
-            trick_number = trick_index + 1
-            leader_number = leader_index + 1
-            print("\t----- Trick %d -----" % (trick_number))
-
-            # State who is leading the trick
-            print("\tPlayer %d is leading." % (leader_number))
-            current_player_index = leader_index
-            for card in json_data[round_index][TRICKS_KEY][trick_index]["cards_played"]:
-
-                # Display each player's card that is played
-                current_player_number = current_player_index + 1
-                print("\t\tPlayer %d plays %s." % (current_player_number, card))
-                current_player_index += 1
-                current_player_index = current_player_index % num_players
-
-            # State who won the trick
-            winner_index = json_data[round_index][TRICKS_KEY][trick_index]["winner_index"]
-            winner_number = winner_index + 1
-            print("\tPlayer %d won trick %d." % (winner_number, trick_number))
-            leader_index = winner_index
-
-        # Display the scores
-        print("After round %d, the scores are:" % (round_number))
+def load_game(filepath, game_index):
+    """
+    Read a game from a JSON file written by GameWriter, a JSON Lines log or
+    a binary game archive, as the list of round dictionaries GameWriter
+    makes. game_index picks the game in a log or archive.
+    """
+    if is_game_archive(filepath):
+        return game_record_to_rounds(GameArchive(filepath).find_game(game_index))
+    if is_json_lines_log(filepath):
+        return read_json_lines_game(filepath, int(json_lines_index_entry(filepath, game_index)["offset"]))
+    return load_json_game(filepath)
+
+def load_round(filepath, game_index, round_number):
+    """
+    Read just one round. With a seek index this only reads that round.
+    """
+    if is_game_archive(filepath):
+        return game_record_to_round(GameArchive(filepath).find_game(game_index), round_number - 1)
+    if is_json_lines_log(filepath):
+        entry = json_lines_index_entry(filepath, game_index)
+        return read_json_lines_round_at(filepath, int(entry["round_offsets"][round_number - 1]))
+    return load_json_game(filepath)[round_number - 1]
+
+def print_trick(round_data, trick_index, show_hands):
+    num_players = len(round_data[BIDS_KEY])
+    trick = round_data[TRICKS_KEY][trick_index]
+    trick_number = trick_index + 1
+    print("\t----- Trick %d -----" % (trick_number))
+
+    # Display the hands as they are before the trick
+    if show_hands:
         for player_index in range(num_players):
             player_number = player_index + 1
-            print("Player %d: %d" % (player_number, json_data[round_index]["scores"][player_index])) 
+            hand = hand_before_trick(round_data, trick_index, player_index)
+            print("\tPlayer %d's hand: %s" % (player_number, str(hand)))
+
+    # State who is leading the trick
+    leader_index = trick["starting_index"]
+    print("\tPlayer %d is leading." % (leader_index + 1))
+    current_player_index = leader_index
+    for card in trick["cards_played"]:
+
+        # Display each player's card that is played
+        current_player_number = current_player_index + 1
+        print("\t\tPlayer %d plays %s." % (current_player_number, card))
+        current_player_index += 1
+        current_player_index = current_player_index % num_players
 
-        dealer_index = dealer_index + 1
-        dealer_index = dealer_index % num_players
+    # State who won the trick
+    winner_number = trick["winner_index"] + 1
+    print("\tPlayer %d won trick %d." % (winner_number, trick_number))
+
+def print_round(round_data, round_number, show_hands, trick_number=None):
+    """
+    Print a round, or only one of its tricks if trick_number is given.
+    """
+    num_players = len(round_data[BIDS_KEY])
+    dealer_index = (round_number - 1) % num_players
+    print("\n===== Round %d ======" % (round_number))
+    # Display each player's hand
+    for player_index in range(num_players):
+        player_number = player_index + 1
+        print("Player %d's hand: " % (player_number) + str(round_data[HANDS_KEY][player_index]))
+
+    # State who is dealing
+    dealer_number = dealer_index + 1
+    print("Player %d is dealing." % (dealer_number))
+
+    # Display the bids
+    for player_index in range(num_players):
+        player_number = player_index + 1
+        print("Player %d bids %d." % (player_number, round_data[BIDS_KEY][player_index]))
+
+    if trick_number != None:
+        print_trick(round_data, trick_number - 1, show_hands)
+        return
+
+    # Iterate over the tricks
+    for trick_index in range(len(round_data[TRICKS_KEY])):
+        print_trick(round_data, trick_index, show_hands)
+
+    # Display the scores
+    print("After round %d, the scores are:" % (round_number))
+    for player_index in range(num_players):
+        player_number = player_index + 1
+        print("Player %d: %d" % (player_number, round_data[SCORES_KEY][player_index]))
+
+def print_game(json_data, show_hands):
+    for round_index in range(NUM_ROUNDS):
+        print_round(json_data[round_index], round_index + 1, show_hands)
+
+def main():
+    parser = argparse.ArgumentParser(description="Read a saved game and go through the steps one at a time.")
+    parser.add_argument("-f", "--json-filepath", required=True, help="Path to the JSON file, JSON Lines log or game archive of the game you want to review")
+    parser.add_argument("--game", type=int, default=0, help="Which game to review from a JSON Lines log or game archive")
+    parser.add_argument("--round", type=int, required=False, help="Only show this round (1 to 10)")
+    parser.add_argument("--trick", type=int, required=False, help="Only show this trick of the round (needs --round)")
+    parser.add_argument("--show-hands", action='store_true', help="Show every player's hand before each trick")
+
+    args = parser.parse_args()
+    if args.trick != None and args.round == None:
+        parser.error("--trick needs --round")
+    if args.round != None and not 1 <= args.round <= NUM_ROUNDS:
+        parser.error("--round has to be from 1 to %d" % (NUM_ROUNDS))
+    if args.round != None:
+        round_data = load_round(args.json_filepath, args.game, args.round)
+        # Round n has n tricks, unless the deck ran out
+        num_tricks = len(round_data[TRICKS_KEY])
+        if args.trick != None and not 1 <= args.trick <= num_tricks:
+            parser.error("round %d only has tricks 1 to %d" % (args.round, num_tricks))
+        print_round(round_data, args.round, args.show_hands, args.trick)
+    else:
+        print_game(load_game(args.json_filepath, args.game), args.show_hands)
 
 if __name__ == "__main__":
-    main() 
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+Dealing the cards a player can't see, for search players. A HandSampler
+subscribes to a game's events and keeps track of what each player has
+played this round. A player who plays a plain suit card that doesn't
+follow the trick's trump suit can only do that (by the rule in
+Player.determine_illegal_indices) if they have no card of the trump
+suit and no special card left, so from then on they are known to hold
+none. An off-suit Jolly Roger isn't used that way, since Player can play
+one as its weakest winning card without checking the suit.
+
+A ConstrainedDealer deals hands consistent with all of that, uniformly
+over every consistent deal and without ever throwing a deal away. The
+unseen cards are grouped by which constrained players may hold them,
+the number of ways to finish the deal from each group is counted once
+(by dynamic programming over how many cards each constrained player
+still needs), and every deal then only picks how many cards of each
+group go to each of those players, weighted by those counts. Everything
+left goes to the players nobody knows anything about, or stays in the
+deck.
+
+Deals can also be weighted by how likely each player's bid is with the
+hand they would have been dealt, under a bid model like BaselineBidModel.
+"""
+
+from math import factorial
+
+from card_table import *
+from deck import DECK_CARD_IDS
+from events import DEAL, TRICK_STARTED, CARD_PLAYED, Subscriber
+
+DEFAULT_BID_NOISE = 0.1
+
+# Every card that isn't a suit card, which can always be played
+SPECIAL_CARDS_MASK = card_mask(DECK_CARD_IDS) & ~ALL_SUIT_CARDS_MASK
+
+class ConstrainedDealer():
+    """
+    Deals the cards in unseen_mask to every player but player_index, with
+    hand_sizes[i] cards for player i and none of excluded_masks[i].
+    Cards left over stay in the deck. If the constraints can't all be met
+    (a player broke the rules they were inferred from) they are dropped.
+    """
+    def __init__(self, player_index, hand_mask, unseen_mask, hand_sizes, excluded_masks):
+        self.player_index = player_index
+        self.hand_mask = hand_mask
+        self.hand_sizes = hand_sizes
+        others = [i for i in range(len(hand_sizes)) if i != player_index]
+        self.constrained = [i for i in others if excluded_masks[i] & unseen_mask and hand_sizes[i] > 0]
+        self.setup(unseen_mask, excluded_masks)
+        if self.num_ways(0, tuple(hand_sizes[i] for i in self.constrained)) == 0:
+            self.constrained = []
+            self.setup(unseen_mask, excluded_masks)
+        self.free = [i for i in others if not i in self.constrained]
+
+    def setup(self, unseen_mask, excluded_masks):
+        """
+        Group the unseen cards by which constrained players may hold them.
+        """
+        groups = {}
+        self.cards = list(card_ids_in_mask(unseen_mask))
+        for card_id in self.cards:
+            allowed = tuple(j for (j, i) in enumerate(self.constrained) if not excluded_masks[i] >> card_id & 1)
+            groups.setdefault(allowed, []).append(card_id)
+        self.group_allowed = list(groups.keys())
+        self.group_sizes = [len(cards) for cards in groups.values()]
+        group_index = {allowed : g for (g, allowed) in enumerate(self.group_allowed)}
+        self.card_group = {}
+        for (allowed, cards) in groups.items():
+            for card_id in cards:
+                self.card_group[card_id] = group_index[allowed]
+        self.ways = {}
+        self.choices = {}
+
+    def splits(self, group, needs):
+        """
+        Every way to give some of the group's cards to the constrained
+        players allowed to hold them, as (counts, ways), with the rest
+        going to everybody else.
+        """
+        size = self.group_sizes[group]
+        splits = [((0,) * len(needs), 1)]
+        for j in self.group_allowed[group]:
+            next_splits = []
+            for (counts, ways) in splits:
+                given = sum(counts)
+                for count in range(min(needs[j], size - given) + 1):
+                    next_counts = counts[:j] + (count,) + counts[j + 1:]
+                    next_splits.append((next_counts, ways * factorial(size - given) // (factorial(count) * factorial(size - given - count))))
+            splits = next_splits
+        return splits
+
+    def num_ways(self, group, needs):
+        """
+        How many ways the groups from this one on can fill the constrained
+        players' needs exactly.
+        """
+        if group == len(self.group_sizes):
+            return 1 if sum(needs) == 0 else 0
+        key = (group, needs)
+        if not key in self.ways:
+            total = 0
+            choices = []
+            for (counts, ways) in self.splits(group, needs):
+                rest = self.num_ways(group + 1, tuple(need - count for (need, count) in zip(needs, counts)))
+                if rest:
+                    total += ways * rest
+                    choices.append((total, counts))
+            self.ways[key] = total
+            # Cumulative weights as fractions of the total, for sampling
+            self.choices[key] = [(cumulative / total, counts) for (cumulative, counts) in choices]
+        return self.ways[key]
+
+    def deal(self, rng):
+        """
+        The hand masks of every player, with hand_mask for player_index.
+        """
+        needs = tuple(self.hand_sizes[i] for i in self.constrained)
+        # quotas[group][j] is how many of the group go to constrained player j
+        quotas = []
+        for group in range(len(self.group_sizes)):
+            choices = self.choices.get((group, needs))
+            if choices == None:
+                self.num_ways(group, needs)
+                choices = self.choices[(group, needs)]
+            r = rng.random()
+            counts = choices[-1][1]
+            for (fraction, choice_counts) in choices:
+                if r < fraction:
+                    counts = choice_counts
+                    break
+            quotas.append(list(counts))
+            needs = tuple(need - count for (need, count) in zip(needs, counts))
+        hands = [0 for _ in self.hand_sizes]
+        hands[self.player_index] = self.hand_mask
+        order = rng.permutation(len(self.cards)).tolist()
+        if self.constrained:
+            # In a random order, each card goes to the next constrained
+            # player with room in its group's quota. The cards left over
+            # are shuffled again, since their order in the first shuffle
+            # depends on which cards were taken.
+            constrained = self.constrained
+            free_cards = []
+            for position in order:
+                card_id = self.cards[position]
+                quota = quotas[self.card_group[card_id]]
+                for j in range(len(quota)):
+                    if quota[j]:
+                        quota[j] -= 1
+                        hands[constrained[j]] |= 1 << card_id
+                        break
+                else:
+                    free_cards.append(card_id)
+            free_cards = [free_cards[position] for position in rng.permutation(len(free_cards)).tolist()]
+        else:
+            free_cards = [self.cards[position] for position in order]
+        next_card = 0
+        for i in self.free:
+            for card_id in free_cards[next_card:next_card + self.hand_sizes[i]]:
+                hands[i] |= 1 << card_id
+            next_card += self.hand_sizes[i]
+        return hands
+
+class BaselineBidModel():
+    """
+    Players bid like Player.make_bid, except that with probability noise
+    they bid something else (any other bid being equally likely).
+    """
+    def __init__(self, noise=DEFAULT_BID_NOISE):
+        self.noise = noise
+
+    def likelihoods(self, hands, bids):
+        """
+        How likely each player's bid is with each dealt hand, for a
+        (deals x players x cards) array of card ids, as (deals x players).
+        """
+        import numpy as np
+        from lockstep import make_bids
+        expected = make_bids(np.sort(hands, axis=2))
+        return np.where(expected == np.asarray(bids), 1 - self.noise, self.noise / hands.shape[2])
+
+class HandSampler(Subscriber):
+    """
+    Tracks the cards each player has played this round and the cards
+    they are known not to hold. dealt_sizes are how many cards each
+    player was dealt, which is less than the round number when the deck
+    runs out (see deck.choose_num_cards).
+    """
+    def __init__(self):
+        self.num_players = 0
+        self.round_number = 0
+        self.dealt_sizes = []
+        self.played_masks = []
+        self.excluded_masks = []
+        self.trump_index = NO_TRUMP
+        self.non_escape_has_been_played = False
+
+    def callbacks(self):
+        return {DEAL : self.deal, TRICK_STARTED : self.trick_started, CARD_PLAYED : self.card_played}
+
+    def deal(self, event):
+        self.num_players = len(event.hands)
+        self.round_number = event.round_number
+        self.dealt_sizes = [len(hand) for hand in event.hands]
+        self.played_masks = [0 for _ in range(self.num_players)]
+        self.excluded_masks = [0 for _ in range(self.num_players)]
+
+    def trick_started(self, event):
+        self.trump_index = NO_TRUMP
+        self.non_escape_has_been_played = False
+
+    def card_played(self, event):
+        card_id = event.card.card_id
+        play_id = event.card.play_id
+        player_index = event.player_index
+        self.played_masks[player_index] |= 1 << card_id
+        if self.trump_index != NO_TRUMP and PLAIN_SUIT_CARDS_MASK >> card_id & 1 and not SUIT_MASKS[self.trump_index] >> card_id & 1:
+            self.excluded_masks[player_index] |= SUIT_MASKS[self.trump_index] | SPECIAL_CARDS_MASK
+        if not self.non_escape_has_been_played and not IS_ESCAPE[play_id]:
+            self.non_escape_has_been_played = True
+            self.trump_index = FIRST_TRUMP_INDEX[play_id]
+
+    def played_mask(self):
+        played_mask = 0
+        for mask in self.played_masks:
+            played_mask |= mask
+        return played_mask
+
+    def hand_sizes(self):
+        return [self.dealt_sizes[i] - mask.bit_count() for (i, mask) in enumerate(self.played_masks)]
+
+    def dealer(self, player_index, hand_mask):
+        """
+        A ConstrainedDealer for what player_index, holding hand_mask, can't see.
+        """
+        unseen_mask = card_mask(DECK_CARD_IDS) & ~self.played_mask() & ~hand_mask
+        return ConstrainedDealer(player_index, hand_mask, unseen_mask, self.hand_sizes(), self.excluded_masks)
+
+    def bid_weights(self, deals, player_index, bids, bid_model):
+        """
+        How likely every other player's bid is with each deal (a list of
+        hand mask lists from a dealer), under bid_model. The hands they
+        bid with are the dealt hands plus what they have played.
+        """
+        import numpy as np
+        hands = np.array([[list(card_ids_in_mask(hand | self.played_masks[i])) for (i, hand) in enumerate(deal)] for deal in deals],\
+                dtype=np.int64)
+        likelihoods = bid_model.likelihoods(hands, bids)
+        likelihoods[:, player_index] = 1
+        return likelihoods.prod(axis=1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+Seeds for reproducible games. One master seed is the root of a tree:
+game i is seeded by the i-th child of the master seed, and inside a game
+the deck and every seat get their own child streams. So game i deals the
+same cards no matter which worker plays it, and a seat's random choices
+never change what the deck deals, which is what lets two strategies be
+compared on exactly the same deals.
+NumPy is only imported when a seed or generator is first made, so
+importing the game modules stays cheap.
+"""
+
+DECK_STREAM_INDEX = 0
+
+def to_seed_sequence(seed):
+    """
+    seed can be an int, a SeedSequence, or None for fresh entropy.
+    """
+    import numpy as np
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+def child_seed_sequence(seed_sequence, index):
+    """
+    The index-th child of seed_sequence. This is the same as the
+    index-th result of seed_sequence.spawn(), but doesn't depend on how
+    many children were spawned before.
+    """
+    import numpy as np
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key + (index,),\
+            pool_size=seed_sequence.pool_size)
+
+def game_seed_sequence(master_seed, game_index):
+    return child_seed_sequence(to_seed_sequence(master_seed), game_index)
+
+def new_rng(seed=None):
+    """
+    A numpy Generator, seeded from fresh entropy if seed is None.
+    """
+    import numpy as np
+    return np.random.default_rng(seed)
+
+def deck_rng(game_seed):
+    return new_rng(child_seed_sequence(game_seed, DECK_STREAM_INDEX))
+
+def seat_rng(game_seed, seat_index):
+    return new_rng(child_seed_sequence(game_seed, seat_index + 1))
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+Play many full games across a pool of worker processes and report
+statistics about each seat's final score.
+Each worker builds one Game (with its deck and players) when it starts
+and reuses it for every game it plays, so the cost of starting a process
+is paid once per worker instead of once per game.
+Game i is always seeded from the i-th child of the master seed, so a run
+gives the same results for any number of workers or chunk size.
+With lockstep, each chunk of games is played at once by lockstep.py
+instead, which gives the same results much faster but can't write the
+games to a file. It works best with large chunks.
+With seats, each seat plays the strategy named for it (see
+strategies.py), and with a DecisionTimer every worker times its seats'
+decisions and the timings are merged into it, like the statistics.
+"""
+
+import argparse
+import math
+from multiprocessing import Pool
+import os
+
+from game import Game
+from game_writer import JsonLinesGameWriter
+from latency import DecisionTimer, print_decision_latencies
+from lockstep import play_games
+from seeding import game_seed_sequence, to_seed_sequence
+from strategies import parse_seats, parse_strategy
+
+DEFAULT_CHUNK_SIZE = 50
+
+class SeatStatistics():
+    """
+    Running totals of the final scores for one seat. These can be merged,
+    so each worker only sends back a few numbers per seat.
+    """
+    def __init__(self):
+        self.num_games = 0
+        self.total = 0
+        self.total_squared = 0
+        self.min_score = None
+        self.max_score = None
+        self.wins = 0
+
+    def add_score(self, score, won):
+        self.num_games += 1
+        self.total += score
+        self.total_squared += score * score
+        if self.min_score == None or score < self.min_score:
+            self.min_score = score
+        if self.max_score == None or score > self.max_score:
+            self.max_score = score
+        if won:
+            self.wins += 1
+
+    def merge(self, other):
+        if other.num_games == 0:
+            return
+        if self.num_games == 0 or other.min_score < self.min_score:
+            self.min_score = other.min_score
+        if self.num_games == 0 or other.max_score > self.max_score:
+            self.max_score = other.max_score
+        self.num_games += other.num_games
+        self.total += other.total
+        self.total_squared += other.total_squared
+        self.wins += other.wins
+
+    def mean(self):
+        return self.total / self.num_games
+
+    def standard_deviation(self):
+        if self.num_games < 2:
+            return 0.0
+        mean = self.mean()
+        variance = (self.total_squared - self.num_games * mean * mean) / (self.num_games - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def win_rate(self):
+        return self.wins / self.num_games
+
+def add_game_to_statistics(seat_statistics, scores):
+    """
+    Every seat tied for the highest score is counted as a winner.
+    """
+    best_score = max(scores)
+    for i in range(len(scores)):
+        seat_statistics[i].add_score(scores[i], scores[i] == best_score)
+
+def chunk_sizes(num_games, chunk_size):
+    """
+    Split num_games into pieces of at most chunk_size games.
+    """
+    sizes = [chunk_size for _ in range(num_games // chunk_size)]
+    if num_games % chunk_size != 0:
+        sizes.append(num_games % chunk_size)
+    return sizes
+
+def make_chunks(master_seed, num_games, chunk_size):
+    """
+    Each chunk is (master seed, index of its first game, number of games).
+    """
+    chunks = []
+    first_game_index = 0
+    for size in chunk_sizes(num_games, chunk_size):
+        chunks.append((master_seed, first_game_index, size))
+        first_game_index += size
+    return chunks
+
+# Each worker process keeps its own game around between chunks.
+worker_game = None
+worker_num_players = None
+
+def init_worker(num_players, jsonl_filepath, archive_filepath, seats=None, time_decisions=False):
+    global worker_game
+    game_writer = None
+    if jsonl_filepath:
+        game_writer = JsonLinesGameWriter(jsonl_filepath)
+    elif archive_filepath:
+        from game_archive import BinaryGameWriter
+        game_writer = BinaryGameWriter(archive_filepath, num_players)
+    worker_game = Game(num_players, False, False, False, False, False, False, False, game_writer=game_writer, seats=seats)
+    if time_decisions:
+        worker_game.decision_timer = DecisionTimer()
+
+def close_worker():
+    """
+    Close the worker's game writer and players and drop its game, for
+    runs that use this process as the only worker.
+    """
+    global worker_game
+    if worker_game != None and worker_game.game_writer != None:
+        worker_game.game_writer.close()
+    if worker_game != None:
+        for player in worker_game.players:
+            # Search players can hold a pool of processes
+            if hasattr(player, "close"):
+                player.close()
+    worker_game = None
+
+def play_chunk(chunk):
+    """
+    The chunk's SeatStatistics, and its DecisionTimer if decisions are timed.
+    """
+    (master_seed, first_game_index, num_games) = chunk
+    seat_statistics = [SeatStatistics() for _ in range(worker_game.num_players)]
+    if worker_game.decision_timer != None:
+        worker_game.decision_timer = DecisionTimer()
+    for game_index in range(first_game_index, first_game_index + num_games):
+        worker_game.reset(game_seed_sequence(master_seed, game_index), game_index)
+        worker_game.run_game(None)
+        add_game_to_statistics(seat_statistics, worker_game.scores)
+    if worker_game.game_writer != None:
+        # Workers are never told they are done, so don't hold logs between chunks.
+        worker_game.game_writer.flush()
+    return (seat_statistics, worker_game.decision_timer)
+
+def play_lockstep_chunk(chunk):
+    (master_seed, first_game_index, num_games) = chunk
+    results = play_games(worker_num_players, [game_seed_sequence(master_seed, game_index)\
+            for game_index in range(first_game_index, first_game_index + num_games)])
+    seat_statistics = [SeatStatistics() for _ in range(worker_num_players)]
+    for scores in results.final_scores().tolist():
+        add_game_to_statistics(seat_statistics, scores)
+    return (seat_statistics, None)
+
+def init_lockstep_worker(num_players):
+    global worker_num_players
+    worker_num_players = num_players
+
+def simulate(num_players, num_games, num_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, master_seed=None, jsonl_filepath=None,\
+        archive_filepath=None, lockstep=False, seats=None, decision_timer=None):
+    """
+    Play num_games games and return a list of SeatStatistics, one per seat.
+    With a single worker everything runs in this process.
+    If jsonl_filepath is given, every game is appended to it as JSON Lines,
+    and if archive_filepath is given, to that binary game archive.
+    seats are strategy names, one per seat, and decision_timer is a
+    DecisionTimer to add the time of every decision to. Strategies that
+    start processes of their own (like mcts:num_workers=2) can only be
+    seated with num_workers=1.
+    """
+    if num_workers == None:
+        num_workers = os.cpu_count() or 1
+    if lockstep and (jsonl_filepath or archive_filepath):
+        raise ValueError("Games played in lockstep can't be written to a file.")
+    if lockstep and (seats != None or decision_timer != None):
+        raise ValueError("Games played in lockstep only have built-in players, which aren't timed.")
+    if num_workers != 1 and seats != None:
+        # Fail here rather than in a worker, where the pool would have to be torn down
+        for seat in seats:
+            (name, options) = parse_strategy(seat)
+            if int(options.get("num_workers", 1)) > 1:
+                raise ValueError("Seat strategy %s starts processes of its own, so it needs num_workers=1." % (seat))
+    seat_statistics = [SeatStatistics() for _ in range(num_players)]
+    chunks = make_chunks(to_seed_sequence(master_seed), num_games, chunk_size)
+    if lockstep:
+        (initializer, initargs, play) = (init_lockstep_worker, (num_players,), play_lockstep_chunk)
+    else:
+        (initializer, initargs, play) = (init_worker, (num_players, jsonl_filepath, archive_filepath, seats, decision_timer != None), play_chunk)
+    if archive_filepath:
+        # Write the header before any worker can start appending games.
+        from game_archive import create_archive_if_missing
+        create_archive_if_missing(archive_filepath, num_players)
+    if num_workers == 1:
+        initializer(*initargs)
+        try:
+            for (chunk_statistics, chunk_timer) in map(play, chunks):
+                merge_chunk(seat_statistics, decision_timer, chunk_statistics, chunk_timer)
+        finally:
+            close_worker()
+        return seat_statistics
+    with Pool(num_workers, initializer=initializer, initargs=initargs) as pool:
+        for (chunk_statistics, chunk_timer) in pool.imap_unordered(play, chunks):
+            merge_chunk(seat_statistics, decision_timer, chunk_statistics, chunk_timer)
+    return seat_statistics
+
+def merge_chunk(seat_statistics, decision_timer, chunk_statistics, chunk_timer):
+    for i in range(len(seat_statistics)):
+        seat_statistics[i].merge(chunk_statistics[i])
+    if decision_timer != None:
+        decision_timer.merge(chunk_timer)
+
+def print_seat_statistics(seat_statistics, seats=None):
+    """
+    seats, if given, are the strategy names to show for each seat.
+    """
+    if seats == None:
+        print("Seat  Games    Mean   StdDev    Min    Max  Win rate")
+    else:
+        print("Seat  Games    Mean   StdDev    Min    Max  Win rate  Strategy")
+    for i in range(len(seat_statistics)):
+        stats = seat_statistics[i]
+        if stats.num_games == 0:
+            line = "%4d %6d %7s %8s %6s %6s %9s" % (i, 0, "-", "-", "-", "-", "-")
+        else:
+            line = "%4d %6d %7.1f %8.1f %6d %6d %9.3f" % (i, stats.num_games, stats.mean(), stats.standard_deviation(),\
+                    stats.min_score, stats.max_score, stats.win_rate())
+        if seats != None:
+            line += "  " + seats[i]
+        print(line)
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("%s is not a positive number" % (text))
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many full games of skull king in parallel and summarize each seat's scores.")
+    parser.add_argument("-n", "--num-players", type=int, required=True, help="How many players each game has")
+    parser.add_argument("-g", "--num-games", type=positive_int, required=True, help="How many games to play")
+    parser.add_argument("-w", "--num-workers", type=positive_int, required=False, help="How many worker processes to use (defaults to the number of CPUs)")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE, help="How many games a worker plays per unit of work")
+    parser.add_argument("--seed", type=int, required=False, help="Master seed for every game in the run")
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument("--jsonl-filepath", required=False, help="JSON Lines file to append every game to")
+    output_group.add_argument("--archive-filepath", required=False, help="Binary game archive to append every game to")
+    output_group.add_argument("--lockstep", action='store_true', help="Play each chunk of games at once with NumPy arrays (use a large --chunk-size)")
+    parser.add_argument("--seats", required=False, help="Comma separated strategy of each seat, like heuristic,mcts,random")
+    parser.add_argument("--print-latencies", action='store_true', help="Print how long each strategy took to decide")
+
+    args = parser.parse_args()
+
+    seats = parse_seats(args.seats, args.num_players) if args.seats else None
+    decision_timer = DecisionTimer() if args.print_latencies else None
+    master_seed = to_seed_sequence(args.seed)
+    print("Master seed: %d" % (master_seed.entropy))
+    seat_statistics = simulate(args.num_players, args.num_games, args.num_workers, args.chunk_size, master_seed,\
+            args.jsonl_filepath, args.archive_filepath, args.lockstep, seats, decision_timer)
+    print_seat_statistics(seat_statistics, seats)
+    if decision_timer != None:
+        print_decision_latencies(decision_timer)
+
+if __name__ == "__main__":
+    main()
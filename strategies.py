@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+The strategies a Game can seat, by name. A strategy is a Player
+subclass, and the game calls the same methods on every seat:
+    get_hand(hand) at the start of each round,
+    make_bid(num_players, seat, round_number), which sets and returns self.bid,
+    determine_illegal_indices(trick) and then
+    choose_and_play_card(trick, num_players), which returns the card played,
+    win_trick() whenever the seat takes a trick.
+A strategy picks how to play the Tigress by playing it with
+play_move(TIGRESS_ESCAPE_ID) or play_move(TIGRESS_ID); plain Player
+decides with make_tigress_escape() once it has its bid.
+
+STRATEGIES maps each name to a function that makes the player from its
+seat's rng. The search players are imported only when they are seated,
+so games of plain players stay cheap to start. Players that are also
+Subscribers (like ISMCTSPlayer) are subscribed to the game's events.
+
+A seat can also give options after the name, each as :key=value, like
+    mcts:iterations=200:num_workers=2
+    mcts:time_budget=0.05
+    double_dummy:max_cards=8
+which are passed to the function as strings.
+"""
+
+from card_table import *
+from player import Player
+
+DEFAULT_STRATEGY = "heuristic"
+
+class RandomPlayer(Player):
+    """
+    Bids a random number of tricks and plays a random legal card, with
+    the Tigress played either way at random.
+    """
+    def make_bid(self, num_players, seat=0, round_number=None):
+        self.bid = int(self.rng.integers(len(self.hand) + 1))
+        return self.bid
+
+    def choose_and_play_card(self, trick, num_players):
+        card = self.hand[self.legal_index_holder.get_random_legal_index(self.rng)]
+        if card.card_id == TIGRESS_ID and self.rng.random() < 0.5:
+            return self.play_move(TIGRESS_ESCAPE_ID)
+        return self.play_move(card.card_id)
+
+def make_ismcts_player(rng, iterations=None, time_budget=None, num_workers=1):
+    """
+    With only a time_budget, decisions aren't limited by iterations.
+    """
+    from ismcts import DEFAULT_ITERATIONS, ISMCTSPlayer
+    if iterations == None and time_budget == None:
+        iterations = DEFAULT_ITERATIONS
+    return ISMCTSPlayer(rng, iterations=None if iterations == None else int(iterations),\
+            time_budget=None if time_budget == None else float(time_budget), num_workers=int(num_workers))
+
+# One TrickDistributionService per number of samples, shared by every
+# distribution seat in the process so they share its cache. Its seed is
+# fixed, so a hand's distribution (and so the bid) is the same in every run.
+distribution_services = {}
+DISTRIBUTION_SEED = 0
+
+def make_distribution_player(rng, num_samples=None):
+    """
+    Bids from the exact tables for the first rounds and from simulated
+    rounds after them (see bidding.py).
+    """
+    from bidding import DEFAULT_NUM_SAMPLES, DistributionBidPlayer, TrickDistributionService
+    num_samples = DEFAULT_NUM_SAMPLES if num_samples == None else int(num_samples)
+    if not num_samples in distribution_services:
+        distribution_services[num_samples] = TrickDistributionService(num_samples=num_samples, seed=DISTRIBUTION_SEED)
+    return DistributionBidPlayer(distribution_services[num_samples], rng)
+
+def make_double_dummy_player(rng, max_cards=None):
+    """
+    Only solves the last max_cards cards of each round (see
+    double_dummy.py), since full rounds with 4 or more players take
+    minutes to solve. Before then it plays like heuristic.
+    """
+    from double_dummy import DEFAULT_ENDGAME_CARDS, DoubleDummyPlayer
+    return DoubleDummyPlayer(rng, max_cards=DEFAULT_ENDGAME_CARDS if max_cards == None else int(max_cards))
+
+STRATEGIES = {"heuristic" : Player, "random" : RandomPlayer, "mcts" : make_ismcts_player, "double_dummy" : make_double_dummy_player,\
+        "distribution" : make_distribution_player}
+
+def register_strategy(name, make_player):
+    """
+    Make name seatable, with make_player(rng) making its player.
+    """
+    STRATEGIES[name] = make_player
+
+def parse_strategy(strategy):
+    """
+    A strategy name with its options, like mcts:iterations=200, as
+    (name, options).
+    """
+    (name, *parts) = strategy.split(":")
+    options = {}
+    for part in parts:
+        (key, equals, value) = part.partition("=")
+        if not equals:
+            raise ValueError("The option %s of strategy %s needs a value, like %s=1." % (part, name, part))
+        options[key] = value
+    return (name, options)
+
+def check_strategy(strategy):
+    (name, _) = parse_strategy(strategy)
+    if not name in STRATEGIES:
+        raise ValueError("Unknown strategy %s, the strategies are %s." % (name, ", ".join(sorted(STRATEGIES))))
+
+def make_player(strategy, rng=None):
+    """
+    strategy is a name from STRATEGIES, with options or without.
+    """
+    check_strategy(strategy)
+    (name, options) = parse_strategy(strategy)
+    if not options:
+        return STRATEGIES[name](rng)
+    try:
+        return STRATEGIES[name](rng, **options)
+    except TypeError as error:
+        raise ValueError("Strategy %s can't take the options %s." % (name, ", ".join(options))) from error
+
+def parse_seats(seats, num_players):
+    """
+    A comma separated list of strategy names, one per seat, like the
+    --seats option takes, as a list.
+    """
+    names = [name.strip() for name in seats.split(",")]
+    if len(names) != num_players:
+        raise ValueError("%d strategies were given for %d seats." % (len(names), num_players))
+    for name in names:
+        check_strategy(name)
+    return names
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 from card import CardCategory, Suit, TigressMode
+from card_table import ALL_CARDS_MASK, CARD_SUIT_INDEX, DEFEATS, DEFEATS_MASKS, FIRST_TRUMP_INDEX, FORCES_NO_TRUMP, IS_ESCAPE, MERMAID_MASK, NO_TRUMP,\
+        PIRATE_MASK, REFERENCE_CARDS, SKULL_KING_MASK, TIGRESS_MASK
 
 def card_is_escape(card):
     return card.card_category == CardCategory.Escape or (card.card_category == CardCategory.Tigress and card.tigress_mode == TigressMode.Escape)
@@ -13,38 +15,6 @@ def card_forces_no_trump(card):
     return card.card_category == CardCategory.Pirate or card.card_category == CardCategory.Mermaid or card.card_category == CardCategory.SkullKing\
             or (card.card_category == CardCategory.Tigress and card.tigress_mode == TigressMode.Pirate)
 
-def determine_winning_index(cards):
-    num_cards = len(cards)
-    if num_cards == 0:
-        raise ValueError("Cannot determine winner of empty set of cards.")
-    elif num_cards == 1:
-        return 0
-    else:
-        no_trump = False
-        trump_suit = None
-        seen_non_escape = False
-        winning_index_so_far = 0
-        winning_card_so_far = cards[0]
-        for i in range(num_cards):
-            if not seen_non_escape:
-                if card_forces_no_trump(cards[i]):
-                    no_trump = True
-                    seen_non_escape = True
-                    winning_index_so_far = i
-                    winning_card_so_far = cards[i]
-                elif card_is_escape(cards[i]):
-                    pass
-                else:
-                    trump_suit = cards[i].suit
-                    no_trump = False
-                    seen_non_escape = True
-                    winning_index_so_far = i
-                    winning_card_so_far = cards[i]
-
-            if cards[i].card_category == CardCategory.Suit:
-                trump_suit
-    trump_suit = None
-
 def bonus_points(cards_played, winning_card):
     points = 0
     for card in cards_played:
@@ -60,17 +30,88 @@ def bonus_points(cards_played, winning_card):
             points += 40
     return points
 
+# NumPy versions of the lookup tables for resolve_tricks, made the first
+# time they are needed so that importing this module doesn't load NumPy.
+batch_tables = None
+
+def get_batch_tables():
+    """
+    (defeats, is_escape, trump_index, bonus) as arrays indexed by play id.
+    bonus[card_id][winning_id] is what card_id adds to bonus_points() when
+    winning_id wins the trick, since each card's bonus doesn't depend on
+    the other cards.
+    """
+    global batch_tables
+    if batch_tables == None:
+        import numpy as np
+        bonus = [[bonus_points([card], winning_card) for winning_card in REFERENCE_CARDS] for card in REFERENCE_CARDS]
+        batch_tables = (np.array(DEFEATS, dtype=bool), np.array(IS_ESCAPE, dtype=bool), np.array(FIRST_TRUMP_INDEX, dtype=np.intp),\
+                np.array(bonus, dtype=np.int32))
+    return batch_tables
+
+def resolve_tricks(cards_played, leaders=None):
+    """
+    Resolve many tricks at once. cards_played is an (N tricks x P players)
+    array of play ids in the order they were played. Returns
+    (winners, bonus) where winners[i] is the position in play order of the
+    card that won trick i, or the winning player if leaders (the player
+    who led each trick) is given, and bonus[i] is bonus_points() of the
+    trick. This follows the same rules as Trick.play_card.
+    """
+    import numpy as np
+    (defeats, is_escape, first_trump_index, bonus) = get_batch_tables()
+    cards_played = np.asarray(cards_played, dtype=np.intp)
+    (num_tricks, num_cards) = cards_played.shape
+    winning_id = cards_played[:, 0].copy()
+    winning_position = np.zeros(num_tricks, dtype=np.intp)
+    trump_index = np.full(num_tricks, NO_TRUMP, dtype=np.intp)
+    non_escape_has_been_played = np.zeros(num_tricks, dtype=bool)
+    for position in range(num_cards):
+        card_id = cards_played[:, position]
+        # The first non-escape sets the trump and takes the lead.
+        first_non_escape = ~non_escape_has_been_played & ~is_escape[card_id]
+        trump_index[first_non_escape] = first_trump_index[card_id[first_non_escape]]
+        non_escape_has_been_played |= first_non_escape
+        # After that, a card takes the lead only if it defeats the winner.
+        wins = first_non_escape | (non_escape_has_been_played & defeats[trump_index, card_id, winning_id])
+        winning_id[wins] = card_id[wins]
+        winning_position[wins] = position
+    trick_bonus = bonus[cards_played, winning_id[:, np.newaxis]].sum(axis=1)
+    if leaders is None:
+        return (winning_position, trick_bonus)
+    return ((np.asarray(leaders) + winning_position) % num_cards, trick_bonus)
+
 class Trick():
     def __init__(self, players, leading_player_index):
         self.players = players
         self.num_players = len(players)
+        self.cards_played = []
+        # A CardCounter to tell about every card played, if any. Unlike
+        # the rest of the trick it is kept for the whole round.
+        self.card_counter = None
+        self.reset(leading_player_index)
+
+    def reset(self, leading_player_index):
+        """
+        Start a new trick with this object, so a game can play every trick
+        with one Trick. cards_played is emptied, not replaced.
+        """
         self.leading_player_index = leading_player_index
         self.trump_suit = None
         self.no_trump = False # If a special card is the first non-escape played
         self.non_escape_has_been_played = False
         self.current_winning_index = -1
         self.current_winning_card = None
-        self.cards_played = []
+        self.cards_played.clear()
+        # The same trick state as card ids, for the lookup tables
+        self.trump_index = NO_TRUMP
+        self.current_winning_id = -1
+        # A summary of the trick kept up to date as cards are played, so
+        # strategies can ask about it without looking through cards_played.
+        # played_mask has the play id of every card played, and winning_mask
+        # has every play id that would take the lead if played next.
+        self.played_mask = 0
+        self.winning_mask = ALL_CARDS_MASK
 
     def card_index_to_player_index(self, i):
         """
@@ -83,63 +124,56 @@ class Trick():
         return self.trump_suit != None and card.card_category == CardCategory.Suit and card.suit != self.trump_suit
 
     def would_win(self, card):
-        if len(self.cards_played) == 0:
-            return True
-        elif self.trump_suit != None:
-            return card.defeats_no_trump(self.current_winning_card)
-        else:
-            return card.defeats(self.current_winning_card, self.trump_suit)
+        return self.winning_mask >> card.play_id & 1 == 1
+
+    def winning_cards(self, mask):
+        """
+        The play ids in mask that would win the trick if played next.
+        """
+        return mask & self.winning_mask
+
+    def num_played(self, mask):
+        """
+        How many of the cards played have their play id in mask, like
+        num_played(PIRATE_MASK) for the number of pirates.
+        """
+        return (self.played_mask & mask).bit_count()
 
     def contains_mermaid(self):
-        for card in self.cards_played:
-            if card.card_category == CardCategory.Mermaid:
-                return True
-        return False
+        return self.played_mask & MERMAID_MASK != 0
 
     def contains_pirate(self):
-        for card in self.cards_played:
-            if card.is_pirate():
-                return True
-        return False
+        # An escaped Tigress has its own play id, so TIGRESS_MASK is only
+        # the Tigress played as a pirate.
+        return self.played_mask & (PIRATE_MASK | TIGRESS_MASK) != 0
 
     def contains_skull_king(self):
-        for card in self.cards_played:
-            if card.card_category == CardCategory.SkullKing:
-                return True
-        return False
+        return self.played_mask & SKULL_KING_MASK != 0
 
     def play_card(self, card):
+        card_id = card.play_id
         self.cards_played.append(card)
-        num_cards_played = len(self.cards_played)
-        if num_cards_played == 1:
-            self.current_winning_index = 0
-            self.current_winning_card = card
-            if card_is_escape(card):
-                pass
-            else:
-                self.non_escape_has_been_played = True
-                if card_forces_no_trump(card):
-                    self.no_trump = True
-                else:
-                    self.trump_suit = card.suit
-        else:
-            if not self.non_escape_has_been_played:
-                if card_is_escape(card):
-                    pass
-                else:
-                    self.non_escape_has_been_played = True
-                    self.current_winning_index = num_cards_played - 1
-                    self.current_winning_card = card
-                    if card_forces_no_trump(card):
-                        self.no_trump = True
-                    else:
-                        self.trump_suit = card.suit
-            elif self.no_trump:
-                if card.defeats_no_trump(self.current_winning_card):
-                    self.current_winning_index = num_cards_played - 1
+        if self.card_counter != None:
+            self.card_counter.card_played(card)
+        self.played_mask |= 1 << card_id
+        if not self.non_escape_has_been_played:
+            if IS_ESCAPE[card_id]:
+                # The first card wins if everybody escapes.
+                if len(self.cards_played) == 1:
+                    self.current_winning_index = 0
                     self.current_winning_card = card
+                    self.current_winning_id = card_id
+                    self.winning_mask = DEFEATS_MASKS[NO_TRUMP][card_id]
+                return
+            self.non_escape_has_been_played = True
+            if FORCES_NO_TRUMP[card_id]:
+                self.no_trump = True
             else:
-                # Finally, the normal case when there is a trump suit.
-                if card.defeats(self.current_winning_card, self.trump_suit):
-                    self.current_winning_index = num_cards_played - 1
-                    self.current_winning_card = card
+                self.trump_suit = card.suit
+                self.trump_index = CARD_SUIT_INDEX[card_id]
+        elif not self.winning_mask >> card_id & 1:
+            return
+        self.current_winning_index = len(self.cards_played) - 1
+        self.current_winning_card = card
+        self.current_winning_id = card_id
+        self.winning_mask = DEFEATS_MASKS[self.trump_index][card_id]
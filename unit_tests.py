@@ -1,10 +1,38 @@
 #!/usr/bin/env python3
 
+import contextlib
+import io
+import json
+import numpy as np
+import os
+import tempfile
+import time
 import unittest
 
+from benchmark_imports import *
+from bidding import *
+from canonical import *
 from card import *
+from card_counter import *
+from card_table import *
 from deck import *
+from double_dummy import *
+from events import *
+from exact_tables import *
+from game import *
+from game_archive import *
+from game_index import *
+from game_state import *
+from game_writer import *
+from ismcts import *
+from latency import *
+from lockstep import *
+from match import *
 from player import *
+from sampler import *
+from seeding import *
+from simulate import *
+from strategies import *
 from trick import *
 
 class TestCards(unittest.TestCase):
@@ -35,7 +63,8 @@ class TestCards(unittest.TestCase):
         self.assertEqual(hand[9], skull_king)
 
         # Make sure escape tigress is sorted correctly
-        tigress.escape()
+        tigress = tigress.escape()
+        hand[hand.index(tigress)] = tigress
         hand.sort(key=lambda x: x.power, reverse=False)
         tigress_is_0th_or_1st = (hand[0] == tigress or hand[1] == tigress)
         self.assertTrue(tigress_is_0th_or_1st)
@@ -49,7 +78,7 @@ class TestCards(unittest.TestCase):
         self.assertTrue(green2.defeats(EscapeCard(), Suit.TreasureMap))
         tigress = TigressCard()
         self.assertFalse(green2.defeats(tigress, Suit.Parrot))
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertTrue(green2.defeats(tigress, Suit.JollyRoger))
         # Compare to other suit cards
         green14 = SuitCard(Suit.Parrot, 14)
@@ -81,7 +110,7 @@ class TestCards(unittest.TestCase):
         self.assertFalse(PirateCard().defeats(SkullKingCard(), Suit.TreasureMap))
         tigress = TigressCard()
         self.assertFalse(PirateCard().defeats(tigress, Suit.TreasureMap))
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertTrue(PirateCard().defeats(tigress, Suit.TreasureMap))
 
     def test_mermaid_defeats(self):
@@ -93,7 +122,7 @@ class TestCards(unittest.TestCase):
         self.assertTrue(MermaidCard().defeats(SkullKingCard(), Suit.TreasureMap))
         tigress = TigressCard()
         self.assertFalse(MermaidCard().defeats(tigress, Suit.TreasureMap))
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertTrue(MermaidCard().defeats(tigress, Suit.TreasureMap))
 
     def test_skull_king_defeats(self):
@@ -104,7 +133,7 @@ class TestCards(unittest.TestCase):
         self.assertTrue(SkullKingCard().defeats(EscapeCard(), Suit.TreasureMap))
         tigress = TigressCard()
         self.assertTrue(SkullKingCard().defeats(tigress, Suit.TreasureMap))
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertTrue(SkullKingCard().defeats(tigress, Suit.TreasureMap))
 
     def test_escape_defeats(self):
@@ -116,7 +145,7 @@ class TestCards(unittest.TestCase):
         self.assertFalse(EscapeCard().defeats(SkullKingCard(), Suit.TreasureMap))
         tigress = TigressCard()
         self.assertFalse(EscapeCard().defeats(tigress, Suit.TreasureMap))
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertFalse(EscapeCard().defeats(tigress, Suit.TreasureMap))
 
     def test_tigress_defeats(self):
@@ -129,7 +158,7 @@ class TestCards(unittest.TestCase):
         self.assertTrue(tigress.defeats(EscapeCard(), Suit.TreasureMap))
         self.assertFalse(tigress.defeats(SkullKingCard(), Suit.TreasureMap))
         # Test Tigress as Escape
-        tigress.escape()
+        tigress = tigress.escape()
         self.assertFalse(tigress.defeats(SuitCard(Suit.Parrot, 14), Suit.Parrot))
         self.assertFalse(tigress.defeats(SuitCard(Suit.JollyRoger, 8), Suit.TreasureMap))
         self.assertFalse(tigress.defeats(MermaidCard(), Suit.TreasureMap))
@@ -137,6 +166,149 @@ class TestCards(unittest.TestCase):
         self.assertFalse(tigress.defeats(EscapeCard(), Suit.TreasureMap))
         self.assertFalse(tigress.defeats(SkullKingCard(), Suit.TreasureMap))
 
+class TestCardTable(unittest.TestCase):
+    def test_deck_card_ids(self):
+        deck = Deck()
+        card_ids = sorted(card.card_id for card in deck.cards)
+        self.assertEqual(card_ids, list(range(DECK_SIZE)))
+
+    def test_cards_are_shared_and_immutable(self):
+        deck = Deck(shuffle=True)
+        other_deck = Deck(shuffle=True)
+        for card in deck.cards:
+            self.assertIs(card, REFERENCE_CARDS[card.card_id])
+        self.assertEqual(set(map(id, deck.cards)), set(map(id, other_deck.cards)))
+        with self.assertRaises(AttributeError):
+            deck.cards[0].power = 100
+        with self.assertRaises(AttributeError):
+            deck.cards[0].color = "Red"
+        self.assertEqual(str(REFERENCE_CARDS[TIGRESS_ESCAPE_ID]), "Tigress")
+        # Playing an escaped Tigress puts the escape card in the trick
+        player = Player()
+        player.get_hand([REFERENCE_CARDS[TIGRESS_ID]])
+        player.make_tigress_escape()
+        player.determine_illegal_indices(Trick([player], 0))
+        self.assertIs(player.play_card_at_index(0), REFERENCE_CARDS[TIGRESS_ESCAPE_ID])
+        self.assertFalse(REFERENCE_CARDS[TIGRESS_ID].is_escape())
+
+    def test_copy_numbers(self):
+        # A copy's id only depends on which copy it is, not on what was made before
+        for _ in range(2):
+            self.assertEqual([PirateCard(i).card_id for i in range(NUM_PIRATE_CARDS)], list(range(PIRATE_FIRST_ID, TIGRESS_ID)))
+        self.assertEqual(EscapeCard().card_id, ESCAPE_FIRST_ID)
+        self.assertEqual(MermaidCard(1).card_id, MERMAID_FIRST_ID + 1)
+        with self.assertRaises(ValueError):
+            EscapeCard(NUM_ESCAPE_CARDS)
+
+    def test_card_ids_sorted_by_power(self):
+        powers = [REFERENCE_CARDS[card_id].power for card_id in range(NUM_CARD_IDS - 1)]
+        self.assertEqual(powers, sorted(powers))
+
+    def test_card_from_id(self):
+        for card_id in range(NUM_CARD_IDS):
+            self.assertEqual(card_from_id(card_id).play_id, card_id)
+        self.assertEqual(str(card_from_id(suit_card_id(Suit.TreasureMap, 7))), "Purple 7")
+
+    def test_card_masks(self):
+        mask = card_mask([3, 17, 60])
+        self.assertEqual(lowest_card_id(mask), 3)
+        self.assertEqual(highest_card_id(mask), 60)
+        self.assertEqual(list(card_ids_in_mask(mask)), [3, 17, 60])
+        self.assertEqual(bin(SUIT_MASKS[Suit.Parrot.value]).count("1"), MAX_SUIT_NUMBER)
+        self.assertEqual(SUIT_MASKS[NO_TRUMP], 0)
+        self.assertEqual(ALL_SUIT_CARDS_MASK, sum(SUIT_MASKS))
+
+    def test_defeats_table(self):
+        green2 = suit_card_id(Suit.Parrot, 2)
+        green14 = suit_card_id(Suit.Parrot, 14)
+        yellow5 = suit_card_id(Suit.TreasureChest, 5)
+        black1 = suit_card_id(Suit.JollyRoger, 1)
+        self.assertTrue(DEFEATS[Suit.Parrot.value][green14][green2])
+        self.assertFalse(DEFEATS[Suit.Parrot.value][yellow5][green2])
+        self.assertTrue(DEFEATS[Suit.TreasureChest.value][yellow5][green14])
+        self.assertTrue(DEFEATS[Suit.Parrot.value][black1][green14])
+        self.assertFalse(DEFEATS[NO_TRUMP][yellow5][green14])
+        self.assertTrue(DEFEATS[NO_TRUMP][SKULL_KING_ID][PIRATE_FIRST_ID])
+        self.assertTrue(DEFEATS[NO_TRUMP][MERMAID_FIRST_ID][SKULL_KING_ID])
+        self.assertFalse(DEFEATS[NO_TRUMP][PIRATE_FIRST_ID][TIGRESS_ID])
+        self.assertTrue(DEFEATS[NO_TRUMP][PIRATE_FIRST_ID][TIGRESS_ESCAPE_ID])
+        self.assertFalse(DEFEATS[NO_TRUMP][TIGRESS_ESCAPE_ID][ESCAPE_FIRST_ID])
+
+    def test_trick_rules(self):
+        rng = np.random.default_rng(8)
+        players = [Player() for _ in range(5)]
+        trick = Trick(players, 0)
+        for _ in range(300):
+            trick.reset(0)
+            card_ids = rng.permutation(NUM_CARD_IDS - 1)[:5]
+            card_ids[card_ids == TIGRESS_ID] = rng.choice([TIGRESS_ID, TIGRESS_ESCAPE_ID])
+            summary = (NO_TRUMP, -1, 0)
+            for (position, card_id) in enumerate(card_ids.tolist()):
+                hand_mask = card_mask(rng.permutation(DECK_CARD_IDS)[:4].tolist())
+                players[0].get_hand([REFERENCE_CARDS[hand_card_id] for hand_card_id in card_ids_in_mask(hand_mask)])
+                players[0].determine_illegal_indices(trick)
+                self.assertEqual(legal_mask(hand_mask, trick.trump_index), players[0].legal_index_holder.legal_mask)
+                trick.play_card(REFERENCE_CARDS[card_id])
+                summary = advance_trick(*summary, position, card_id)
+                self.assertEqual(summary, (trick.trump_index, trick.current_winning_id, trick.current_winning_index))
+
+class TestCardCounter(unittest.TestCase):
+    def test_counts(self):
+        counter = CardCounter()
+        self.assertEqual(counter.num_left_in_suit(Suit.Parrot), MAX_SUIT_NUMBER)
+        self.assertEqual(counter.num_left(CardCategory.Pirate), 5)
+        parrot12 = REFERENCE_CARDS[suit_card_id(Suit.Parrot, 12)]
+        self.assertEqual(counter.num_unseen_higher_in_suit(parrot12), 2)
+        counter.card_played(REFERENCE_CARDS[suit_card_id(Suit.Parrot, 14)])
+        self.assertFalse(counter.is_highest_in_suit(parrot12))
+        # A card in the hand isn't out
+        self.assertTrue(counter.is_highest_in_suit(parrot12, card_mask([suit_card_id(Suit.Parrot, 13)])))
+        counter.card_played(REFERENCE_CARDS[suit_card_id(Suit.Parrot, 13)])
+        counter.card_played(REFERENCE_CARDS[TIGRESS_ESCAPE_ID])
+        self.assertTrue(counter.is_highest_in_suit(parrot12))
+        self.assertEqual(counter.num_left_in_suit(Suit.Parrot), MAX_SUIT_NUMBER - 2)
+        self.assertEqual(counter.num_left(CardCategory.Tigress), 0)
+        self.assertEqual(counter.unseen_mask(card_mask([5])), DECK_MASK & ~card_mask([5, TIGRESS_ID,\
+                suit_card_id(Suit.Parrot, 13), suit_card_id(Suit.Parrot, 14)]))
+        counter.reset()
+        self.assertEqual(counter.unseen_mask(), DECK_MASK)
+
+    def test_num_unseen_beating(self):
+        rng = np.random.default_rng(20)
+        counter = CardCounter()
+        played = rng.permutation(DECK_CARD_IDS)[:30].tolist()
+        for card_id in played:
+            counter.card_played(REFERENCE_CARDS[card_id])
+        hand_mask = card_mask([card_id for card_id in DECK_CARD_IDS if not card_id in played][:5])
+        for play_id in range(NUM_CARD_IDS):
+            for trump_index in range(NUM_TRUMP_INDICES):
+                expected = 0
+                for card_id in DECK_CARD_IDS:
+                    if card_id in played or hand_mask >> card_id & 1:
+                        continue
+                    play_ids = (TIGRESS_ID, TIGRESS_ESCAPE_ID) if card_id == TIGRESS_ID else (card_id,)
+                    if any(DEFEATS[trump_index][other_id][play_id] for other_id in play_ids):
+                        expected += 1
+                self.assertEqual(counter.num_unseen_beating(REFERENCE_CARDS[play_id], trump_index, hand_mask), expected)
+
+    def test_game_counts_cards(self):
+        game = Game(4, False, False, False, False, False, False, False, seed=21, count_cards=True)
+        counts = []
+        def check_card(event):
+            counts.append(game.card_counter.unseen_mask().bit_count())
+        game.events.subscribe(CARD_PLAYED, check_card)
+        game.play_round(3)
+        self.assertIs(game.trick.card_counter, game.card_counter)
+        self.assertEqual(counts, [DECK_SIZE - i for i in range(1, 13)])
+        game.play_round(4)
+        self.assertEqual(counts[-1], DECK_SIZE - 16)
+        # Counting doesn't change the game
+        plain_game = Game(4, False, False, False, False, False, False, False, seed=21)
+        plain_game.play_round(3)
+        plain_game.play_round(4)
+        self.assertEqual(plain_game.scores, game.scores)
+        self.assertEqual(plain_game.card_counter, None)
+
 class TestDeck(unittest.TestCase):
     def test_deck_size(self):
         deck = Deck()
@@ -192,6 +364,27 @@ class TestDeck(unittest.TestCase):
             for j in range(num_cards):
                 self.assertEqual(deck.cards[j * NUM_PLAYERS + i], hands[i][j])
 
+    def test_batch_dealer_matches_deck(self):
+        seeds = [game_seed_sequence(6, i) for i in range(5)]
+        dealer = BatchDealer(7, rngs=[deck_rng(seed) for seed in seeds])
+        decks = [Deck(rng=deck_rng(seed)) for seed in seeds]
+        for round_number in range(1, 11):
+            card_ids = dealer.deal(round_number)
+            self.assertEqual(card_ids.shape, (5, 7, choose_num_cards(7, round_number, DECK_SIZE)))
+            for i in range(len(decks)):
+                decks[i].shuffle()
+                hands = decks[i].deal(7, round_number)
+                self.assertEqual(card_ids[i].tolist(), [[card.card_id for card in hand] for hand in hands])
+                self.assertEqual(decks[i].hands_from_card_ids(card_ids[i]), hands)
+
+    def test_batch_dealer_with_one_rng(self):
+        dealer = BatchDealer(4, rng=np.random.default_rng(2), num_games=50)
+        card_ids = dealer.deal(10)
+        self.assertEqual(card_ids.shape, (50, 4, 10))
+        for i in range(50):
+            self.assertEqual(len(set(card_ids[i].flatten().tolist())), 40)
+        self.assertNotEqual(card_ids[0].tolist(), card_ids[1].tolist())
+
 class TestPlayer(unittest.TestCase):
     def test_make_bid(self):
         player = Player()
@@ -203,11 +396,11 @@ class TestPlayer(unittest.TestCase):
         self.assertEqual(player.make_bid(4), 1)
         # Round 8 with 3 winners and 5 losers
         player.get_hand([PirateCard(), SkullKingCard(), MermaidCard(),\
-                EscapeCard(), EscapeCard(), SuitCard(Suit.Parrot, 5), EscapeCard(), SuitCard(Suit.TreasureMap, 2)])
+                EscapeCard(0), EscapeCard(1), SuitCard(Suit.Parrot, 5), EscapeCard(2), SuitCard(Suit.TreasureMap, 2)])
         self.assertEqual(player.make_bid(4), 3)
         # Round 8 with 1 winner and 3 maybes
         player.get_hand([SkullKingCard(), SuitCard(Suit.JollyRoger, 12), SuitCard(Suit.JollyRoger, 3), TigressCard(),\
-                EscapeCard(), EscapeCard(), SuitCard(Suit.Parrot, 5), EscapeCard()])
+                EscapeCard(0), EscapeCard(1), SuitCard(Suit.Parrot, 5), EscapeCard(2)])
         self.assertEqual(player.make_bid(4), 3)
 
     def test_play_card_at_index(self):
@@ -319,6 +512,37 @@ class TestPlayer(unittest.TestCase):
         card = player1.choose_leading_card(4)
         self.assertEqual(card, green5)
 
+    def test_hand_mask(self):
+        player = Player()
+        green5 = SuitCard(Suit.Parrot, 5)
+        pirate = PirateCard()
+        tigress = TigressCard()
+        player.get_hand([tigress, green5, pirate])
+        self.assertEqual(player.hand_mask, card_mask([green5.card_id, pirate.card_id, TIGRESS_ID]))
+        self.assertEqual(player.index_of_card_id(TIGRESS_ID), 2)
+        trick = Trick([Player(), player, Player(), Player()], 0)
+        player.determine_illegal_indices(trick)
+        self.assertEqual(player.play_pirate(), pirate)
+        self.assertEqual(player.hand_mask, card_mask([green5.card_id, TIGRESS_ID]))
+        self.assertTrue(player.contains_pirate())
+        player.make_tigress_escape()
+        self.assertFalse(player.contains_pirate())
+        self.assertTrue(player.card_to_play(tigress).is_escape())
+        self.assertFalse(tigress.is_escape())
+        # A new hand resets the Tigress
+        player.get_hand([tigress])
+        self.assertTrue(player.contains_pirate())
+        self.assertTrue(tigress.is_pirate())
+
+    def test_play_strongest_plain_suit_card(self):
+        player = Player()
+        yellow9 = SuitCard(Suit.TreasureChest, 9)
+        player.get_hand([SuitCard(Suit.Parrot, 5), yellow9, SuitCard(Suit.JollyRoger, 13), MermaidCard()])
+        trick = Trick([player, Player(), Player(), Player()], 0)
+        player.determine_illegal_indices(trick)
+        self.assertEqual(player.play_strongest_plain_suit_card(), yellow9)
+        self.assertEqual(len(player.hand), 3)
+
     def test_indices_of_potential_winning_cards(self):
         player1 = Player()
         player1.get_hand([SuitCard(Suit.Parrot, 5), EscapeCard(), SuitCard(Suit.TreasureChest, 2), PirateCard(), SuitCard(Suit.JollyRoger, 5)])
@@ -385,13 +609,13 @@ class TestTrick(unittest.TestCase):
         black1 = SuitCard(Suit.JollyRoger, 1)
         black14 = SuitCard(Suit.JollyRoger, 14)
         yellow5 = SuitCard(Suit.TreasureChest, 5)
-        pirate1 = PirateCard()
-        pirate2 = PirateCard()
+        pirate1 = PirateCard(0)
+        pirate2 = PirateCard(1)
         mermaid = MermaidCard()
         tigress = TigressCard()
         skull_king = SkullKingCard()
-        escape1 = EscapeCard()
-        escape2 = EscapeCard()
+        escape1 = EscapeCard(0)
+        escape2 = EscapeCard(1)
 
         # Simple test. The dealer is the first player. The person left of the dealer plays a high parrot.
         # Everyone else plays a low parrot.
@@ -546,7 +770,7 @@ class TestTrick(unittest.TestCase):
         self.assertEqual(trick.current_winning_index, 2)
 
         # Tigress as escape
-        tigress.escape()
+        tigress = tigress.escape()
         trick = Trick([Player(), Player(), Player(), Player()], 0)
         trick.play_card(green14)
         self.assertEqual(trick.trump_suit, Suit.Parrot)
@@ -622,5 +846,907 @@ class TestTrick(unittest.TestCase):
         trick.play_card(MermaidCard())
         self.assertEqual(bonus_points(trick.cards_played, trick.current_winning_card), 70)
 
+    def test_resolve_tricks(self):
+        cards_played = [
+            [ESCAPE_FIRST_ID, suit_card_id(Suit.Parrot, 3), suit_card_id(Suit.Parrot, 14), suit_card_id(Suit.TreasureMap, 14)],
+            [ESCAPE_FIRST_ID, ESCAPE_FIRST_ID + 1, TIGRESS_ESCAPE_ID, ESCAPE_FIRST_ID + 2],
+            [MERMAID_FIRST_ID, suit_card_id(Suit.JollyRoger, 14), PIRATE_FIRST_ID, SKULL_KING_ID],
+            [suit_card_id(Suit.TreasureChest, 2), suit_card_id(Suit.JollyRoger, 1), TIGRESS_ID, MERMAID_FIRST_ID],
+        ]
+        (winners, bonus) = resolve_tricks(np.array(cards_played))
+        self.assertEqual(winners.tolist(), [2, 0, 3, 2])
+        self.assertEqual(bonus.tolist(), [20, 0, 50, 20])
+        (winners, _) = resolve_tricks(np.array(cards_played), leaders=[1, 2, 3, 3])
+        self.assertEqual(winners.tolist(), [3, 2, 2, 1])
+
+    def test_resolve_tricks_matches_trick(self):
+        rng = np.random.default_rng(3)
+        cards_played = np.array([rng.permutation(NUM_CARD_IDS - 1)[:5] for _ in range(2000)])
+        # The Tigress is played either way, by trick
+        for row in cards_played:
+            row[row == TIGRESS_ID] = rng.choice([TIGRESS_ID, TIGRESS_ESCAPE_ID])
+        self.assertTrue((cards_played == TIGRESS_ID).any() and (cards_played == TIGRESS_ESCAPE_ID).any())
+        (winners, bonus) = resolve_tricks(cards_played)
+        for i in range(len(cards_played)):
+            trick = Trick([Player() for _ in range(5)], 0)
+            for card_id in cards_played[i]:
+                trick.play_card(REFERENCE_CARDS[card_id])
+            self.assertEqual(winners[i], trick.current_winning_index)
+            self.assertEqual(bonus[i], bonus_points(trick.cards_played, trick.current_winning_card))
+
+    def test_trick_summary(self):
+        rng = np.random.default_rng(4)
+        trick = Trick([Player() for _ in range(5)], 0)
+        for _ in range(200):
+            trick.reset(0)
+            card_ids = rng.permutation(NUM_CARD_IDS - 1)[:5]
+            card_ids[card_ids == TIGRESS_ID] = rng.choice([TIGRESS_ID, TIGRESS_ESCAPE_ID])
+            for card_id in card_ids:
+                # winning_cards gives the same answer as playing each card
+                winning_mask = trick.winning_cards(ALL_CARDS_MASK)
+                for other_id in range(NUM_CARD_IDS):
+                    if REFERENCE_CARDS[other_id] in trick.cards_played:
+                        continue
+                    copy = Trick(trick.players, 0)
+                    for card in trick.cards_played:
+                        copy.play_card(card)
+                    copy.play_card(REFERENCE_CARDS[other_id])
+                    self.assertEqual(winning_mask >> other_id & 1 == 1, copy.current_winning_index == len(trick.cards_played))
+                trick.play_card(REFERENCE_CARDS[card_id])
+            cards = trick.cards_played
+            self.assertEqual(trick.contains_mermaid(), any(card.card_category == CardCategory.Mermaid for card in cards))
+            self.assertEqual(trick.contains_pirate(), any(card.is_pirate() for card in cards))
+            self.assertEqual(trick.contains_skull_king(), any(card.card_category == CardCategory.SkullKing for card in cards))
+            self.assertEqual(trick.num_played(ESCAPE_MASK | TIGRESS_ESCAPE_MASK), sum(card.is_escape() for card in cards))
+
+class ListDealer():
+    """
+    Deals rounds that were dealt before, for playing the same deals twice.
+    """
+    def __init__(self, num_players, deals):
+        self.num_players = num_players
+        self.num_games = len(deals[0])
+        self.deals = deals
+
+    def deal(self, round_number):
+        return self.deals[round_number - 1]
+
+class TestLockstep(unittest.TestCase):
+    def test_make_bids(self):
+        rng = np.random.default_rng(4)
+        deck = Deck(rng=rng)
+        for num_cards in [1, 3, 10]:
+            deck.shuffle()
+            hands = deck.deal(5, num_cards)
+            bids = make_bids(np.sort(np.array([[card.card_id for card in hand] for hand in hands]), axis=1)[np.newaxis])
+            for i in range(5):
+                player = Player()
+                player.get_hand(hands[i])
+                self.assertEqual(bids[0, i], player.make_bid(5))
+
+    def test_same_as_game(self):
+        # With 8 players the last rounds deal fewer cards than their number
+        for num_players in [2, 5, 7, 8]:
+            seeds = [game_seed_sequence(9, i) for i in range(20)]
+            results = play_games(num_players, seeds)
+            for i in range(len(seeds)):
+                game = Game(num_players, False, False, False, False, False, False, False, seed=seeds[i], game_writer=GameWriter())
+                game.run_game(None)
+                for round_index in range(10):
+                    round_data = game.game_writer.data[round_index]
+                    num_tricks = len(round_data[TRICKS_KEY])
+                    self.assertEqual(results.bids[i, round_index].tolist(), round_data[BIDS_KEY])
+                    self.assertEqual(results.scores[i, round_index].tolist(), round_data[SCORES_KEY])
+                    self.assertEqual(results.winners[i, round_index, :num_tricks].tolist(),\
+                            [trick["winner_index"] for trick in round_data[TRICKS_KEY]])
+                    self.assertEqual([card_ids_to_strings(cards) for cards in results.cards_played[i, round_index, :num_tricks]],\
+                            [trick["cards_played"] for trick in round_data[TRICKS_KEY]])
+
+    def test_game_plays_batch_deals(self):
+        dealer = BatchDealer(4, rng=np.random.default_rng(8), num_games=6)
+        deals = [dealer.deal(round_number) for round_number in range(1, 11)]
+        results = play_dealt_games(ListDealer(4, deals))
+        for i in range(6):
+            game = Game(4, False, False, False, False, False, False, False, seed=0)
+            for round_number in range(1, 11):
+                game.play_round(round_number, game.deck.hands_from_card_ids(deals[round_number - 1][i].tolist()))
+            self.assertEqual(game.scores, results.final_scores()[i].tolist())
+
+class TestCanonical(unittest.TestCase):
+    def rename(self, rng, card_ids):
+        """
+        The same cards with the plain suits renamed and copies swapped.
+        """
+        relabel = list(range(NUM_CARD_IDS))
+        suit_order = rng.permutation(len(PLAIN_SUITS))
+        for number in range(1, MAX_SUIT_NUMBER + 1):
+            for (suit_index, suit) in enumerate(PLAIN_SUITS):
+                relabel[suit_card_id(suit, number)] = suit_card_id(PLAIN_SUITS[suit_order[suit_index]], number)
+        for copies_mask in INTERCHANGEABLE_MASKS:
+            copies = list(card_ids_in_mask(copies_mask))
+            for (card_id, other_id) in zip(copies, rng.permutation(copies)):
+                relabel[card_id] = int(other_id)
+        return [relabel[card_id] for card_id in card_ids]
+
+    def test_canonical_hand(self):
+        rng = np.random.default_rng(5)
+        for _ in range(200):
+            card_ids = rng.permutation(NUM_CARD_IDS - 1)[:10].tolist()
+            hand_mask = card_mask(card_ids)
+            canonical = canonical_hand(hand_mask)
+            self.assertEqual(canonical_hand(card_mask(self.rename(rng, card_ids))), canonical)
+            self.assertEqual(canonical_hand(canonical), canonical)
+            self.assertEqual(canonical.bit_count(), hand_mask.bit_count())
+            self.assertEqual(canonical & SUIT_MASKS[Suit.JollyRoger.value], hand_mask & SUIT_MASKS[Suit.JollyRoger.value])
+        # Both hands have one plain suit card of each of two numbers
+        green5 = suit_card_id(Suit.Parrot, 5)
+        self.assertEqual(canonical_hand(card_mask([green5, suit_card_id(Suit.TreasureChest, 9)])),\
+                canonical_hand(card_mask([suit_card_id(Suit.TreasureMap, 5), suit_card_id(Suit.Parrot, 9)])))
+        self.assertNotEqual(canonical_hand(card_mask([green5, suit_card_id(Suit.Parrot, 9)])),\
+                canonical_hand(card_mask([green5, suit_card_id(Suit.TreasureMap, 9)])))
+        self.assertEqual(canonical_hand(card_mask([PIRATE_FIRST_ID + 3, ESCAPE_FIRST_ID + 4])), card_mask([PIRATE_FIRST_ID, ESCAPE_FIRST_ID]))
+
+    def test_relabeling_keeps_tricks(self):
+        rng = np.random.default_rng(6)
+        for _ in range(200):
+            card_ids = rng.permutation(NUM_CARD_IDS - 1)[:10].tolist()
+            hand_mask = card_mask(card_ids[:4])
+            relabel = canonical_relabeling((hand_mask, card_mask(card_ids[4:])))
+            self.assertEqual(sorted(relabel), list(range(NUM_CARD_IDS)))
+            trick = Trick([Player() for _ in range(6)], 0)
+            relabeled_trick = Trick([Player() for _ in range(6)], 0)
+            for card_id in card_ids[4:]:
+                trick.play_card(REFERENCE_CARDS[card_id])
+                relabeled_trick.play_card(REFERENCE_CARDS[relabel[card_id]])
+                self.assertEqual(relabeled_trick.current_winning_index, trick.current_winning_index)
+                self.assertEqual(relabeled_trick.trump_index, relabel_trump_index(trick.trump_index, relabel))
+            self.assertEqual(canonical_trick_state(hand_mask, trick.played_mask, trick.trump_index, trick.current_winning_id),\
+                    (relabel_mask(hand_mask, relabel), relabeled_trick.played_mask, relabeled_trick.trump_index, relabeled_trick.current_winning_id))
+
+class TestBidding(unittest.TestCase):
+    def test_distribution(self):
+        service = TrickDistributionService(num_samples=50, seed=1)
+        hand = [REFERENCE_CARDS[card_id] for card_id in (SKULL_KING_ID, TIGRESS_ID, 3, 20)]
+        distribution = service.distribution(hand, 4, 1)
+        self.assertEqual(len(distribution.counts), 5)
+        for bid in range(5):
+            self.assertEqual(sum(distribution.counts[bid]), 50)
+            self.assertAlmostEqual(sum(distribution.probabilities(bid)), 1)
+        # The Skull King and the Tigress win at least one trick
+        self.assertEqual(distribution.counts[4][0], 0)
+        self.assertEqual(distribution.expected_points(distribution.best_bid()), max(distribution.points) / 50)
+        # Asking again is a cache hit, and a hand doesn't depend on the order
+        self.assertIs(service.distribution(list(reversed(hand)), 4, 1), distribution)
+        self.assertEqual((service.hits, service.misses), (1, 1))
+        other_service = TrickDistributionService(num_samples=50, seed=1)
+        other_service.distribution(hand[:2], 3, 0)
+        self.assertEqual(other_service.distribution(hand, 4, 1).counts, distribution.counts)
+
+    def test_cache(self):
+        service = TrickDistributionService(num_samples=10, cache_size=2, seed=2, exact_tables={})
+        hands = [[REFERENCE_CARDS[card_id]] for card_id in (1, 30, 60)]
+        for hand in hands:
+            service.distribution(hand, 3, 0)
+        self.assertEqual(len(service.cache), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "tricks.json")
+            service.save(filepath)
+            loaded = TrickDistributionService(num_samples=10, cache_filepath=filepath, exact_tables={})
+        self.assertEqual(list(loaded.cache.keys()), list(service.cache.keys()))
+        self.assertEqual(loaded.distribution(hands[2], 3, 0).counts, service.distribution(hands[2], 3, 0).counts)
+        self.assertEqual(loaded.misses, 0)
+
+    def test_cache_settings_mismatch(self):
+        service = TrickDistributionService(num_samples=10, seed=2, exact_tables={})
+        service.distribution([REFERENCE_CARDS[30]], 3, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "tricks.json")
+            service.save(filepath)
+            more_samples = TrickDistributionService(num_samples=5000, cache_filepath=filepath, seed=2, exact_tables={})
+            other_seed = TrickDistributionService(num_samples=10, cache_filepath=filepath, seed=3, exact_tables={})
+            same = TrickDistributionService(num_samples=10, cache_filepath=filepath, seed=2, exact_tables={})
+        self.assertEqual((len(more_samples.cache), more_samples.skipped), (0, 1))
+        self.assertEqual((len(other_seed.cache), other_seed.skipped), (0, 1))
+        self.assertEqual((len(same.cache), same.skipped), (1, 0))
+
+    def test_distribution_bid_player(self):
+        service = TrickDistributionService(num_samples=10, seed=3)
+        game = Game(4, False, False, False, False, False, False, False, seed=4)
+        game.players[2] = DistributionBidPlayer(service)
+        game.run_game(None)
+        self.assertEqual(service.hits + service.misses + service.exact_hits, NUM_ROUNDS)
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+
+class TestExactTables(unittest.TestCase):
+    def test_num_deals(self):
+        self.assertEqual(num_deals(4, 1), 69 * 68 * 67)
+        self.assertEqual(num_deals(3, 2), 68 * 67 // 2 * 66 * 65 // 2)
+        self.assertEqual(len(all_deals(6, 2, 2)), 6 * 5 // 2 * 4 * 3 // 2)
+        self.assertEqual(len(canonical_hands(1)), 33)
+        with self.assertRaises(ValueError):
+            exact_distributions(5, 1)
+
+    def test_exact_distributions(self):
+        tables = dict(exact_distributions(2, 1))
+        self.assertEqual(len(tables), 33 * 2)
+        # The Skull King only loses to a mermaid
+        skull_king = tables[(2, 0, 1, canonical_hand(SKULL_KING_MASK))]
+        self.assertEqual(skull_king.counts, [[2, 67], [2, 67]])
+        for distribution in tables.values():
+            self.assertEqual(distribution.num_samples, 69)
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "exact.json")
+            write_distributions(filepath, tables.items())
+            loaded = load_exact_tables(filepath)
+        self.assertEqual(loaded.keys(), tables.keys())
+        # The service uses the tables instead of simulating
+        service = TrickDistributionService(num_samples=10, seed=1, exact_tables=loaded)
+        self.assertIs(service.distribution([REFERENCE_CARDS[PIRATE_FIRST_ID + 2]], 2, 1), loaded[(2, 1, 1, card_mask([PIRATE_FIRST_ID]))])
+        self.assertEqual((service.exact_hits, service.misses), (1, 0))
+
+    def test_default_tables(self):
+        # The first rounds are bid from the tables in exact_tables.json, loaded once
+        self.assertIs(default_exact_tables(), default_exact_tables())
+        service = TrickDistributionService(num_samples=10, seed=5)
+        self.assertIs(service.exact_tables, default_exact_tables())
+        game = Game(2, False, False, False, False, False, False, False, seed=6)
+        game.players[0] = DistributionBidPlayer(service)
+        game.play_round(1)
+        game.play_round(2)
+        self.assertEqual((service.exact_hits, service.hits, service.misses), (2, 0, 0))
+        game = Game(4, False, False, False, False, False, False, False, seed=7)
+        game.players[3] = DistributionBidPlayer(service)
+        game.play_round(1)
+        self.assertEqual((service.exact_hits, service.misses), (3, 0))
+
+class TestDoubleDummy(unittest.TestCase):
+    def brute_force_tricks(self, hands, leader, seat, played=()):
+        """
+        The tricks seat can be sure of, trying every card.
+        """
+        num_players = len(hands)
+        position = len(played)
+        player = (leader + position) % num_players
+        if hands[player] == 0:
+            return 0
+        trick = TrickState(played)
+        results = []
+        for card_id in card_ids_in_mask(legal_mask(hands[player], trick.trump_index)):
+            hands[player] ^= 1 << card_id
+            for play_id in ((TIGRESS_ID, TIGRESS_ESCAPE_ID) if card_id == TIGRESS_ID else (card_id,)):
+                if position == num_players - 1:
+                    child = TrickState(played)
+                    child.play(position, play_id)
+                    winner = (leader + child.winning_position) % num_players
+                    results.append(self.brute_force_tricks(hands, winner, seat) + (1 if winner == seat else 0))
+                else:
+                    results.append(self.brute_force_tricks(hands, leader, seat, tuple(played) + (play_id,)))
+            hands[player] ^= 1 << card_id
+        return max(results) if player == seat else min(results)
+
+    def random_hands(self, rng, num_players, num_cards):
+        card_ids = rng.permutation(DECK_CARD_IDS)[:num_players * num_cards].tolist()
+        return [card_mask(card_ids[i * num_cards:(i + 1) * num_cards]) for i in range(num_players)]
+
+    def test_tricks_match_brute_force(self):
+        rng = np.random.default_rng(7)
+        solver = DoubleDummySolver()
+        for (num_players, num_cards) in ((2, 4), (3, 3), (4, 2)):
+            for _ in range(15):
+                hands = self.random_hands(rng, num_players, num_cards)
+                for seat in range(num_players):
+                    self.assertEqual(solver.tricks(hands, 1, seat), self.brute_force_tricks(list(hands), 1, seat))
+        # Special hands with both Tigress modes and copies of cards
+        hands = [card_mask([TIGRESS_ID, ESCAPE_FIRST_ID, 20]), card_mask([PIRATE_FIRST_ID, MERMAID_FIRST_ID, 21]),\
+                card_mask([SKULL_KING_ID, ESCAPE_FIRST_ID + 1, 22])]
+        self.assertEqual(solver.all_tricks(hands, 0), [self.brute_force_tricks(list(hands), 0, seat) for seat in range(3)])
+        # In the middle of a trick
+        self.assertEqual(solver.tricks(hands, 2, 1, (SKULL_KING_ID,)), self.brute_force_tricks(list(hands), 2, 1, (SKULL_KING_ID,)))
+
+    def test_quick_bounds(self):
+        solver = DoubleDummySolver()
+        # The Skull King is sure when nobody else has a mermaid, and the
+        # escape can't win while the others have no escapes
+        hands = [card_mask([SKULL_KING_ID, ESCAPE_FIRST_ID]), card_mask([PIRATE_FIRST_ID, 10]), card_mask([20, 30])]
+        self.assertEqual(solver.quick_bounds(hands, 0), (1, 1))
+        self.assertEqual(solver.quick_bounds(hands, 1), (0, 1))
+        hands[1] = card_mask([MERMAID_FIRST_ID, 10])
+        self.assertEqual(solver.quick_bounds(hands, 0), (0, 1))
+
+    def test_best_move(self):
+        rng = np.random.default_rng(8)
+        solver = DoubleDummySolver()
+        for _ in range(10):
+            hands = self.random_hands(rng, 3, 3)
+            (card_id, play_id, tricks) = solver.best_move(hands, 0, ())
+            self.assertTrue(legal_mask(hands[0], NO_TRUMP) >> card_id & 1)
+            self.assertEqual(tricks, solver.tricks(hands, 0, 0))
+            # The move keeps that many tricks
+            hands_after = list(hands)
+            hands_after[0] &= ~(1 << card_id)
+            self.assertEqual(solver.tricks(hands_after, 0, 0, (play_id,)), tricks)
+
+    def test_double_dummy_player(self):
+        game = Game(3, False, False, False, False, False, False, False, seed=9)
+        game.players[1] = DoubleDummyPlayer(max_cards=3)
+        game.run_game(None)
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+
+class TestGameState(unittest.TestCase):
+    def test_apply_and_undo(self):
+        rng = np.random.default_rng(20)
+        for _ in range(30):
+            num_players = int(rng.integers(2, 7))
+            round_number = int(rng.integers(1, 11))
+            hands = rng.permutation(DECK_CARD_IDS)[:num_players * round_number].reshape(num_players, round_number).tolist()
+            bids = rng.integers(0, round_number + 1, size=num_players).tolist()
+            state = GameState([card_mask(hand) for hand in hands], bids, int(rng.integers(num_players)), round_number)
+            snapshots = []
+            while not state.is_round_over():
+                snapshots.append((list(state.hands), list(state.tricks_won), list(state.bonus_won), state.leader, list(state.played),\
+                        state.played_mask, state.trump_index, state.winning_id, state.winning_position))
+                moves = state.legal_moves()
+                state.apply(moves[rng.integers(len(moves))])
+            self.assertEqual(sum(state.tricks_won), round_number)
+            self.assertEqual(sum(hand.bit_count() for hand in state.hands), 0)
+            copy = state.copy()
+            for snapshot in reversed(snapshots):
+                copy.undo()
+                self.assertEqual((copy.hands, copy.tricks_won, copy.bonus_won, copy.leader, copy.played,\
+                        copy.played_mask, copy.trump_index, copy.winning_id, copy.winning_position), snapshot)
+            # Undoing the copy leaves the original alone
+            self.assertTrue(state.is_round_over())
+            self.assertEqual(sum(state.tricks_won), round_number)
+            self.assertEqual(len(state.history), num_players * round_number)
+
+    def test_legal_moves(self):
+        state = GameState([card_mask([TIGRESS_ID, 9]), card_mask([6, 20])], [1, 1], 0, 2)
+        self.assertEqual(state.legal_moves(), [9, TIGRESS_ID, TIGRESS_ESCAPE_ID])
+        state.apply(9)
+        # 20 isn't in the suit of 9
+        self.assertEqual(state.legal_moves(), [6])
+        state.apply(6)
+        self.assertEqual(state.tricks_won, [1, 0])
+        self.assertEqual(state.player_to_move(), 0)
+        self.assertEqual(state.legal_moves(), [TIGRESS_ID, TIGRESS_ESCAPE_ID])
+        state.apply(TIGRESS_ESCAPE_ID)
+        self.assertEqual(state.hands[0], 0)
+        self.assertEqual(state.legal_moves(), [20])
+
+    def test_from_game(self):
+        game = Game(4, False, False, False, False, False, False, False, seed=21)
+        snapshots = []
+        round_scores = []
+        def turn_started(event):
+            if len(game.trick.cards_played) == 1 and event.player.hand_mask.bit_count() == (event.round_number + 1) // 2:
+                snapshots.append(GameState.from_game(game))
+        game.events.subscribe(TURN_STARTED, turn_started)
+        game.events.subscribe(ROUND_SCORED, lambda event: round_scores.append((event.round_number, list(event.scores))))
+        game.run_game(None)
+        self.assertGreater(len(snapshots), 0)
+        scores = dict(round_scores)
+        for state in snapshots:
+            state.play_out()
+            self.assertEqual(state.final_scores(), scores[state.round_number])
+
+class TestISMCTS(unittest.TestCase):
+    def test_play_out_matches_lockstep(self):
+        rng = np.random.default_rng(10)
+        for _ in range(50):
+            num_players = int(rng.integers(2, 7))
+            round_number = int(rng.integers(1, 11))
+            hands = rng.permutation(DECK_CARD_IDS)[:num_players * round_number].reshape(1, num_players, round_number)
+            bids = rng.integers(0, round_number + 1, size=(1, num_players))
+            results = play_round(hands, 1, round_number, bids)
+            state = GameState([card_mask(hand) for hand in hands[0].tolist()], bids[0].tolist(), 1, round_number)
+            state.play_out()
+            self.assertEqual(state.tricks_won, results.tricks_won[0].tolist())
+            self.assertEqual(state.round_points(), results.points[0].tolist())
+
+    def test_deal(self):
+        rng = np.random.default_rng(11)
+        hand_mask = card_mask([SKULL_KING_ID, 20])
+        # The second trick of round 3, after 5, 7 and 30 were played in the first
+        unseen_mask = card_mask(DECK_CARD_IDS) & ~hand_mask & ~card_mask([5, 7, 30, 6, TIGRESS_ID])
+        dealer = ConstrainedDealer(1, hand_mask, unseen_mask, [1, 2, 1], [0, 0, 0])
+        view = PlayerView(dealer, [1, 1, 0], [0, 0, 1], 2, [TIGRESS_ESCAPE_ID, 6], 3)
+        for _ in range(20):
+            state = view.deal(rng)
+            self.assertEqual(state.hands[1], hand_mask)
+            self.assertEqual([hand.bit_count() for hand in state.hands], [1, 2, 1])
+            self.assertEqual(state.hands[0] & state.hands[2], 0)
+            self.assertEqual((state.hands[0] | state.hands[2]) & ~unseen_mask, 0)
+            self.assertEqual(state.player_to_move(), 1)
+            self.assertEqual(state.trump_index, CARD_SUIT_INDEX[6])
+        (visits, num_iterations) = search(view, 12, iterations=50)
+        self.assertEqual(num_iterations, 50)
+        self.assertEqual(sum(visits.values()), 50)
+        # Only the Skull King is legal, since 20 isn't in the suit of 6
+        self.assertEqual(list(visits.keys()), [SKULL_KING_ID])
+        view.dealer = ConstrainedDealer(1, card_mask([SKULL_KING_ID, 9]), unseen_mask & ~card_mask([9]) | card_mask([20]), [1, 2, 1], [0, 0, 0])
+        self.assertEqual(sorted(search(view, 12, iterations=50)[0].keys()), [9, SKULL_KING_ID])
+
+    def test_root_parallel_and_time_budget(self):
+        hand_mask = card_mask([SKULL_KING_ID, 9, 30])
+        unseen_mask = card_mask(DECK_CARD_IDS) & ~hand_mask
+        view = PlayerView(ConstrainedDealer(0, hand_mask, unseen_mask, [3, 3, 3], [0, 0, 0]), [1, 1, 0], [0, 0, 0], 0, [], 3)
+        player = ISMCTSPlayer(rng=new_rng(16), iterations=40, num_workers=2)
+        try:
+            move = player.choose_move(view)
+            # The root visits of both workers' trees are added up
+            self.assertEqual(player.num_iterations, 80)
+            self.assertIn(move, [9, 30, SKULL_KING_ID])
+        finally:
+            player.close()
+        self.assertEqual(player.pool, None)
+        # With only a time budget the search runs until the time is up
+        start = time.perf_counter()
+        (visits, num_iterations) = search(view, 17, iterations=None, time_budget=0.05)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertGreater(num_iterations, 0)
+        self.assertEqual(sum(visits.values()), num_iterations)
+        player = make_player("mcts:time_budget=0.01", new_rng(18))
+        self.assertEqual((player.iterations, player.time_budget, player.num_workers), (None, 0.01, 1))
+
+    def test_root_parallel_in_worker(self):
+        with self.assertRaises(ValueError):
+            simulate(3, 2, num_workers=2, chunk_size=1, seats=["mcts:iterations=5:num_workers=2", "heuristic", "heuristic"])
+
+    def test_ismcts_player(self):
+        game = Game(3, False, False, False, False, False, False, False, seed=13)
+        player = ISMCTSPlayer(rng=new_rng(14), iterations=20)
+        game.players[2] = player
+        player.subscribe(game.events)
+        game.run_game(None)
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+        self.assertEqual(player.sampler.played_mask().bit_count(), 3 * NUM_ROUNDS)
+        self.assertEqual(player.num_iterations, 20)
+        # Weighting deals by the bids
+        game.reset(15)
+        player.bid_model = BaselineBidModel()
+        player.num_particles = 20
+        game.run_game(None)
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+        with self.assertRaises(ValueError):
+            ISMCTSPlayer(iterations=None)
+
+    def test_ismcts_player_runs_out_of_cards(self):
+        # With 8 players rounds 9 and 10 only deal 8 cards each
+        game = Game(8, False, False, False, False, False, False, False, seed=3,\
+                seats=["mcts:iterations=20"] + ["heuristic" for _ in range(7)])
+        player = game.players[0]
+        for round_number in [9, 10]:
+            game.play_round(round_number)
+            self.assertEqual(sum(game.tricks_won), 8)
+            self.assertEqual(player.sampler.hand_sizes(), [0 for _ in range(8)])
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+
+class TestSampler(unittest.TestCase):
+    def test_constrained_deals_are_uniform(self):
+        rng = np.random.default_rng(16)
+        # Player 1 can't hold card 5, so it gets one of 3 cards and player 2
+        # one of the 3 left, and 9 deals are equally likely.
+        dealer = ConstrainedDealer(0, 0, card_mask([5, 6, 7, 8]), [0, 1, 1], [0, card_mask([5]), 0])
+        counts = {}
+        for _ in range(9000):
+            deal = tuple(dealer.deal(rng))
+            counts[deal] = counts.get(deal, 0) + 1
+        self.assertEqual(len(counts), 9)
+        for count in counts.values():
+            self.assertTrue(800 < count < 1200)
+        self.assertEqual(dealer.num_ways(0, (1,)), 3)
+
+    def test_constrained_deals(self):
+        rng = np.random.default_rng(17)
+        hand_mask = card_mask(range(5, 15))
+        unseen_mask = card_mask(DECK_CARD_IDS) & ~hand_mask
+        excluded_masks = [0, SUIT_MASKS[1] | SPECIAL_CARDS_MASK, 0, SUIT_MASKS[1] | SUIT_MASKS[2] | SPECIAL_CARDS_MASK]
+        dealer = ConstrainedDealer(0, hand_mask, unseen_mask, [10, 10, 10, 10], excluded_masks)
+        self.assertEqual(dealer.constrained, [1, 3])
+        for _ in range(100):
+            hands = dealer.deal(rng)
+            self.assertEqual([hand.bit_count() for hand in hands], [10, 10, 10, 10])
+            self.assertEqual(hands[0], hand_mask)
+            for i in range(4):
+                self.assertEqual(hands[i] & excluded_masks[i], 0)
+                for j in range(i):
+                    self.assertEqual(hands[i] & hands[j], 0)
+        # Constraints that can't be met are dropped
+        dealer = ConstrainedDealer(0, 0, card_mask([5, 6]), [0, 1, 1], [0, card_mask([5, 6]), 0])
+        self.assertEqual(dealer.constrained, [])
+        self.assertEqual(dealer.deal(rng)[1].bit_count(), 1)
+
+    def test_hand_sampler(self):
+        game = Game(4, False, False, False, False, False, False, False, seed=18)
+        sampler = HandSampler()
+        sampler.subscribe(game.events)
+        num_voids = []
+        def check_turn(event):
+            dealer = sampler.dealer(event.player_index, event.player.hand_mask)
+            self.assertEqual(dealer.hand_sizes, [len(player.hand) for player in game.players])
+            # The real hands are one of the deals
+            for (i, player) in enumerate(game.players):
+                self.assertEqual(player.hand_mask & sampler.played_mask(), 0)
+                self.assertEqual(player.hand_mask & sampler.excluded_masks[i], 0)
+                if i != event.player_index:
+                    self.assertEqual(player.hand_mask & ~card_mask(dealer.cards), 0)
+            num_voids.append(sum(mask != 0 for mask in sampler.excluded_masks))
+        game.events.subscribe(TURN_STARTED, check_turn)
+        game.run_game(None)
+        self.assertTrue(max(num_voids) > 0)
+        self.assertEqual(sampler.hand_sizes(), [0, 0, 0, 0])
+
+    def test_hand_sampler_runs_out_of_cards(self):
+        # With 8 players rounds 9 and 10 only deal 8 cards each
+        rng = np.random.default_rng(20)
+        game = Game(8, False, False, False, False, False, False, False, seed=21)
+        sampler = HandSampler()
+        sampler.subscribe(game.events)
+        def check_turn(event):
+            self.assertEqual(sampler.dealt_sizes, [8 for _ in range(8)])
+            dealer = sampler.dealer(event.player_index, event.player.hand_mask)
+            self.assertEqual(dealer.hand_sizes, [len(player.hand) for player in game.players])
+            deals = [dealer.deal(rng) for _ in range(5)]
+            bids = [player.bid for player in game.players]
+            self.assertEqual(sampler.bid_weights(deals, event.player_index, bids, BaselineBidModel()).shape, (5,))
+        game.events.subscribe(TURN_STARTED, check_turn)
+        for round_number in [9, 10]:
+            game.play_round(round_number)
+            self.assertEqual(sum(game.tricks_won), 8)
+        self.assertEqual(sampler.hand_sizes(), [0 for _ in range(8)])
+
+    def test_bid_weights(self):
+        rng = np.random.default_rng(19)
+        sampler = HandSampler()
+        # Only the number of cards dealt matters here
+        sampler.deal(DealEvent(2, 0, [[None, None] for _ in range(3)]))
+        dealer = sampler.dealer(0, card_mask([SKULL_KING_ID, 5]))
+        deals = [dealer.deal(rng) for _ in range(50)]
+        weights = sampler.bid_weights(deals, 0, [2, 2, 0], BaselineBidModel(noise=0.1))
+        self.assertEqual(weights.shape, (50,))
+        for (deal, weight) in zip(deals, weights.tolist()):
+            # Player 1 bids 2 with two High cards, and player 2 bids 0 with no High or Likely cards
+            bids = make_bids(np.sort(np.array([[list(card_ids_in_mask(hand)) for hand in deal]]), axis=2))[0].tolist()
+            expected = (0.9 if bids[1] == 2 else 0.05) * (0.9 if bids[2] == 0 else 0.05)
+            self.assertAlmostEqual(weight, expected)
+
+class TestStrategies(unittest.TestCase):
+    def test_registry(self):
+        self.assertEqual(type(make_player("heuristic", new_rng(1))), Player)
+        self.assertEqual(type(make_player("random", new_rng(1))), RandomPlayer)
+        self.assertEqual(parse_seats("heuristic, random,mcts", 3), ["heuristic", "random", "mcts"])
+        with self.assertRaises(ValueError):
+            parse_seats("heuristic,random", 3)
+        with self.assertRaises(ValueError):
+            make_player("oracle")
+        self.assertEqual(parse_strategy("mcts:iterations=200:num_workers=2"), ("mcts", {"iterations" : "200", "num_workers" : "2"}))
+        player = make_player("mcts:iterations=200:num_workers=2")
+        self.assertEqual((player.iterations, player.time_budget, player.num_workers), (200, None, 2))
+        with self.assertRaises(ValueError):
+            make_player("heuristic:depth=2")
+        with self.assertRaises(ValueError):
+            parse_seats("mcts:iterations,heuristic", 2)
+        # Bidding from distributions, with the exact tables for the first rounds
+        player = make_player("distribution:num_samples=20")
+        self.assertEqual(type(player), DistributionBidPlayer)
+        self.assertIs(player.service, make_player("distribution:num_samples=20").service)
+        self.assertIs(player.service.exact_tables, default_exact_tables())
+        game = Game(3, False, False, False, False, False, False, False, seed=9, seats=["distribution:num_samples=20", "heuristic", "heuristic"])
+        exact_hits = player.service.exact_hits
+        game.play_round(1)
+        self.assertEqual(player.service.exact_hits, exact_hits + 1)
+        self.assertEqual(make_player("double_dummy").max_cards, DEFAULT_ENDGAME_CARDS)
+        self.assertEqual(make_player("double_dummy:max_cards=8").max_cards, 8)
+        register_strategy("oracle", lambda rng: RandomPlayer(rng))
+        try:
+            self.assertEqual(type(make_player("oracle")), RandomPlayer)
+        finally:
+            del STRATEGIES["oracle"]
+
+    def test_mixed_seats(self):
+        decision_timer = DecisionTimer()
+        game = Game(4, False, False, False, False, False, False, False, seed=3, seats=["heuristic", "random", "mcts", "heuristic"],\
+                decision_timer=decision_timer)
+        game.players[2].iterations = 10
+        legal = []
+        def check_turn(event):
+            event.player.determine_illegal_indices(game.trick)
+            legal.append(event.player.legal_index_holder.legal_mask)
+        def check_card(event):
+            # Player itself can play an off-suit Jolly Roger as its weakest winning card
+            if game.seats[event.player_index] != "heuristic":
+                self.assertTrue(legal[-1] >> event.card.card_id & 1)
+        game.events.subscribe(TURN_STARTED, check_turn)
+        game.events.subscribe(CARD_PLAYED, check_card)
+        game.run_game(None)
+        self.assertEqual(sum(game.scores), sum(player.score for player in game.players))
+        # The search player was subscribed to the game's events
+        self.assertEqual(game.players[2].sampler.played_mask().bit_count(), 4 * NUM_ROUNDS)
+        self.assertEqual(decision_timer.histograms[("heuristic", BID_DECISION)].num_decisions, 2 * NUM_ROUNDS)
+        self.assertEqual(decision_timer.histograms[("heuristic", CARD_DECISION)].num_decisions, 2 * 55)
+        self.assertEqual(decision_timer.histograms[("mcts", CARD_DECISION)].num_decisions, 55)
+        self.assertEqual(sum(decision_timer.histograms[("random", CARD_DECISION)].counts), 55)
+
+    def test_latency_histogram(self):
+        first = LatencyHistogram()
+        for seconds in [0.000001, 0.000003, 0.000003, 0.0005]:
+            first.add(seconds)
+        self.assertEqual(first.counts[1], 1)
+        self.assertEqual(first.counts[2], 2)
+        self.assertEqual(first.percentile(0.5), 4e-6)
+        self.assertEqual(first.percentile(1.0), 0.0005)
+        second = LatencyHistogram()
+        second.add(2.0)
+        first.merge(second)
+        self.assertEqual(first.num_decisions, 5)
+        self.assertEqual(first.max_seconds, 2.0)
+        self.assertAlmostEqual(first.mean(), 2.000507 / 5)
+
+    def test_simulate_with_seats(self):
+        seats = ["random", "heuristic", "heuristic"]
+        decision_timer = DecisionTimer()
+        first = simulate(3, 6, num_workers=1, chunk_size=4, master_seed=12, seats=seats, decision_timer=decision_timer)
+        second = simulate(3, 6, num_workers=1, chunk_size=6, master_seed=12, seats=seats)
+        for i in range(3):
+            self.assertEqual(first[i].total, second[i].total)
+        self.assertEqual(decision_timer.histograms[("random", CARD_DECISION)].num_decisions, 6 * 55)
+        with self.assertRaises(ValueError):
+            simulate(3, 6, num_workers=1, lockstep=True, seats=seats)
+
+class TestMatch(unittest.TestCase):
+    def test_sequential_test(self):
+        rng = np.random.default_rng(30)
+        outcomes = []
+        for mean in [30, -30, 0]:
+            test = SequentialTest(delta=20)
+            while test.outcome() == MatchOutcome.Undecided:
+                test.add(float(rng.normal(mean, 100)))
+            outcomes.append(test.outcome())
+            self.assertLess(test.num_samples, test.fixed_sample_size() * 2)
+        self.assertEqual(outcomes, [MatchOutcome.SecondIsBetter, MatchOutcome.FirstIsBetter, MatchOutcome.NoDifference])
+        test = SequentialTest(min_samples=5)
+        for _ in range(4):
+            test.add(1000)
+        self.assertEqual(test.outcome(), MatchOutcome.Undecided)
+
+    def test_same_strategies_tie(self):
+        match = Match(3, "heuristic", "heuristic", master_seed=31)
+        self.assertEqual(match.run(), MatchOutcome.NoDifference)
+        self.assertEqual(match.num_pairs, DEFAULT_MIN_PAIRS)
+        self.assertEqual(match.test.total, 0)
+
+    def test_match_stops_early(self):
+        decision_timer = DecisionTimer()
+        match = Match(4, "heuristic", "random", master_seed=32, decision_timer=decision_timer)
+        self.assertEqual(match.run(), MatchOutcome.FirstIsBetter)
+        self.assertLess(match.num_pairs, 50)
+        self.assertEqual(decision_timer.histograms[("random", BID_DECISION)].num_decisions, match.num_pairs * NUM_ROUNDS)
+        # The test seat goes around the table
+        self.assertEqual(sorted(seat for (side, seat) in match.games), [0, 0, 1, 1, 2, 2, 3, 3])
+        with self.assertRaises(ValueError):
+            Match(4, "heuristic", "oracle")
+
+class TestSimulate(unittest.TestCase):
+    def test_chunk_sizes(self):
+        self.assertEqual(chunk_sizes(10, 5), [5, 5])
+        self.assertEqual(chunk_sizes(12, 5), [5, 5, 2])
+        self.assertEqual(chunk_sizes(3, 5), [3])
+
+    def test_seat_statistics_merge(self):
+        first = SeatStatistics()
+        first.add_score(100, True)
+        first.add_score(-40, False)
+        second = SeatStatistics()
+        second.add_score(250, True)
+        first.merge(second)
+        self.assertEqual(first.num_games, 3)
+        self.assertEqual(first.min_score, -40)
+        self.assertEqual(first.max_score, 250)
+        self.assertEqual(first.wins, 2)
+        self.assertAlmostEqual(first.mean(), 310 / 3)
+
+    def test_simulate_in_process(self):
+        seat_statistics = simulate(4, 7, num_workers=1, chunk_size=3)
+        self.assertEqual(len(seat_statistics), 4)
+        for stats in seat_statistics:
+            self.assertEqual(stats.num_games, 7)
+        self.assertGreaterEqual(sum(stats.wins for stats in seat_statistics), 7)
+
+    def test_no_games(self):
+        seat_statistics = simulate(3, 0, num_workers=1)
+        self.assertEqual([stats.num_games for stats in seat_statistics], [0, 0, 0])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            print_seat_statistics(seat_statistics)
+        self.assertEqual(len(output.getvalue().splitlines()), 4)
+
+    def test_in_process_writer_is_closed(self):
+        import simulate as simulate_module
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "games.jsonl")
+            for _ in range(2):
+                simulate(3, 2, num_workers=1, jsonl_filepath=filepath)
+                self.assertEqual(simulate_module.worker_game, None)
+            with open(filepath) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(len([record for record in records if record[RECORD_TYPE_KEY] == GAME_RECORD]), 4)
+
+    def test_simulate_is_reproducible(self):
+        first = simulate(3, 6, num_workers=1, chunk_size=4, master_seed=12)
+        second = simulate(3, 6, num_workers=1, chunk_size=5, master_seed=12)
+        for i in range(3):
+            self.assertEqual(first[i].total, second[i].total)
+            self.assertEqual(first[i].total_squared, second[i].total_squared)
+
+    def test_lockstep_simulate(self):
+        first = simulate(3, 30, num_workers=1, chunk_size=7, master_seed=5)
+        second = simulate(3, 30, num_workers=1, chunk_size=30, master_seed=5, lockstep=True)
+        for i in range(3):
+            self.assertEqual(first[i].total, second[i].total)
+            self.assertEqual(first[i].wins, second[i].wins)
+
+    def test_headless_imports(self):
+        # Workers import these, so they must not need a display or NumPy.
+        for module_name in ["game", "simulate"]:
+            (_, loaded) = time_import(module_name)
+            self.assertEqual(loaded, [])
+
+class TestGameWriter(unittest.TestCase):
+    def test_json_lines_game_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "games.jsonl")
+            game_writer = JsonLinesGameWriter(filepath, flush_size=0)
+            game = Game(4, False, False, False, False, False, False, False, seed=8, game_writer=game_writer)
+            for game_index in range(2):
+                game.reset(seed=game_index, game_index=game_index)
+                game.run_game(None)
+            game_writer.close()
+            f = open(filepath, 'r')
+            records = [json.loads(line) for line in f]
+            f.close()
+        self.assertEqual(len(records), 2 * (10 * 2 + sum(range(1, 11)) + 1))
+        game_records = [record for record in records if record[RECORD_TYPE_KEY] == GAME_RECORD]
+        self.assertEqual([record[GAME_KEY] for record in game_records], [0, 1])
+        last_round = [record for record in records if record[RECORD_TYPE_KEY] == ROUND_RECORD and record[GAME_KEY] == 1][-1]
+        self.assertEqual(last_round[SCORES_KEY], game_records[1][SCORES_KEY])
+        tricks = [record for record in records if record[RECORD_TYPE_KEY] == TRICK_RECORD and record[ROUND_KEY] == 3]
+        self.assertEqual([record[TRICK_KEY] for record in tricks], [1, 2, 3, 1, 2, 3])
+
+    def test_binary_game_archive(self):
+        json_game = Game(4, False, False, False, False, False, False, False, seed=21, game_writer=GameWriter())
+        json_game.run_game(None)
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "games.skga")
+            game_writer = BinaryGameWriter(filepath, 4, flush_size=0)
+            game = Game(4, False, False, False, False, False, False, False, game_writer=game_writer)
+            for game_index in range(3):
+                game.reset(seed=21 + game_index, game_index=game_index)
+                game.run_game(None)
+            game_writer.close()
+            self.assertTrue(is_game_archive(filepath))
+            archive = GameArchive(filepath)
+            self.assertEqual(len(archive), 3)
+            self.assertEqual(archive.games["game_index"].tolist(), [0, 1, 2])
+            self.assertEqual(archive.games["scores"][2, 9].tolist(), game.scores)
+            rounds = game_record_to_rounds(archive[0])
+            (winners, scores) = rescore_games(archive.games)
+            self.assertEqual(winners.tolist(), archive.games["winners"].tolist())
+            self.assertEqual(scores.tolist(), archive.games["scores"].tolist())
+            del archive
+        self.assertEqual(rounds, json_game.game_writer.data)
+
+    def test_hand_before_trick(self):
+        game = Game(5, False, False, False, False, False, False, False, seed=3, game_writer=GameWriter())
+        game.run_game(None)
+        round_data = game.game_writer.data[7]
+        self.assertEqual(hands_before_trick(round_data, 0), round_data[HANDS_KEY])
+        for trick_index in range(8):
+            trick = round_data[TRICKS_KEY][trick_index]
+            for i in range(5):
+                player_index = (trick["starting_index"] + i) % 5
+                hand = hand_before_trick(round_data, trick_index, player_index)
+                self.assertEqual(len(hand), 8 - trick_index)
+                self.assertIn(trick["cards_played"][i], hand)
+        self.assertEqual(hands_before_trick(round_data, 8), [[] for _ in range(5)])
+
+class TestEvents(unittest.TestCase):
+    def test_events_in_a_game(self):
+        game = Game(4, False, False, False, False, False, False, False, seed=5)
+        counts = {event_type : 0 for event_type in EVENT_TYPES}
+        def counter(event_type):
+            def count(event):
+                counts[event_type] += 1
+            return count
+        for event_type in EVENT_TYPES:
+            game.events.subscribe(event_type, counter(event_type))
+        game.run_game(None)
+        num_tricks = sum(range(1, 11))
+        self.assertEqual(counts[GAME_STARTED], 1)
+        self.assertEqual(counts[DEAL], 10)
+        self.assertEqual(counts[BIDS], 10)
+        self.assertEqual(counts[TRICK_STARTED], num_tricks)
+        self.assertEqual(counts[TURN_STARTED], 4 * num_tricks)
+        self.assertEqual(counts[CARD_PLAYED], 4 * num_tricks)
+        self.assertEqual(counts[TRICK_WON], num_tricks)
+        self.assertEqual(counts[ROUND_SCORED], 10)
+        self.assertEqual(counts[GAME_FINISHED], 1)
+
+    def test_no_subscribers_by_default(self):
+        game = Game(3, False, False, False, False, False, False, False)
+        for event_type in EVENT_TYPES:
+            self.assertFalse(game.events.has_subscribers(event_type))
+        game = Game(3, False, False, True, False, False, True, False)
+        self.assertTrue(game.events.has_subscribers(TRICK_STARTED))
+        self.assertTrue(game.events.has_subscribers(CARD_PLAYED))
+        self.assertFalse(game.events.has_subscribers(BIDS))
+
+    def test_replacing_game_writer(self):
+        game = Game(3, False, False, False, False, False, False, False, seed=4, game_writer=GameWriter())
+        first_writer = game.game_writer
+        game.game_writer = GameWriter()
+        game.run_game(None)
+        self.assertNotIn(HANDS_KEY, first_writer.data[0])
+        self.assertEqual(len(game.game_writer.data[9][TRICKS_KEY]), 10)
+        game.game_writer = None
+        self.assertFalse(game.events.has_subscribers(TRICK_WON))
+
+class TestGameIndex(unittest.TestCase):
+    def test_json_lines_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "games.jsonl")
+            game_writer = JsonLinesGameWriter(filepath, flush_size=5000)
+            game = Game(3, False, False, False, False, False, False, False, game_writer=game_writer)
+            for game_index in [4, 2, 9]:
+                game.reset(seed=game_index, game_index=game_index)
+                game.run_game(None)
+            game_writer.close()
+            index = read_index(filepath)
+            self.assertEqual(index["game_index"].tolist(), [4, 2, 9])
+            self.assertEqual(build_json_lines_index(filepath).tobytes(), index.tobytes())
+            rounds = read_json_lines_game(filepath, int(find_game(index, 2)["offset"]))
+            round_data = read_json_lines_round_at(filepath, int(find_game(index, 9)["round_offsets"][6]))
+        expected_game = Game(3, False, False, False, False, False, False, False, seed=2, game_writer=GameWriter())
+        expected_game.run_game(None)
+        self.assertEqual(rounds, expected_game.game_writer.data)
+        self.assertEqual(len(round_data[TRICKS_KEY]), 7)
+        self.assertEqual(len(round_data[HANDS_KEY][0]), 7)
+
+    def test_archive_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "games.skga")
+            game_writer = BinaryGameWriter(filepath, 3, flush_size=0)
+            game = Game(3, False, False, False, False, False, False, False, game_writer=game_writer)
+            for game_index in [7, 1, 5]:
+                game.reset(seed=game_index, game_index=game_index)
+                game.run_game(None)
+            game_writer.close()
+            archive = GameArchive(filepath)
+            self.assertEqual(int(archive.find_game(1)["game_index"]), 1)
+            self.assertEqual(archive.find_game(5)["scores"][9].tolist(), game.scores)
+            del archive
+
+class TestSeeding(unittest.TestCase):
+    def test_child_seed_sequence(self):
+        master = np.random.SeedSequence(1234)
+        children = master.spawn(3)
+        for i in range(3):
+            self.assertEqual(child_seed_sequence(master, i).generate_state(4).tolist(), children[i].generate_state(4).tolist())
+
+    def test_streams_are_independent(self):
+        game_seed = game_seed_sequence(99, 0)
+        deck_draws = deck_rng(game_seed).integers(1000000, size=5).tolist()
+        self.assertEqual(deck_rng(game_seed).integers(1000000, size=5).tolist(), deck_draws)
+        self.assertNotEqual(seat_rng(game_seed, 0).integers(1000000, size=5).tolist(), deck_draws)
+        self.assertNotEqual(deck_rng(game_seed_sequence(99, 1)).integers(1000000, size=5).tolist(), deck_draws)
+
+    def test_seeded_deck_shuffle(self):
+        first = Deck(rng=np.random.default_rng(5))
+        second = Deck(rng=np.random.default_rng(5))
+        first.shuffle()
+        first.shuffle()
+        second.shuffle()
+        second.shuffle()
+        self.assertEqual([card.card_id for card in first.cards], [card.card_id for card in second.cards])
+
 if __name__ == '__main__':
     unittest.main()